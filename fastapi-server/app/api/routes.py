@@ -1,221 +1,311 @@
-import base64
+import asyncio
+import time
 import uuid
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Union
 
-from fastapi import APIRouter, Depends, Query
+import orjson
+from fastapi import APIRouter, File, Form, HTTPException, Query, UploadFile
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel
 
+from app.config import IMAGE_MAX_UPLOAD_BYTES, INCLUDE_UPSTREAM_PAYLOADS, ORCHESTRATE_SPECULATIVE
 from app.models.schemas import (
-    HealthcareFacility,
+    AnswerResponse,
+    BatchRequest,
+    BatchResponse,
+    Coordinates,
+    FacilityRequest,
+    HealthcareFacilitiesResponse,
     LocationRequest,
     OrchestrationRequest,
-    Shelter,
+    OrchestrationResponse,
+    PharmacyResponse,
+    ResourceAnswerResponse,
+    RestroomResponse,
+    ShelterResponse,
 )
-from app.services.gemini import Workflow_Prompt, determine_workflow, get_general_gemini_response, send_vision_prompt, web_search
+from app.services.gemini import (
+    Workflow_Prompt,
+    get_general_gemini_response,
+    send_vision_prompt,
+    stream_general_gemini_response,
+    stream_vision_prompt,
+    stream_web_search,
+    web_search,
+)
+from app.services.gemini_gateway import gemini_gateway
 from app.services.medical import get_medical_care_locations
-from app.services.pharmacy import get_easyvax_locations
-from app.services.restroom import get_restroom_data
+from app.services.pharmacy import pharmacy_snapshots
+from app.services.restroom import restroom_store
+from app.services.router import asks_for_another, continues, is_follow_up, is_urgent, score_locally, workflow_router
+from app.services.sessions import Session, session_store
+from app.services.speculation import speculator
 from app.services.shelter import get_shelter_data
-from app.utils.geo import get_zip_from_lat_long, haversine
+from app.utils.admission import Overloaded, admission
+from app.utils.geocode import resolve_zip
+from app.utils.http_client import upstream_stats
+from app.utils.images import prepare_image
+from app.utils.loop_monitor import loop_monitor
+from app.utils.response_cache import response_cache
+from app.utils.semantic_cache import semantic_cache
+from app.utils.tracing import span
 
 router = APIRouter(prefix="/api", tags=["api"])
 
-async def handle_physical_injury(user_prompt: str, image_surroundings: str) -> str:
-    """Handle internal medical problem workflow"""
-    session_id = str(uuid.uuid4())
+# Single-workflow endpoints, admitted by AdmissionMiddleware before their body is read
+ROUTE_WORKFLOWS = {
+    "/api/find_shelter": "C",
+    "/api/find_pharmacy": "D",
+    "/api/find_healthcare_facilities": "E",
+    "/api/find_restroom": "F",
+}
+
+HandlerResult = Union[BaseModel, Dict[str, Any]]
+
+def _dump(result: HandlerResult) -> Dict[str, Any]:
+    """Wire form of a handler result; unset (None) fields are left out."""
+    if isinstance(result, BaseModel):
+        return result.model_dump(exclude_none=True)
+    return result
 
-    full_prompt = f"""
+def _respond(result: HandlerResult) -> ORJSONResponse:
+    # Returning a Response skips FastAPI's second validation pass over the model
+    return ORJSONResponse(_dump(result))
+
+def _physical_injury_prompt(user_prompt: str) -> str:
+    return f"""
     You are to help homeless people get healthcare support. The current user has a physical medical issue. See the photo. 
     Help them solve it. Keep response under 100 tokens! and no formatting, lists, of parenthesis. response as if you're talking.
     
     User prompt: {user_prompt}
     """ 
 
-    image_bytes = base64.b64decode(image_surroundings)
+async def handle_physical_injury(
+    user_prompt: str,
+    image_surroundings: Union[str, bytes],
+    session_id: Optional[str] = None,
+) -> AnswerResponse:
+    """Handle internal medical problem workflow; the image is base64 text or raw upload bytes"""
+    session_id = session_id or str(uuid.uuid4())
+
+    full_prompt = _physical_injury_prompt(user_prompt)
 
     try:
-        response = await send_vision_prompt(full_prompt, image_bytes)
-        return {
-            "sessionId": session_id,
-            "response": response
-        }
+        image = await prepare_image(image_surroundings)
+        response, raw = await send_vision_prompt(full_prompt, image.data_b64, image.mime_type)
+        return AnswerResponse(
+            sessionId=session_id,
+            response=response,
+            raw=raw if INCLUDE_UPSTREAM_PAYLOADS else None,
+        )
     except Exception as e:
-        return {"sessionId": session_id, "error ": str(e)}
+        return AnswerResponse(sessionId=session_id, error=str(e))
 
-async def handle_internal_medical(user_prompt: str) -> str:
+async def handle_internal_medical(user_prompt: str, session_id: Optional[str] = None) -> AnswerResponse:
     """Handle internal medical problem workflow"""
-    session_id = str(uuid.uuid4())
+    session_id = session_id or str(uuid.uuid4())
     try:
-        response = await get_general_gemini_response(user_prompt, Workflow_Prompt.NONPHYSICAL)
-        return {
-            "sessionId": session_id,
-            "response": response
-        }
+        response = await semantic_cache.get_or_generate(
+            semantic_cache.namespace("B"),
+            user_prompt,
+            lambda: get_general_gemini_response(user_prompt, Workflow_Prompt.NONPHYSICAL),
+        )
+        return AnswerResponse(sessionId=session_id, response=response)
     except Exception as e:
-        return {"sessionId": session_id, "error ": str(e)}
+        return AnswerResponse(sessionId=session_id, error=str(e))
 
-async def handle_pharmacy_request(latitude: float, longitude: float) -> Dict[str, Any]:
+async def handle_pharmacy_request(
+    latitude: float,
+    longitude: float,
+    session_id: Optional[str] = None,
+    zip_code: Optional[str] = None,
+    skip: int = 0,
+) -> PharmacyResponse:
     """Handle pharmacy location request"""
-    session_id = str(uuid.uuid4())
+    session_id = session_id or str(uuid.uuid4())
     try:
-        zip_code = get_zip_from_lat_long(latitude, longitude)
-        print(f"[handle_pharmacy_request] Zip code: {zip_code}")
-
-        locations = get_easyvax_locations(zip_code, session_id)
-        print(f"[handle_pharmacy_request] Locations raw: {locations}")
-
-        if not isinstance(locations, list):
-            return {"sessionId": session_id, "error": f"Expected list, got {type(locations).__name__}: {locations}"}
-
-        for loc in locations:
-            if loc.get('appointments'):
-                has_appointments = any(day['times'] for day in loc['appointments'])
-                if has_appointments:
-                    pharmacy_info = {
-                        "sessionId": session_id,
-                        "locationName": loc.get('locationName', 'Unknown'),
-                        "address": loc.get('address', 'Unknown'),
-                        "city": loc.get('city', 'Unknown'),
-                        "state": loc.get('state', 'Unknown'),
-                        "zip": loc.get('zip', 'Unknown'),
-                        "appointments": [],
-                        "distance_miles": loc.get('distance', 0),
-                    }
-                    for appointment_day in loc['appointments']:
-                        if appointment_day.get('times'):
-                            day_info = {
-                                "date": appointment_day.get('date', 'Unknown'),
-                                "times": [slot.get('time', 'Unknown') for slot in appointment_day['times']]
-                            }
-                            pharmacy_info["appointments"].append(day_info)
-                    
-                    return pharmacy_info
-        
-        return {"sessionId": session_id, "message": "No pharmacies with available appointments found."}
+        zip_code = zip_code or await resolve_zip(latitude, longitude)
+        pharmacy = await pharmacy_snapshots.next_available(zip_code, session_id, skip)
+        if pharmacy is None:
+            return PharmacyResponse(sessionId=session_id, message="No pharmacies with available appointments found.")
+        return PharmacyResponse(sessionId=session_id, **pharmacy)
 
     except Exception as e:
-        return {"sessionId": session_id, "error": f"Internal error: {str(e)}"}
-@router.post("/find_pharmacy")
+        return PharmacyResponse(sessionId=session_id, error=f"Internal error: {str(e)}")
+@router.post("/find_pharmacy", response_model=PharmacyResponse, response_model_exclude_none=True)
 async def find_pharmacy(req: LocationRequest):
-    return await handle_pharmacy_request(req.latitude, req.longitude)
+    return _respond(await handle_pharmacy_request(req.latitude, req.longitude))
 
-async def handle_restroom_request(latitude: float, longitude: float) -> Dict[str, Any]:
+async def handle_restroom_request(
+    latitude: float,
+    longitude: float,
+    session_id: Optional[str] = None,
+    skip: int = 0,
+) -> RestroomResponse:
     """Handle restroom location request"""
-    session_id = str(uuid.uuid4())
+    session_id = session_id or str(uuid.uuid4())
 
     try:
-        user_lat = latitude
-        user_lon = longitude
-        
-        restrooms = get_restroom_data()
-
-        closest_restroom = None
-        min_distance = float('inf')
-
-        for restroom in restrooms:
-            geom = restroom.get('the_geom')
-            if geom and 'coordinates' in geom:
-                try:
-                    toilets = int(restroom.get('toilets', 0) or 0)
-                    urinals = int(restroom.get('urinals', 0) or 0)
-                    faucets = int(restroom.get('faucets', 0) or 0)
-                except (ValueError, TypeError):
-                    toilets = urinals = faucets = 0
-
-                if toilets == 0 and urinals == 0 and faucets == 0:
-                    continue
-
-                lon, lat = geom['coordinates']
-                distance = haversine(user_lon, user_lat, lon, lat)
-
-                if distance < min_distance:
-                    min_distance = distance
-                    closest_restroom = {
-                        "facility": restroom.get('facility', 'Unknown'),
-                        "gender": restroom.get('gender', 'Unknown'),
-                        "toilets": toilets,
-                        "urinals": urinals,
-                        "faucets": faucets,
-                        "location": geom,
-                        "distance_miles": round(distance, 2)
-                    }
-
-        if closest_restroom:
-            return {
-                "sessionId": session_id,
-                "nearestRestroom": closest_restroom
-            }
+        await restroom_store.ensure_loaded()
+        nearest = restroom_store.nearest(latitude, longitude, skip + 1)
+
+        if len(nearest) > skip:
+            return RestroomResponse(sessionId=session_id, nearestRestroom=nearest[skip])
         else:
-            return {
-                "sessionId": session_id,
-                "message": "No restrooms found."
-            }
+            return RestroomResponse(sessionId=session_id, message="No restrooms found.")
 
     except Exception as e:
-        return {"sessionId": session_id, "error string 2": str(e)}
+        return RestroomResponse(sessionId=session_id, error=str(e))
 
-@router.post("/find_restroom")
+@router.post("/find_restroom", response_model=RestroomResponse, response_model_exclude_none=True)
 async def find_restroom(req: LocationRequest):
-    return await handle_restroom_request(req.latitude, req.longitude)
-@router.post("/find_healthcare_facilities")
-async def find_healthcare_facilities(req: LocationRequest):
-    return await handle_medical_center_request(req.latitude, req.longitude)
+    return _respond(await handle_restroom_request(req.latitude, req.longitude))
+@router.post("/find_healthcare_facilities", response_model=HealthcareFacilitiesResponse, response_model_exclude_none=True)
+async def find_healthcare_facilities(req: FacilityRequest):
+    return _respond(await handle_medical_center_request(req.latitude, req.longitude, req.limit, req.facility_types))
 
-async def handle_medical_center_request(latitude: float, longitude: float, limit: int = 5) -> Dict[str, Any]:
+async def handle_medical_center_request(
+    latitude: float,
+    longitude: float,
+    limit: int = 5,
+    facility_types: Optional[List[str]] = None,
+    session_id: Optional[str] = None,
+    skip: int = 0,
+) -> HealthcareFacilitiesResponse:
     """Handle medical center location request"""
-    session_id = str(uuid.uuid4())
+    session_id = session_id or str(uuid.uuid4())
     try:
-        facilities = get_medical_care_locations(latitude, longitude, limit)
+        facilities = await get_medical_care_locations(latitude, longitude, limit + skip, facility_types)
         
         if isinstance(facilities, dict) and "error" in facilities:
-            return {"sessionId": session_id, "error string 3": facilities["error"]}
+            return HealthcareFacilitiesResponse(sessionId=session_id, error=facilities["error"])
         
-        return {
-            "sessionId": session_id,
-            "facilities": facilities
-        }
+        return HealthcareFacilitiesResponse(sessionId=session_id, facilities=facilities[skip:])
     except Exception as e:
-        return {"sessionId": session_id, "error": str(e)}
+        return HealthcareFacilitiesResponse(sessionId=session_id, error=str(e))
 
-async def handle_shelter_request(latitude: float, longitude: float) -> Dict[str, Any]:
+async def handle_shelter_request(
+    latitude: float,
+    longitude: float,
+    session_id: Optional[str] = None,
+    zip_code: Optional[str] = None,
+    skip: int = 0,
+) -> ShelterResponse:
     """Handle shelter location request"""
-    session_id = str(uuid.uuid4())  # Generate fresh session UUID
+    session_id = session_id or str(uuid.uuid4())  # Generate fresh session UUID
     try:
         if not latitude or not longitude:
-            return {"sessionId": session_id, "error string 4": "Latitude and longitude are required."}
+            return ShelterResponse(sessionId=session_id, error="Latitude and longitude are required.")
         
-        print(f"Latitude: {latitude}, Longitude: {longitude}")
-        zip_code = get_zip_from_lat_long(latitude, longitude)
+        # The ZIP only hints which area the directory should cover next;
+        # a failed lookup is recorded on the geocode span
+        if zip_code is None:
+            try:
+                zip_code = await resolve_zip(latitude, longitude)
+            except Exception:
+                zip_code = None
                 
-        nearest_resource = get_shelter_data(latitude, longitude, zip_code)
+        nearest_resource = await get_shelter_data(latitude, longitude, zip_code, skip)
+        if nearest_resource is None:
+            return ShelterResponse(sessionId=session_id, zipCode=zip_code, message="No homeless resources found.")
         
-        return {
-            "sessionId": session_id,
-            "zipCode": zip_code,
-            "nearest_resource": nearest_resource,
-            "message": "Found nearest homeless resource."
-        }
+        return ShelterResponse(
+            sessionId=session_id,
+            zipCode=zip_code,
+            nearest_resource=nearest_resource,
+            message="Found nearest homeless resource."
+        )
     
     except Exception as e:
-        return {"sessionId": session_id, "error string 5": str(e)}
+        return ShelterResponse(sessionId=session_id, error=str(e))
 
-@router.post("/find_shelter")
+@router.post("/find_shelter", response_model=ShelterResponse, response_model_exclude_none=True)
 async def find_shelter(req: LocationRequest):
-    return await handle_shelter_request(req.latitude, req.longitude)
+    return _respond(await handle_shelter_request(req.latitude, req.longitude))
 
-async def handle_physical_resource_request(latitude: float, longitude: float, user_prompt: str) -> Dict[str, Any]:
+async def handle_physical_resource_request(
+    latitude: float,
+    longitude: float,
+    user_prompt: str,
+    session_id: Optional[str] = None,
+) -> ResourceAnswerResponse:
     """Handle physical resource location request"""
-    session_id = str(uuid.uuid4())
+    session_id = session_id or str(uuid.uuid4())
     try:
-        response = await web_search(user_prompt, latitude, longitude)
-        return {
-            "sessionId": session_id,
-            "response": response,
-            "location": {"latitude": latitude, "longitude": longitude}
-        }
+        # Answers name nearby places, so they are only shared within a location cell
+        response = await semantic_cache.get_or_generate(
+            semantic_cache.namespace("G", latitude, longitude),
+            user_prompt,
+            lambda: web_search(user_prompt, latitude, longitude),
+        )
+        return ResourceAnswerResponse(
+            sessionId=session_id,
+            response=response,
+            location=Coordinates(latitude=latitude, longitude=longitude),
+        )
     except Exception as e:
-        return {"sessionId": session_id, "error": str(e)}
+        return ResourceAnswerResponse(sessionId=session_id, error=str(e))
+
+async def _session_zip(session: Session, latitude: float, longitude: float) -> Optional[str]:
+    """The session's ZIP code, resolved on first use at its current location."""
+    if session.zip_code is None:
+        try:
+            session.zip_code = await resolve_zip(latitude, longitude)
+        except Exception:
+            pass  # handlers retry or degrade on their own
+    return session.zip_code
 
-@router.post("/orchestrate", response_model=Dict[str, Any])
+def _workflow_handlers(
+    req: OrchestrationRequest,
+    image: Optional[bytes] = None,
+    session: Optional[Session] = None,
+    skip: int = 0,
+) -> Dict[str, Callable[[], Awaitable[BaseModel]]]:
+    """
+    Handler for each workflow letter, bound to the request (and an uploaded
+    image and session, if any). Location handlers pass over the `skip`
+    nearest answers (pages of facilities) the user has already been shown.
+    """
+    session = session or Session(str(uuid.uuid4()))
+    sid = session.session_id
+
+    async def shelter():
+        zip_code = await _session_zip(session, req.latitude, req.longitude)
+        return await handle_shelter_request(req.latitude, req.longitude, sid, zip_code, skip)
+
+    async def pharmacy():
+        zip_code = await _session_zip(session, req.latitude, req.longitude)
+        return await handle_pharmacy_request(req.latitude, req.longitude, sid, zip_code, skip)
+
+    return {
+        "A": lambda: handle_physical_injury(req.user_prompt, image if image is not None else req.image_surroundings, sid),
+        "B": lambda: handle_internal_medical(req.user_prompt, sid),
+        "C": shelter,
+        "D": pharmacy,
+        "E": lambda: handle_medical_center_request(req.latitude, req.longitude, session_id=sid, skip=skip * 5),
+        "F": lambda: handle_restroom_request(req.latitude, req.longitude, sid, skip),
+        "G": lambda: handle_physical_resource_request(req.latitude, req.longitude, req.user_prompt, sid),
+    }
+
+# Workflows that only need lat/lon and can safely start before classification
+LOCATION_WORKFLOWS = ("C", "D", "E", "F")
+
+def _degraded_answer(req: OrchestrationRequest, session: Session, workflow_type: str) -> Optional[Dict[str, Any]]:
+    """An earlier answer to serve instead of shedding: the session's last result or a similar cached one."""
+    if workflow_type in LOCATION_WORKFLOWS:
+        result = session.result(workflow_type, max_age=float("inf"))
+        return {**result, "degraded": True} if result is not None else None
+    if workflow_type == "B":
+        answer, _ = semantic_cache.lookup(semantic_cache.namespace("B"), req.user_prompt)
+    elif workflow_type == "G":
+        answer, _ = semantic_cache.lookup(semantic_cache.namespace("G", req.latitude, req.longitude), req.user_prompt)
+    else:
+        return None
+    if answer is None:
+        return None
+    return _dump(AnswerResponse(sessionId=session.session_id, response=answer, degraded=True))
+
+@router.post("/orchestrate", response_model=OrchestrationResponse, response_model_exclude_none=True)
 async def orchestrate(req: OrchestrationRequest):
     """
     Orchestration endpoint that determines which service to call based on semantic similarity.
@@ -226,31 +316,276 @@ async def orchestrate(req: OrchestrationRequest):
     Returns:
         Dictionary with response from the most appropriate service
     """
+    return ORJSONResponse(await _orchestrate(req))
+
+@router.post("/orchestrate/upload", response_model=OrchestrationResponse, response_model_exclude_none=True)
+async def orchestrate_upload(
+    user_prompt: str = Form(...),
+    latitude: float = Form(...),
+    longitude: float = Form(...),
+    speculative: Optional[bool] = Form(None),
+    session_id: Optional[str] = Form(None, alias="sessionId", max_length=128),
+    image: Optional[UploadFile] = File(None),
+):
+    """
+    Multipart variant of /orchestrate that takes the camera frame as a binary
+    file part instead of base64 inside JSON.
+    """
+    req = OrchestrationRequest(
+        user_prompt=user_prompt,
+        latitude=latitude,
+        longitude=longitude,
+        speculative=speculative,
+        session_id=session_id,
+    )
+    image_bytes = None
+    if image is not None:
+        # Read one byte past the limit so oversized frames are rejected without buffering them whole
+        image_bytes = await image.read(IMAGE_MAX_UPLOAD_BYTES + 1)
+        if len(image_bytes) > IMAGE_MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"Image exceeds {IMAGE_MAX_UPLOAD_BYTES} bytes")
+    return ORJSONResponse(await _orchestrate(req, image_bytes))
+
+async def _orchestrate(req: OrchestrationRequest, image: Optional[bytes] = None) -> Dict[str, Any]:
+    # Follow-up turns reuse what the session already knows; new sessions get the id we return
+    session = await session_store.load(req.session_id or str(uuid.uuid4()))
+    session.locate(req.latitude, req.longitude)
     try:
-        # Determine the workflow using Gemini
-        workflow_type = await determine_workflow(req.user_prompt)
-        
+        handlers = _workflow_handlers(req, image, session)
+
+        # Determine the workflow (cache, local classifier, the session, then Gemini)
+        result = None
+        follow_up = session.workflow is not None and is_follow_up(req.user_prompt)
+        workflow_type = workflow_router.classify_fast(req.user_prompt)
+        if workflow_type is None and follow_up and continues(req.user_prompt, session.workflow):
+            # A follow-up that refers back ("what about another one?") and names no other
+            # service continues the conversation; "what about a doctor?" goes to Gemini below
+            workflow_type = session.workflow
+            session_store.counters["workflow_reused"] += 1
+        if workflow_type is None:
+            # Anything else goes to Gemini with the previous workflow as context; a possible
+            # emergency is classified on its own so it is never steered back to the last lookup
+            previous = None if is_urgent(req.user_prompt) else session.workflow
+            speculative = ORCHESTRATE_SPECULATIVE if req.speculative is None else req.speculative
+            if speculative:
+                workflow_type, result = await speculator.run(
+                    lambda: workflow_router.classify_remote(req.user_prompt, previous),
+                    {w: handlers[w] for w in LOCATION_WORKFLOWS},
+                    score_locally(req.user_prompt),
+                )
+            else:
+                workflow_type = await workflow_router.classify_remote(req.user_prompt, previous)
+
         # Route to the appropriate service based on workflow type
-        if workflow_type == "A":
-            return await handle_physical_injury(req.user_prompt, req.image_surroundings)
-        elif workflow_type == "B":
-            return await handle_internal_medical(req.user_prompt)
-        elif workflow_type == "C":
-            return await handle_shelter_request(req.latitude, req.longitude)
-        elif workflow_type == "D":
-            return await handle_pharmacy_request(req.latitude, req.longitude)
-        elif workflow_type == "E":
-            return await handle_medical_center_request(req.latitude, req.longitude)
-        elif workflow_type == "F":
-            return await handle_restroom_request(req.latitude, req.longitude)
-        elif workflow_type == "G":
-            return await handle_physical_resource_request(req.latitude, req.longitude, req.user_prompt)
-        else:
+        if workflow_type not in handlers:
             raise ValueError(f"Unknown workflow type: {workflow_type}")
+        skip = 0
+        if follow_up and workflow_type == session.workflow and asks_for_another(req.user_prompt):
+            # "Another one" moves past what this session was already shown here
+            skip = session.next_skip(workflow_type)
+            if skip:
+                handlers = _workflow_handlers(req, image, session, skip)
+                result = None
+        reused = False
+        if result is None and workflow_type in LOCATION_WORKFLOWS and not follow_up:
+            # A follow-up wants something other than the answer it is following up on
+            result = session.result(workflow_type)
+            reused = result is not None
+        if result is None:
+            try:
+                async with admission.admit(workflow_type):
+                    result = await handlers[workflow_type]()
+            except Overloaded:
+                # Saturated: an earlier answer beats a 503, unless it is the one being followed up on
+                if follow_up and workflow_type in LOCATION_WORKFLOWS:
+                    raise
+                result = _degraded_answer(req, session, workflow_type)
+                if result is None:
+                    raise
+                admission.record(workflow_type, "degraded")
+        result = _dump(result)
+        if reused:
+            session_store.counters["results_reused"] += 1
+        elif workflow_type in LOCATION_WORKFLOWS and "error" not in result and not result.get("degraded"):
+            session.remember(workflow_type, result, skip)
+
+        session.workflow = workflow_type
+        await session_store.save(session)
+        return result
             
+    except Overloaded:
+        raise
     except Exception as e:
-        return {"sessionId": str(uuid.uuid4()), "error string 6" : str(e)} 
+        return {"sessionId": session.session_id, "error": str(e)}
     
+async def _stream_physical_injury(user_prompt: str, image_surroundings: str) -> AsyncIterator[str]:
+    image = await prepare_image(image_surroundings)
+    async for text in stream_vision_prompt(_physical_injury_prompt(user_prompt), image.data_b64, image.mime_type):
+        yield text
+
+def _stream_workflow_text(req: OrchestrationRequest, workflow_type: str) -> AsyncIterator[str]:
+    """Token stream for the Gemini-backed workflows."""
+    if workflow_type == "A":
+        return _stream_physical_injury(req.user_prompt, req.image_surroundings)
+    if workflow_type == "B":
+        return semantic_cache.stream_or_generate(
+            semantic_cache.namespace("B"),
+            req.user_prompt,
+            lambda: stream_general_gemini_response(req.user_prompt, Workflow_Prompt.NONPHYSICAL),
+        )
+    return semantic_cache.stream_or_generate(
+        semantic_cache.namespace("G", req.latitude, req.longitude),
+        req.user_prompt,
+        lambda: stream_web_search(req.user_prompt, req.latitude, req.longitude),
+    )
+
+STREAMED_WORKFLOWS = ("A", "B", "G")
+
+def _format_event(event: Dict[str, Any], fmt: str) -> str:
+    data = orjson.dumps(event).decode()
+    if fmt == "sse":
+        return f"event: {event['type']}\ndata: {data}\n\n"
+    return data + "\n"
+
+async def _orchestrate_events(req: OrchestrationRequest, session_id: str) -> AsyncIterator[Dict[str, Any]]:
+    try:
+        workflow_type = await workflow_router.classify(req.user_prompt)
+    except Exception as e:
+        yield {"type": "error", "sessionId": session_id, "error": str(e)}
+        return
+
+    yield {"type": "meta", "sessionId": session_id, "workflow": workflow_type}
+
+    try:
+        async with admission.admit(workflow_type):
+            if workflow_type in STREAMED_WORKFLOWS:
+                async for text in _stream_workflow_text(req, workflow_type):
+                    yield {"type": "chunk", "text": text}
+            else:
+                handler = _workflow_handlers(req, session=Session(session_id))[workflow_type]
+                yield {"type": "result", **_dump(await handler())}
+    except Overloaded as e:
+        yield {"type": "error", "sessionId": session_id, "error": str(e), "retryAfter": e.retry_after}
+        return
+    except Exception as e:
+        yield {"type": "error", "sessionId": session_id, "error": str(e)}
+        return
+
+    yield {"type": "done"}
+
+@router.post("/orchestrate/stream")
+async def orchestrate_stream(req: OrchestrationRequest, format: str = Query("ndjson", pattern="^(ndjson|sse)$")):
+    """
+    Streaming variant of /orchestrate for voice clients.
+
+    Emits a "meta" event with the sessionId and workflow first, then "chunk"
+    events with response text as Gemini produces it (or a single "result"
+    event for location workflows), and finally "done" or "error". Events are
+    newline-delimited JSON, or Server-Sent Events with ?format=sse.
+    """
+    session_id = req.session_id or str(uuid.uuid4())
+
+    async def body():
+        async for event in _orchestrate_events(req, session_id):
+            yield _format_event(event, format)
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(body(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+# Batch intents that need the caller's ZIP code
+ZIP_INTENTS = ("shelter", "pharmacy")
+# Workflow letter each batch intent is admitted as
+INTENT_WORKFLOWS = {"shelter": "C", "pharmacy": "D", "healthcare_facilities": "E", "restroom": "F"}
+
+async def _run_intent(intent: str, handler: Callable[[], Awaitable[BaseModel]]) -> Dict[str, Any]:
+    start = time.perf_counter()
+    with span(f"batch.{intent}") as s:
+        try:
+            async with admission.admit(INTENT_WORKFLOWS[intent]):
+                result = _dump(await handler())
+        except Exception as e:
+            result = {"error": str(e)}
+        result.pop("sessionId", None)
+        error = result.pop("error", None)
+        if error is not None:
+            s.set(result="error")
+    return {**result, "error": error, "latency_ms": round((time.perf_counter() - start) * 1000, 2)}
+
+@router.post("/batch", response_model=BatchResponse)
+async def batch(req: BatchRequest):
+    """
+    Resolve several location intents for one position in a single round-trip.
+
+    The ZIP code and session are set up once and shared; intents run
+    concurrently, and each result carries its own "error" (null on success)
+    and "latency_ms", so one failing upstream does not fail the batch.
+    """
+    session_id = str(uuid.uuid4())
+    start = time.perf_counter()
+    intents = list(dict.fromkeys(req.intents))
+
+    zip_code = None
+    if any(intent in ZIP_INTENTS for intent in intents):
+        try:
+            zip_code = await resolve_zip(req.latitude, req.longitude)
+        except Exception:
+            zip_code = None  # each ZIP intent retries or degrades on its own
+
+    lat, lon = req.latitude, req.longitude
+    handlers = {
+        "restroom": lambda: handle_restroom_request(lat, lon, session_id),
+        "shelter": lambda: handle_shelter_request(lat, lon, session_id, zip_code),
+        "pharmacy": lambda: handle_pharmacy_request(lat, lon, session_id, zip_code),
+        "healthcare_facilities": lambda: handle_medical_center_request(
+            lat, lon, req.limit, req.facility_types, session_id
+        ),
+    }
+    results = await asyncio.gather(*(_run_intent(intent, handlers[intent]) for intent in intents))
+    return ORJSONResponse({
+        "sessionId": session_id,
+        "zipCode": zip_code,
+        "results": dict(zip(intents, results)),
+        "latency_ms": round((time.perf_counter() - start) * 1000, 2),
+    })
+
+@router.get("/router/stats")
+async def router_stats():
+    return {**workflow_router.stats(), "speculation": speculator.stats()}
+
+@router.get("/gemini/stats")
+async def gemini_stats():
+    return gemini_gateway.stats()
+
+@router.get("/semantic_cache/stats")
+async def semantic_cache_stats():
+    return semantic_cache.stats()
+
+@router.get("/sessions/stats")
+async def sessions_stats():
+    return session_store.stats()
+
+@router.get("/pharmacy/stats")
+async def pharmacy_stats():
+    return pharmacy_snapshots.stats()
+
+@router.get("/admission/stats")
+async def admission_stats():
+    return admission.stats()
+
+@router.get("/cache/stats")
+async def cache_stats():
+    return response_cache.stats()
+
+@router.get("/loop/stats")
+async def loop_stats():
+    if loop_monitor is None:
+        return {"enabled": False}
+    return {"enabled": True, **loop_monitor.stats()}
+
+@router.get("/upstreams/stats")
+async def upstreams_stats():
+    return upstream_stats()
+
 @router.get("/")
 async def root():
     return {"message": "Welcome to the FastAPI server!"}
\ No newline at end of file
@@ -0,0 +1,206 @@
+import os
+
+from dotenv import load_dotenv
+
+# Before anything below reads the environment; variables already set win
+load_dotenv()
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+# Restroom dataset (LA Open Data)
+RESTROOM_REFRESH_SECONDS = _env_float("RESTROOM_REFRESH_SECONDS", 6 * 60 * 60)
+
+# Size of a spatial index cell, in degrees of latitude/longitude
+SPATIAL_CELL_DEGREES = _env_float("SPATIAL_CELL_DEGREES", 0.02)
+
+# Reverse geocoding (lat/lon -> ZIP)
+GEOCODE_GEOHASH_PRECISION = _env_int("GEOCODE_GEOHASH_PRECISION", 6)
+GEOCODE_CACHE_SIZE = _env_int("GEOCODE_CACHE_SIZE", 10000)
+GEOCODE_CACHE_TTL_SECONDS = _env_float("GEOCODE_CACHE_TTL_SECONDS", 7 * 24 * 60 * 60)
+GEOCODE_CACHE_PATH = os.getenv("GEOCODE_CACHE_PATH", "")  # empty disables persistence
+
+# LAPL homeless resource directory
+SHELTER_REFRESH_SECONDS = _env_float("SHELTER_REFRESH_SECONDS", 6 * 60 * 60)
+SHELTER_SEARCH_MILES = _env_int("SHELTER_SEARCH_MILES", 20)
+SHELTER_SEED_ZIPS = [z.strip() for z in os.getenv("SHELTER_SEED_ZIPS", "90012").split(",") if z.strip()]
+SHELTER_MAX_ZIPS = _env_int("SHELTER_MAX_ZIPS", 50)
+
+# /orchestrate workflow classification
+ROUTER_CACHE_SIZE = _env_int("ROUTER_CACHE_SIZE", 5000)
+ROUTER_CACHE_TTL_SECONDS = _env_float("ROUTER_CACHE_TTL_SECONDS", 24 * 60 * 60)
+ROUTER_CONFIDENCE_THRESHOLD = _env_float("ROUTER_CONFIDENCE_THRESHOLD", 0.7)
+
+# Speculative /orchestrate: run location lookups while classification is in flight
+ORCHESTRATE_SPECULATIVE = os.getenv("ORCHESTRATE_SPECULATIVE", "false").lower() == "true"
+SPECULATIVE_BUDGET = _env_float("SPECULATIVE_BUDGET", 1.5)
+SPECULATIVE_MAX_INFLIGHT = _env_int("SPECULATIVE_MAX_INFLIGHT", 50)
+
+# Vision image preprocessing
+IMAGE_MAX_DIMENSION = _env_int("IMAGE_MAX_DIMENSION", 1024)
+IMAGE_QUALITY = _env_int("IMAGE_QUALITY", 80)
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "JPEG").upper()  # JPEG or WEBP
+IMAGE_PASSTHROUGH_BYTES = _env_int("IMAGE_PASSTHROUGH_BYTES", 256 * 1024)
+IMAGE_WORKERS = _env_int("IMAGE_WORKERS", 2)
+IMAGE_MAX_UPLOAD_BYTES = _env_int("IMAGE_MAX_UPLOAD_BYTES", 10 * 1024 * 1024)  # larger uploads get a 413
+
+# Upstream response cache: "memory" (per process), "shared" (SQLite on tmpfs,
+# shared by every worker on the host) or "redis" (needs the redis package)
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+SHARED_CACHE_PATH = os.getenv(
+    "SHARED_CACHE_PATH",
+    os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else "/tmp", "snapaid-cache.sqlite3"),
+)
+RESPONSE_CACHE_SIZE = _env_int("RESPONSE_CACHE_SIZE", 10000)
+RESPONSE_CACHE_GEOHASH_PRECISION = _env_int("RESPONSE_CACHE_GEOHASH_PRECISION", 6)
+# service -> (fresh seconds, extra seconds a stale entry may be served while revalidating)
+RESPONSE_CACHE_TTLS = {
+    "arcgis": (
+        _env_float("ARCGIS_CACHE_TTL_SECONDS", 6 * 60 * 60),
+        _env_float("ARCGIS_CACHE_STALE_SECONDS", 24 * 60 * 60),
+    ),
+}
+
+# Local mirror of the CDPH healthcare facility layer
+FACILITY_DB_PATH = os.getenv(
+    "FACILITY_DB_PATH",
+    os.path.join(os.path.dirname(__file__), "data", "facilities.sqlite3"),
+)
+FACILITY_SYNC_SECONDS = _env_float("FACILITY_SYNC_SECONDS", 60 * 60)
+FACILITY_FULL_SYNC_SECONDS = _env_float("FACILITY_FULL_SYNC_SECONDS", 24 * 60 * 60)
+FACILITY_SYNC_PAGE_SIZE = _env_int("FACILITY_SYNC_PAGE_SIZE", 1000)
+
+# Bounded thread pool for blocking work (parsing, file and SQLite I/O)
+BLOCKING_POOL_SIZE = _env_int("BLOCKING_POOL_SIZE", 8)
+# Event-loop stall detection; 0 disables the monitor
+LOOP_BLOCK_THRESHOLD_MS = _env_float("LOOP_BLOCK_THRESHOLD_MS", 0)
+
+# Production launcher (serve.py)
+SERVER_HOST = os.getenv("HOST", "0.0.0.0")
+SERVER_PORT = _env_int("PORT", 8000)
+WEB_CONCURRENCY = _env_int("WEB_CONCURRENCY", os.cpu_count() or 1)
+
+# Worker warmup (app/main.py): a failing step is retried with exponential
+# backoff, then skipped so the worker still becomes ready, marked degraded
+WARMUP_ATTEMPTS = _env_int("WARMUP_ATTEMPTS", 3)
+WARMUP_RETRY_SECONDS = _env_float("WARMUP_RETRY_SECONDS", 2.0)
+
+# Level for the app's own loggers (DEBUG, INFO, WARNING, ...)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# Tracing: fraction of requests whose span breakdown is logged as one JSON line.
+# Metrics at /metrics cover every request regardless of sampling.
+TRACE_SAMPLE_RATE = _env_float("TRACE_SAMPLE_RATE", 0.01)
+# Let clients send "X-Debug-Trace: 1" to get the span breakdown back in Server-Timing
+TRACE_DEBUG_HEADER = os.getenv("TRACE_DEBUG_HEADER", "1") == "1"
+
+# Upstream resilience (app/utils/http_client.py). Read timeouts adapt to each
+# upstream's observed latency: TIMEOUT_MULTIPLIER x the TIMEOUT_PERCENTILE
+# latency, never below TIMEOUT_MIN_SECONDS or above the upstream's ceiling.
+TIMEOUT_PERCENTILE = _env_float("TIMEOUT_PERCENTILE", 99)
+TIMEOUT_MULTIPLIER = _env_float("TIMEOUT_MULTIPLIER", 3.0)
+TIMEOUT_MIN_SECONDS = _env_float("TIMEOUT_MIN_SECONDS", 1.0)
+LATENCY_WINDOW_SIZE = _env_int("LATENCY_WINDOW_SIZE", 200)
+LATENCY_MIN_SAMPLES = _env_int("LATENCY_MIN_SAMPLES", 20)
+# Hedging: send a second copy of a slow idempotent request once it passes this percentile
+HEDGING_ENABLED = os.getenv("HEDGING_ENABLED", "1") == "1"
+HEDGE_PERCENTILE = _env_float("HEDGE_PERCENTILE", 95)
+# Retries of idempotent requests: full-jitter exponential backoff
+RETRY_BASE_DELAY_SECONDS = _env_float("RETRY_BASE_DELAY_SECONDS", 0.1)
+RETRY_MAX_DELAY_SECONDS = _env_float("RETRY_MAX_DELAY_SECONDS", 1.0)
+# Circuit breaker: open after this many consecutive failures, probe again after the reset time
+BREAKER_FAILURE_THRESHOLD = _env_int("BREAKER_FAILURE_THRESHOLD", 5)
+BREAKER_RESET_SECONDS = _env_float("BREAKER_RESET_SECONDS", 30)
+# How long past its stale window a cached response may still be served while its upstream fails
+RESPONSE_CACHE_STALE_IF_ERROR_SECONDS = _env_float("RESPONSE_CACHE_STALE_IF_ERROR_SECONDS", 6 * 60 * 60)
+
+# Gemini gateway (app/services/gemini_gateway.py). Limits are per worker
+# process: divide the project quota by WEB_CONCURRENCY.
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_TEXT_MODEL = os.getenv("GEMINI_TEXT_MODEL", "gemini-2.0-flash-001")
+GEMINI_VISION_MODEL = os.getenv("GEMINI_VISION_MODEL", "gemini-2.5-pro-preview-03-25")
+GEMINI_TEXT_RPM = _env_float("GEMINI_TEXT_RPM", 1000)
+GEMINI_VISION_RPM = _env_float("GEMINI_VISION_RPM", 150)
+GEMINI_BURST = _env_int("GEMINI_BURST", 10)
+GEMINI_MAX_CONCURRENCY = _env_int("GEMINI_MAX_CONCURRENCY", 20)
+# How long a call may queue for quota before failing instead of hitting a 429
+GEMINI_QUEUE_TIMEOUT_SECONDS = _env_float("GEMINI_QUEUE_TIMEOUT_SECONDS", 10)
+# Pause for this long after a 429 when the response does not say how long to wait
+GEMINI_RATE_LIMIT_BACKOFF_SECONDS = _env_float("GEMINI_RATE_LIMIT_BACKOFF_SECONDS", 5)
+
+# Semantic answer cache for Gemini-backed workflows (app/utils/semantic_cache.py)
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "1") == "1"
+# Cosine similarity a new prompt needs with a cached one to reuse its answer
+SEMANTIC_CACHE_THRESHOLD = _env_float("SEMANTIC_CACHE_THRESHOLD", 0.85)
+SEMANTIC_CACHE_SIZE = _env_int("SEMANTIC_CACHE_SIZE", 1000)  # entries per namespace
+SEMANTIC_CACHE_MAX_NAMESPACES = _env_int("SEMANTIC_CACHE_MAX_NAMESPACES", 256)
+# Physical-resource answers are shared within a geohash cell (precision 5 is about 5 km)
+SEMANTIC_CACHE_GEOHASH_PRECISION = _env_int("SEMANTIC_CACHE_GEOHASH_PRECISION", 5)
+# Answer lifetime per workflow letter
+SEMANTIC_CACHE_TTLS = {
+    "B": _env_float("SEMANTIC_CACHE_TTL_MEDICAL", 24 * 60 * 60),
+    "G": _env_float("SEMANTIC_CACHE_TTL_RESOURCES", 6 * 60 * 60),
+}
+
+# Conversation sessions (app/services/sessions.py): "memory" (per process) or
+# "shared" (SQLite key-value file shared by every worker on the host)
+SESSION_STORE_BACKEND = os.getenv("SESSION_STORE_BACKEND", "memory")
+SESSION_STORE_PATH = os.getenv(
+    "SESSION_STORE_PATH",
+    os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else "/tmp", "snapaid-sessions.sqlite3"),
+)
+SESSION_STORE_SIZE = _env_int("SESSION_STORE_SIZE", 10000)
+SESSION_TTL_SECONDS = _env_float("SESSION_TTL_SECONDS", 30 * 60)
+# A follow-up within this distance of the last turn reuses its ZIP and results
+SESSION_MOVE_THRESHOLD_MILES = _env_float("SESSION_MOVE_THRESHOLD_MILES", 0.1)
+# Location results older than this are looked up again even if the user has not moved
+SESSION_RESULT_MAX_AGE_SECONDS = _env_float("SESSION_RESULT_MAX_AGE_SECONDS", 5 * 60)
+
+# EasyVax availability snapshots (app/services/pharmacy.py): the most requested
+# ZIPs are re-queried in the background so /find_pharmacy answers from memory
+EASYVAX_SNAPSHOT_INTERVAL_SECONDS = _env_float("EASYVAX_SNAPSHOT_INTERVAL_SECONDS", 60)
+EASYVAX_SNAPSHOT_ZIPS = _env_int("EASYVAX_SNAPSHOT_ZIPS", 25)
+# A snapshot older than this (e.g. refreshes failing) is not served
+EASYVAX_SNAPSHOT_MAX_AGE_SECONDS = _env_float("EASYVAX_SNAPSHOT_MAX_AGE_SECONDS", 10 * 60)
+EASYVAX_SNAPSHOT_CONCURRENCY = _env_int("EASYVAX_SNAPSHOT_CONCURRENCY", 4)
+# Request counts per ZIP halve over this period, so the hot set follows current demand
+EASYVAX_DEMAND_HALF_LIFE_SECONDS = _env_float("EASYVAX_DEMAND_HALF_LIFE_SECONDS", 60 * 60)
+
+# Include raw upstream payloads (e.g. the full Gemini vision response) in API
+# responses; for debugging only, they are large
+INCLUDE_UPSTREAM_PAYLOADS = os.getenv("INCLUDE_UPSTREAM_PAYLOADS", "0") == "1"
+
+# Admission control (app/utils/admission.py), per worker process. Workflow
+# letters as in determine_workflow; lower priorities are served first.
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+ADMISSION_MAX_CONCURRENCY = _env_int("ADMISSION_MAX_CONCURRENCY", 64)
+# Slots only injury (priority 0) requests may take
+ADMISSION_RESERVED_SLOTS = _env_int("ADMISSION_RESERVED_SLOTS", 8)
+ADMISSION_MAX_QUEUE = _env_int("ADMISSION_MAX_QUEUE", 256)
+ADMISSION_PRIORITIES = {"A": 0, "B": 1, "E": 1, "C": 2, "D": 2, "F": 2, "G": 2}
+# Requests of each workflow running at once
+ADMISSION_WORKFLOW_LIMITS = {
+    "A": _env_int("ADMISSION_LIMIT_INJURY", 48),
+    "B": _env_int("ADMISSION_LIMIT_MEDICAL", 32),
+    "C": _env_int("ADMISSION_LIMIT_SHELTER", 32),
+    "D": _env_int("ADMISSION_LIMIT_PHARMACY", 32),
+    "E": _env_int("ADMISSION_LIMIT_FACILITIES", 32),
+    "F": _env_int("ADMISSION_LIMIT_RESTROOM", 32),
+    "G": _env_int("ADMISSION_LIMIT_RESOURCES", 16),
+}
+# Longest a request of each priority waits for a slot before it is shed
+ADMISSION_QUEUE_TIMEOUTS = {
+    0: _env_float("ADMISSION_QUEUE_TIMEOUT_URGENT_SECONDS", 10),
+    1: _env_float("ADMISSION_QUEUE_TIMEOUT_MEDICAL_SECONDS", 5),
+    2: _env_float("ADMISSION_QUEUE_TIMEOUT_SECONDS", 2),
+}
+ADMISSION_MAX_RETRY_AFTER_SECONDS = _env_float("ADMISSION_MAX_RETRY_AFTER_SECONDS", 30)
@@ -1,12 +1,193 @@
+import asyncio
+import logging
+import sys
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse
+
+from app.api.routes import ROUTE_WORKFLOWS, router
+from app.config import LOG_LEVEL, WARMUP_ATTEMPTS, WARMUP_RETRY_SECONDS
+from app.services.facilities import facility_mirror
+from app.services.gemini import CLASSIFIER_INSTRUCTION, GEMINI_VISION_API_URL, WEB_SEARCH_INSTRUCTION
+from app.services.gemini_gateway import gemini_gateway
+from app.services.pharmacy import pharmacy_snapshots
+from app.services.restroom import restroom_store
+from app.services.router import workflow_router
+from app.services.shelter import shelter_directory
+from app.utils.admission import AdmissionMiddleware, Overloaded, admission, overloaded_response
+from app.utils.executors import install_default_executor, shutdown_pools
+from app.utils.geocode import reverse_geocoder
+from app.utils.http_client import UPSTREAM_EVENTS, close_http_client, prime, start_http_client, upstream_stats
+from app.utils.loop_monitor import loop_monitor
+from app.utils.response_cache import response_cache
+from app.utils.semantic_cache import semantic_cache
+from app.utils.tracing import TracingMiddleware, metrics, trace_logger
+
+logger = logging.getLogger(__name__)
+
+
+def configure_logging() -> None:
+    """Log the app's messages to stderr and sampled traces to stdout, one JSON line each."""
+    app_logger = logging.getLogger("app")
+    if app_logger.handlers:
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    app_logger.addHandler(handler)
+    app_logger.setLevel(LOG_LEVEL)
+    app_logger.propagate = False
+
+    trace_handler = logging.StreamHandler(sys.stdout)
+    trace_handler.setFormatter(logging.Formatter("%(message)s"))
+    trace_logger.addHandler(trace_handler)
+    trace_logger.setLevel(logging.INFO)
+    trace_logger.propagate = False
+
+
+configure_logging()
+
+# Upstreams the first requests talk to, connected during warmup so they skip the TCP/TLS handshake
+WARM_CONNECTIONS = {
+    "gemini": GEMINI_VISION_API_URL,
+    "easyvax": "https://api.easyvax.com/",
+    "positionstack": "http://api.positionstack.com/",
+}
+
+
+async def preload_datasets() -> None:
+    """
+    Load the resident datasets, skipping any that are already in memory.
+
+    serve.py calls this once in the master process before forking workers,
+    so each worker's lifespan finds them loaded and shares the pages.
+    """
+    if not reverse_geocoder.loaded:
+        await reverse_geocoder.load()
+
+    # Warm the resident datasets; requests fall back to a lazy load if this fails
+    for name, store in (("Restroom", restroom_store), ("Shelter", shelter_directory)):
+        if store.loaded:
+            continue
+        try:
+            await store.refresh()
+        except Exception as e:
+            logger.warning("%s dataset unavailable: %s", name, e)
+
+    # The facility mirror starts from its SQLite file and syncs in the background
+    if not facility_mirror.loaded:
+        try:
+            await facility_mirror.load()
+        except Exception as e:
+            logger.warning("Facility mirror unavailable: %s", e)
+
+
+async def _warm_step(name: str, step: Callable[[], Awaitable[None]], degraded: list) -> None:
+    """Run one warmup step, retrying with exponential backoff; give up by marking it degraded."""
+    delay = WARMUP_RETRY_SECONDS
+    for attempt in range(1, WARMUP_ATTEMPTS + 1):
+        try:
+            await step()
+            return
+        except Exception as e:
+            if attempt == WARMUP_ATTEMPTS:
+                logger.error("Warmup step %s failed %d times; continuing without it: %s", name, attempt, e)
+                degraded.append(name)
+                return
+            logger.warning("Warmup step %s failed (attempt %d), retrying in %.1fs: %s", name, attempt, delay, e)
+            await asyncio.sleep(delay)
+            delay *= 2
+
 
-from app.api.routes import router
+async def warmup(background: list, degraded: list) -> None:
+    """
+    Get a worker ready for traffic; /readyz reports ready once this finishes.
+
+    Runs after the server starts accepting connections, so /healthz answers
+    straight away. Requests arriving before it is done load what they need
+    lazily. A step that keeps failing is named in `degraded` instead of
+    holding readiness back; requests load that part lazily too. The refresh
+    loops start afterwards, from the loaded copies.
+    """
+    await asyncio.gather(
+        _warm_step("datasets", preload_datasets, degraded),
+        _warm_step(
+            "gemini",
+            lambda: gemini_gateway.warmup(("", CLASSIFIER_INSTRUCTION, WEB_SEARCH_INSTRUCTION)),
+            degraded,
+        ),
+        _warm_step("connections", lambda: prime(WARM_CONNECTIONS), degraded),
+    )
+    background.extend([
+        asyncio.create_task(restroom_store.run_refresh_loop()),
+        asyncio.create_task(shelter_directory.run_refresh_loop()),
+        asyncio.create_task(facility_mirror.run_sync_loop()),
+        asyncio.create_task(pharmacy_snapshots.run_refresh_loop()),
+    ])
+    if degraded:
+        logger.warning("Warmup finished; degraded: %s", ", ".join(degraded))
+    else:
+        logger.info("Warmup finished")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    install_default_executor()
+    if loop_monitor is not None:
+        loop_monitor.start()
+    await start_http_client()
+
+    refresh_tasks = []
+    app.state.warmup_degraded = []
+    app.state.warmup = asyncio.create_task(warmup(refresh_tasks, app.state.warmup_degraded))
+    try:
+        yield
+    finally:
+        app.state.warmup.cancel()
+        for task in refresh_tasks:
+            task.cancel()
+        await reverse_geocoder.save()
+        await close_http_client()
+        if loop_monitor is not None:
+            loop_monitor.stop()
+        shutdown_pools()
+
+
+def _collect_counters():
+    """Existing in-process counters, exported alongside the span metrics."""
+    for event, value in response_cache.stats().items():
+        yield "snapaid_response_cache_events_total", {"event": event}, value
+    for event, value in workflow_router.counters.items():
+        yield "snapaid_router_events_total", {"event": event}, value
+    for event, value in pharmacy_snapshots.counters.items():
+        yield "snapaid_pharmacy_snapshot_events_total", {"event": event}, value
+    for event, value in semantic_cache.counters.items():
+        yield "snapaid_semantic_cache_events_total", {"event": event}, value
+    for event, value in gemini_gateway.counters.items():
+        yield "snapaid_gemini_gateway_events_total", {"event": event}, value
+    for workflow, events in admission.events.items():
+        for event, value in events.items():
+            yield "snapaid_admission_events_total", {"workflow": workflow, "event": event}, value
+    for upstream, stats in upstream_stats().items():
+        for event, value in stats.items():
+            if event in UPSTREAM_EVENTS:
+                yield "snapaid_upstream_events_total", {"upstream": upstream, "event": event}, value
+    if loop_monitor is not None:
+        yield "snapaid_event_loop_stalls_total", {}, loop_monitor.blocked_count
+
+
+metrics.register_collector(_collect_counters)
 
 
 def create_app():
-    app = FastAPI()
-    
+    app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+
+    # Shed single-workflow requests before they are parsed. Added first, so it
+    # runs inside CORS and 503s still carry the CORS headers.
+    app.add_middleware(AdmissionMiddleware, controller=admission, routes=ROUTE_WORKFLOWS)
+
     # Configure CORS
     app.add_middleware(
         CORSMiddleware,
@@ -14,11 +195,37 @@ def create_app():
         allow_credentials=True,
         allow_methods=["*"],  # Allows all methods
         allow_headers=["*"],  # Allows all headers
+        expose_headers=["Server-Timing", "X-Trace-Id", "Retry-After"],
     )
-    
+    # Outermost, so request timings include the other middleware
+    app.add_middleware(TracingMiddleware)
+
+    @app.exception_handler(Overloaded)
+    async def shed_request(request, exc: Overloaded):
+        return overloaded_response(exc)
+
     # Include routers
     app.include_router(router)
-    
+
+    @app.get("/healthz", include_in_schema=False)
+    async def healthz():
+        """Liveness: the process is up and serving its event loop."""
+        return {"status": "ok"}
+
+    @app.get("/readyz", include_in_schema=False)
+    async def readyz():
+        """Readiness: warmup has finished, so requests are served at full speed."""
+        task = getattr(app.state, "warmup", None)
+        if task is None or not task.done() or task.cancelled() or task.exception() is not None:
+            return ORJSONResponse({"status": "warming up"}, status_code=503)
+        if app.state.warmup_degraded:
+            return {"status": "ready", "degraded": app.state.warmup_degraded}
+        return {"status": "ready"}
+
+    @app.get("/metrics", include_in_schema=False)
+    async def prometheus_metrics():
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
     return app
 
-app = create_app() 
\ No newline at end of file
+app = create_app()
@@ -1,10 +1,16 @@
-from pydantic import BaseModel
+from typing import Any, Dict, List, Literal, Optional, Union
+
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class LocationRequest(BaseModel):
     latitude: float
     longitude: float 
 
+class FacilityRequest(LocationRequest):
+    limit: int = Field(5, ge=1, le=50)
+    facility_types: Optional[List[str]] = None  # FAC_FDR values, e.g. "CLINIC"
+
 class HealthcareFacility(BaseModel):
     name: str
     type: str
@@ -14,12 +20,98 @@ class Shelter(BaseModel):
     name: str
     address: str
     phone: str
-    distance: float
     latitude: float
     longitude: float
+    distance_miles: float
 
 class OrchestrationRequest(BaseModel):
     user_prompt: str
     latitude: float
     longitude: float
-    image_surroundings: str = None  # Base64 encoded image
\ No newline at end of file
+    image_surroundings: str = None  # Base64 encoded image
+    speculative: Optional[bool] = None  # None uses the server default
+    # Echo the sessionId of an earlier response to continue that conversation
+    session_id: Optional[str] = Field(None, alias="sessionId", max_length=128)
+
+    model_config = ConfigDict(populate_by_name=True)
+
+BatchIntent = Literal["restroom", "shelter", "pharmacy", "healthcare_facilities"]
+
+class BatchRequest(FacilityRequest):
+    intents: List[BatchIntent] = Field(..., min_length=1)  # resolved concurrently for one location
+
+
+# Responses. Field names are the wire keys. Every workflow response carries the
+# sessionId; on failure `error` is set instead of the payload. None fields are
+# left out of the JSON.
+
+class SessionResponse(BaseModel):
+    sessionId: str
+    error: Optional[str] = None
+    message: Optional[str] = None
+    degraded: Optional[bool] = None  # an earlier answer, served because the server was saturated
+
+class AnswerResponse(SessionResponse):
+    """Gemini text answer (physical injury, internal medical)."""
+    response: Optional[str] = None
+    raw: Optional[Dict[str, Any]] = None  # upstream payload, only with INCLUDE_UPSTREAM_PAYLOADS=1
+
+class Coordinates(BaseModel):
+    latitude: float
+    longitude: float
+
+class ResourceAnswerResponse(AnswerResponse):
+    """Gemini answer about physical resources near the caller."""
+    location: Optional[Coordinates] = None
+
+class AppointmentDay(BaseModel):
+    date: str
+    times: List[str]
+
+class PharmacyResponse(SessionResponse):
+    locationName: Optional[str] = None
+    address: Optional[str] = None
+    city: Optional[str] = None
+    state: Optional[str] = None
+    zip: Optional[str] = None
+    appointments: Optional[List[AppointmentDay]] = None
+    distance_miles: Optional[float] = None
+
+class GeoPoint(BaseModel):
+    type: str = "Point"
+    coordinates: List[float]  # [longitude, latitude]
+
+class Restroom(BaseModel):
+    facility: str
+    gender: str
+    toilets: int
+    urinals: int
+    faucets: int
+    location: GeoPoint
+    distance_miles: float
+
+class RestroomResponse(SessionResponse):
+    nearestRestroom: Optional[Restroom] = None
+
+class HealthcareFacilitiesResponse(SessionResponse):
+    facilities: Optional[List[HealthcareFacility]] = None
+
+class ShelterResponse(SessionResponse):
+    zipCode: Optional[str] = None
+    nearest_resource: Optional[Shelter] = None
+
+OrchestrationResponse = Union[
+    AnswerResponse,
+    ResourceAnswerResponse,
+    PharmacyResponse,
+    RestroomResponse,
+    HealthcareFacilitiesResponse,
+    ShelterResponse,
+]
+
+class BatchResponse(BaseModel):
+    sessionId: str
+    zipCode: Optional[str] = None
+    # intent -> that intent's response fields plus "error" (null on success) and "latency_ms"
+    results: Dict[str, Dict[str, Any]]
+    latency_ms: float
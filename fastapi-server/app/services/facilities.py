@@ -0,0 +1,254 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.config import (
+    FACILITY_DB_PATH,
+    FACILITY_FULL_SYNC_SECONDS,
+    FACILITY_SYNC_PAGE_SIZE,
+    FACILITY_SYNC_SECONDS,
+    SPATIAL_CELL_DEGREES,
+)
+from app.utils import http_client
+from app.utils.executors import run_blocking
+from app.utils.spatial import GridIndex
+
+logger = logging.getLogger(__name__)
+
+CDPH_LAYER_URL = "https://services.arcgis.com/RmCCgQtiZLDCtblq/ArcGIS/rest/services/CDPH_Healthcare_Facilities/FeatureServer/0"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS facilities (
+    objectid INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    edited_at INTEGER
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+FacilityRow = Tuple[int, str, str, float, float, Optional[int]]
+
+
+class FacilityDatabase:
+    """SQLite file holding the mirrored facility layer; all methods are blocking."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path)
+        try:
+            with conn:  # commit on success, roll back on error
+                conn.executescript(_SCHEMA)
+                yield conn
+        finally:
+            conn.close()
+
+    def load(self) -> List[FacilityRow]:
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT objectid, name, type, latitude, longitude, edited_at FROM facilities"
+            ).fetchall()
+
+    def upsert(self, rows: Iterable[FacilityRow], replace_all: bool = False) -> None:
+        with self._connect() as conn:
+            if replace_all:
+                conn.execute("DELETE FROM facilities")
+            conn.executemany("INSERT OR REPLACE INTO facilities VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def get_state(self, key: str) -> Optional[str]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_state(self, key: str, value: str) -> None:
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?)", (key, value))
+
+
+async def _layer_info() -> Dict[str, Any]:
+    response = await http_client.get("arcgis", CDPH_LAYER_URL, params={"f": "json"})
+    response.raise_for_status()
+    return response.json()
+
+
+async def _query_pages(where: str, out_fields: List[str], page_size: int) -> List[Dict[str, Any]]:
+    """Page through every feature matching `where`, ordered by object ID."""
+    features: List[Dict[str, Any]] = []
+    offset = 0
+    while True:
+        params = {
+            "f": "json",
+            "where": where,
+            "outFields": ",".join(out_fields),
+            "returnGeometry": True,
+            "outSR": 4326,
+            "orderByFields": f"{out_fields[0]} ASC",
+            "resultOffset": offset,
+            "resultRecordCount": page_size,
+        }
+        response = await http_client.get("arcgis", f"{CDPH_LAYER_URL}/query", params=params)
+        response.raise_for_status()
+        data = response.json()
+        if "error" in data:
+            raise RuntimeError(f"ArcGIS query error: {data['error']}")
+
+        page = data.get("features", [])
+        features.extend(page)
+        offset += len(page)
+        if not page or not (data.get("exceededTransferLimit") or len(page) >= page_size):
+            return features
+
+
+class FacilityMirror:
+    """
+    Local mirror of the CDPH healthcare facility layer with on-box k-nearest queries.
+
+    Features are paged from ArcGIS into SQLite, fetching only the fields we use.
+    Syncs are incremental on the layer's edit-date field when it has one, with a
+    periodic full resync to drop deleted facilities.
+    """
+
+    def __init__(self, db: FacilityDatabase):
+        self.db = db
+        self.facilities: List[Dict[str, Any]] = []
+        self.index: Optional[GridIndex] = None
+        self._type_indexes: Dict[str, Tuple[List[int], GridIndex]] = {}
+        self._rows: Dict[int, FacilityRow] = {}
+        self._lock = asyncio.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.index is not None and len(self.index) > 0
+
+    def _rebuild(self, rows: Dict[int, FacilityRow]) -> None:
+        ordered = list(rows.values())
+        facilities = [{"name": r[1], "type": r[2]} for r in ordered]
+        lats = [r[3] for r in ordered]
+        lons = [r[4] for r in ordered]
+
+        type_indexes = {}
+        by_type: Dict[str, List[int]] = {}
+        for i, facility in enumerate(facilities):
+            by_type.setdefault(facility["type"], []).append(i)
+        for facility_type, members in by_type.items():
+            type_indexes[facility_type] = (
+                members,
+                GridIndex([lats[i] for i in members], [lons[i] for i in members], SPATIAL_CELL_DEGREES),
+            )
+
+        self._rows = rows
+        self.facilities, self.index = facilities, GridIndex(lats, lons, SPATIAL_CELL_DEGREES)
+        self._type_indexes = type_indexes
+
+    async def load(self) -> None:
+        """Build the in-memory index from the SQLite file without touching the network."""
+        rows = await run_blocking(self.db.load)
+        self._rebuild({row[0]: row for row in rows})
+        logger.info("Loaded %d facilities from %s", len(self.facilities), self.db.path)
+
+    async def sync(self, full: bool = False) -> None:
+        async with self._lock:
+            info = await _layer_info()
+            oid_field = info.get("objectIdField") or "OBJECTID"
+            edit_field = (info.get("editFieldsInfo") or {}).get("editDateField")
+            out_fields = [oid_field, "FACNAME", "FAC_FDR"] + ([edit_field] if edit_field else [])
+
+            last_full = float(await run_blocking(self.db.get_state, "last_full_sync") or 0)
+            last_edit = await run_blocking(self.db.get_state, "last_edit")
+            full = full or not edit_field or not last_edit or time.time() - last_full > FACILITY_FULL_SYNC_SECONDS
+
+            if full:
+                where = "1=1"
+            else:
+                # Edit dates come back as epoch milliseconds but are queried as timestamps
+                since = datetime.fromtimestamp(int(last_edit) / 1000, tz=timezone.utc)
+                where = f"{edit_field} > timestamp '{since:%Y-%m-%d %H:%M:%S}'"
+            features = await _query_pages(where, out_fields, FACILITY_SYNC_PAGE_SIZE)
+
+            fetched: List[FacilityRow] = []
+            for feature in features:
+                attr = feature.get("attributes", {})
+                geom = feature.get("geometry") or {}
+                if geom.get("x") is None or geom.get("y") is None:
+                    continue
+                fetched.append((
+                    int(attr[oid_field]),
+                    attr.get("FACNAME") or "Unknown Facility",
+                    attr.get("FAC_FDR") or "Unknown Type",
+                    float(geom["y"]),
+                    float(geom["x"]),
+                    attr.get(edit_field) if edit_field else None,
+                ))
+
+            await run_blocking(self.db.upsert, fetched, full)
+            rows = {} if full else dict(self._rows)
+            rows.update((row[0], row) for row in fetched)
+
+            edits = [row[5] for row in rows.values() if row[5] is not None]
+            if edits:
+                await run_blocking(self.db.set_state, "last_edit", str(max(edits)))
+            if full:
+                await run_blocking(self.db.set_state, "last_full_sync", str(time.time()))
+
+            self._rebuild(rows)
+        logger.info(
+            "%s sync fetched %d facilities; %d total",
+            "Full" if full else "Incremental", len(fetched), len(self.facilities),
+        )
+
+    async def run_sync_loop(self, interval: float = FACILITY_SYNC_SECONDS) -> None:
+        """Sync now if the mirror is empty, then on a schedule; failures keep the current copy."""
+        if not self.loaded:
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.warning("Initial sync failed: %s", e)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.warning("Sync failed: %s", e)
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        k: int = 5,
+        facility_types: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """k nearest facilities, optionally restricted to FAC_FDR types, nearest first."""
+        facilities = self.facilities
+        if not facility_types:
+            if self.index is None:
+                return []
+            matches = self.index.nearest(latitude, longitude, k)
+        else:
+            # Merge the k nearest from each requested type's own index
+            matches = []
+            for facility_type in facility_types:
+                entry = self._type_indexes.get(facility_type)
+                if entry is None:
+                    continue
+                members, index = entry
+                matches.extend((members[i], dist) for i, dist in index.nearest(latitude, longitude, k))
+            matches = sorted(matches, key=lambda m: m[1])[:k]
+
+        return [{**facilities[i], "distance": dist} for i, dist in matches]
+
+
+facility_mirror = FacilityMirror(FacilityDatabase(FACILITY_DB_PATH))
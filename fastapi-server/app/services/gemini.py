@@ -1,21 +1,15 @@
-import os
-from typing import Literal
-import base64
+from typing import AsyncIterator, Literal, Optional, Tuple
 import json
-import uuid
 import httpx
-from google import generativeai as genai
-from dotenv import load_dotenv
 from enum import Enum
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-GEMINI_VISION_API_URL = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-pro-preview-03-25:generateContent"
+from app.config import GEMINI_API_KEY, GEMINI_VISION_MODEL
+from app.services.gemini_gateway import gemini_gateway
+from app.utils import http_client
+from app.utils.tracing import span
 
-# Load environment variables
-load_dotenv()
-
-# Configure Gemini
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+GEMINI_VISION_API_URL = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_VISION_MODEL}:generateContent"
+GEMINI_VISION_STREAM_URL = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_VISION_MODEL}:streamGenerateContent"
 
 WorkflowType = Literal["A", "B", "C", "D", "E", "F", "G"]
 
@@ -24,37 +18,41 @@ class Workflow_Prompt(Enum):
     NONPHYSICAL = """You are to help homeless people get healthcare support. The current user has a non-physical medical issue. 
     Help them solve it. Keep response under 100 tokens! and no formatting, lists, of parenthesis. response as if you're talking."""
 
-async def determine_workflow(user_prompt: str) -> WorkflowType:
+CLASSIFIER_INSTRUCTION = """You are an orchestration agent for an app to help homeless people get healthcare support.
+Based on the following conversation, decide which of the following categories best fits and return ONLY the corresponding letter:
+
+A: Physical injury (visible wounds, broken bones, etc.)
+B: Internal medical problem (non-physical issues like fever, pain, mental health, etc.)
+C: Resource locator - shelter
+D: Resource locator - pharmacy (any sort of vaccines, purchasing drugs, talking to a pharmacist, etc.)
+E: Resource locator - medical center
+F: Resource locator - washroom
+G: Resource locator - physical resource (clothing, food, etc.)
+
+Return ONLY the single letter (A-G) that best matches the user's needs."""
+
+WEB_SEARCH_INSTRUCTION = """You are helping a homeless person find physical resources they need.
+Please provide information about where they can find this resource nearby.
+Keep the response under 100 tokens and write as if you're talking directly to them."""
+
+async def determine_workflow(user_prompt: str, previous: Optional[WorkflowType] = None) -> WorkflowType:
     """
     Use Gemini to determine which workflow to execute based on the user's prompt.
     
     Args:
         user_prompt: The user's input prompt
+        previous: The conversation's previous workflow, if any, given as context
         
     Returns:
         A single letter indicating the workflow type (A-G)
     """
-    model = genai.GenerativeModel('gemini-2.0-flash-001')
-    
-    prompt = f"""
-    You are an orchestration agent for an app to help homeless people get healthcare support.
-    Based on the following conversation, decide which of the following categories best fits and return ONLY the corresponding letter:
-    
-    A: Physical injury (visible wounds, broken bones, etc.)
-    B: Internal medical problem (non-physical issues like fever, pain, mental health, etc.)
-    C: Resource locator - shelter
-    D: Resource locator - pharmacy (any sort of vaccines, purchasing drugs, talking to a pharmacist, etc.)
-    E: Resource locator - medical center
-    F: Resource locator - washroom
-    G: Resource locator - physical resource (clothing, food, etc.)
-    
-    User prompt: {user_prompt}
-    
-    Return ONLY the single letter (A-G) that best matches the user's needs.
-    """
-    
-    response = model.generate_content(prompt)
-    workflow_type = response.text.strip().upper()
+    prompt = f"User prompt: {user_prompt}"
+    if previous is not None:
+        prompt = (
+            f"Previous category: {previous} (context only; pick it again only if the user is "
+            f"continuing that request)\n{prompt}"
+        )
+    workflow_type = (await gemini_gateway.generate(CLASSIFIER_INSTRUCTION, prompt)).upper()
     
     # Validate the response
     if workflow_type not in ["A", "B", "C", "D", "E", "F", "G"]:
@@ -63,32 +61,17 @@ async def determine_workflow(user_prompt: str) -> WorkflowType:
     return workflow_type 
 
 async def get_general_gemini_response(user_prompt: str, workflow_prompt: Workflow_Prompt) -> str:
-    model = genai.GenerativeModel("gemini-2.0-flash-001",)
+    with span("gemini.generate") as s:
+        text = await gemini_gateway.generate(workflow_prompt.value.strip(), f"User prompt: {user_prompt}")
+        s.set(bytes=len(text))
+    return text
 
-    prompt = f"""
-    {workflow_prompt.value} 
-    
-    User prompt: {user_prompt}
-    """ 
-    response = await model.generate_content_async(prompt)
-    
-    return response.text.strip()
-
-async def send_vision_prompt(prompt: str, image_bytes: bytes, mime_type: str = "image/jpeg"):
-    """
-    Send a prompt and image to Gemini 2.5 Vision API and return the response text.
-    """
-    print("Preparing payload for Gemini Vision API...")
+def stream_general_gemini_response(user_prompt: str, workflow_prompt: Workflow_Prompt) -> AsyncIterator[str]:
+    """Yield text chunks of the general Gemini response as they are generated."""
+    return gemini_gateway.stream(workflow_prompt.value.strip(), f"User prompt: {user_prompt}", name="gemini.generate")
 
-    if not GEMINI_API_KEY:
-        raise ValueError("GEMINI_API_KEY environment variable is not set")
-    
-    session_id = str(uuid.uuid4())
-    
-    # Encode image to base64
-    base64_image = base64.b64encode(image_bytes).decode("utf-8")
-    
-    payload = {
+def _vision_payload(prompt: str, image_b64: str, mime_type: str) -> dict:
+    return {
         "contents": [
             {
                 "role": "user",
@@ -97,7 +80,7 @@ async def send_vision_prompt(prompt: str, image_bytes: bytes, mime_type: str = "
                     {
                         "inline_data": {
                             "mime_type": mime_type,
-                            "data": base64_image
+                            "data": image_b64
                         }
                     }
                 ]
@@ -108,72 +91,115 @@ async def send_vision_prompt(prompt: str, image_bytes: bytes, mime_type: str = "
             "maxOutputTokens": 1024
         }
     }
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    try:
+        return float(response.headers["retry-after"])
+    except (KeyError, ValueError):
+        return None
+
+def _candidate_text(response_data: dict) -> str:
+    """Text of the first candidate's first part, or "" if the shape is unexpected."""
+    candidates = response_data.get("candidates") or []
+    parts = (candidates[0].get("content") or {}).get("parts") if candidates else None
+    if not parts:
+        return ""
+    return parts[0].get("text", "")
+
+async def send_vision_prompt(prompt: str, image_b64: str, mime_type: str = "image/jpeg") -> Tuple[str, dict]:
+    """
+    Send a prompt and base64 image to Gemini 2.5 Vision API.
+
+    Returns the response text and the raw response payload; raises on
+    transport and API errors.
+    """
+    if not GEMINI_API_KEY:
+        raise ValueError("GEMINI_API_KEY environment variable is not set")
+    
+    payload = _vision_payload(prompt, image_b64, mime_type)
     
     headers = {
         "Content-Type": "application/json",
         "x-goog-api-key": GEMINI_API_KEY
     }
 
-    try:
-        print(f"Sending request to Gemini API session={session_id}...")
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                GEMINI_VISION_API_URL,
-                headers=headers,
-                json=payload,
-                timeout=30.0
-            )
-
-            print(f"Received response status: {response.status_code}")
-            if response.status_code != 200:
-                error_message = f"Gemini API Error {response.status_code}: {response.text}"
-                print(error_message)
-                return {"error": error_message}
-
-            response_data = response.json()
-
-            # Extract main response text
-            text_response = ""
-            if (response_data.get("candidates")
-                and len(response_data["candidates"]) > 0
-                and response_data["candidates"][0].get("content")
-                and response_data["candidates"][0]["content"].get("parts")
-                and len(response_data["candidates"][0]["content"]["parts"]) > 0):
-                text_response = response_data["candidates"][0]["content"]["parts"][0].get("text", "")
-            else:
-                print("Warning: Unexpected Gemini API response structure")
-                print(json.dumps(response_data, indent=2))
-
-            return {
-                "sessionId": session_id,
-                "response": text_response,
-                "full_response": response_data
-            }
+    with span("vision", bytes=len(image_b64), mime_type=mime_type) as s:
+        async with gemini_gateway.slot(GEMINI_VISION_MODEL):
+            try:
+                response = await http_client.post(
+                    "gemini",
+                    GEMINI_VISION_API_URL,
+                    headers=headers,
+                    json=payload,
+                )
+            except httpx.RequestError as e:
+                raise RuntimeError(f"HTTP Request error: {e}") from e
+        s.set(status=response.status_code)
+
+        if response.status_code == 429:
+            gemini_gateway.rate_limited(GEMINI_VISION_MODEL, _retry_after(response))
+        if response.status_code != 200:
+            raise RuntimeError(f"Gemini API Error {response.status_code}: {response.text}")
+
+        response_data = response.json()
+
+        # Extract main response text
+        text_response = _candidate_text(response_data)
+        if not text_response:
+            s.set(result="unexpected_structure")
+
+    return text_response, response_data
 
-    except httpx.RequestError as e:
-        print(f"HTTP Request error: {str(e)}")
-        return {"error": f"HTTP Request error: {str(e)}"}
+def _web_search_prompt(user_prompt: str, latitude: float, longitude: float) -> str:
+    return f"""The user is located at coordinates: {latitude}, {longitude}
 
-    except Exception as e:
-        print(f"Unexpected error: {str(e)}")
-        return {"error": f"Unexpected error: {str(e)}"}
+User request: {user_prompt}"""
 
 async def web_search(user_prompt: str, latitude: float, longitude: float) -> str:
     """
     Use Gemini's web search capabilities to find physical resources near the user's location.
     """
-    model = genai.GenerativeModel("gemini-2.0-flash-001")
- 
-    prompt = f"""
-    You are helping a homeless person find physical resources they need. 
-    The user is located at coordinates: {latitude}, {longitude}
-    
-    User request: {user_prompt}
-    
-    Please provide information about where they can find this resource nearby.
-    Keep the response under 100 tokens and write as if you're talking directly to them.
+    with span("gemini.web_search") as s:
+        text = await gemini_gateway.generate(WEB_SEARCH_INSTRUCTION, _web_search_prompt(user_prompt, latitude, longitude))
+        s.set(bytes=len(text))
+    return text
+
+def stream_web_search(user_prompt: str, latitude: float, longitude: float) -> AsyncIterator[str]:
+    """Yield text chunks of the physical-resource answer as they are generated."""
+    return gemini_gateway.stream(
+        WEB_SEARCH_INSTRUCTION, _web_search_prompt(user_prompt, latitude, longitude), name="gemini.web_search"
+    )
+
+async def stream_vision_prompt(prompt: str, image_b64: str, mime_type: str = "image/jpeg") -> AsyncIterator[str]:
+    """
+    Send a prompt and image to the streaming Gemini Vision endpoint and yield text chunks.
     """
+    if not GEMINI_API_KEY:
+        raise ValueError("GEMINI_API_KEY environment variable is not set")
 
-    response = await model.generate_content_async(prompt)
-    
-    return response.text.strip()
\ No newline at end of file
+    headers = {
+        "Content-Type": "application/json",
+        "x-goog-api-key": GEMINI_API_KEY
+    }
+
+    async with gemini_gateway.slot(GEMINI_VISION_MODEL), http_client.stream(
+        "gemini",
+        "POST",
+        GEMINI_VISION_STREAM_URL,
+        params={"alt": "sse"},
+        headers=headers,
+        json=_vision_payload(prompt, image_b64, mime_type),
+    ) as response:
+        if response.status_code == 429:
+            gemini_gateway.rate_limited(GEMINI_VISION_MODEL, _retry_after(response))
+        if response.status_code != 200:
+            body = await response.aread()
+            raise RuntimeError(f"Gemini API Error {response.status_code}: {body.decode(errors='replace')}")
+
+        # Server-sent events: one JSON GenerateContentResponse per "data:" line
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            text = _candidate_text(json.loads(line[len("data:"):]))
+            if text:
+                yield text
@@ -0,0 +1,206 @@
+import asyncio
+import functools
+import inspect
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Iterable, Optional, Tuple
+
+from app.config import (
+    GEMINI_API_KEY,
+    GEMINI_BURST,
+    GEMINI_MAX_CONCURRENCY,
+    GEMINI_QUEUE_TIMEOUT_SECONDS,
+    GEMINI_RATE_LIMIT_BACKOFF_SECONDS,
+    GEMINI_TEXT_MODEL,
+    GEMINI_TEXT_RPM,
+    GEMINI_VISION_MODEL,
+    GEMINI_VISION_RPM,
+)
+from app.utils.executors import run_blocking
+from app.utils.rate_limit import RateLimitTimeout, TokenBucket
+from app.utils.tracing import span
+
+MODEL_RPM: Dict[str, float] = {
+    GEMINI_TEXT_MODEL: GEMINI_TEXT_RPM,
+    GEMINI_VISION_MODEL: GEMINI_VISION_RPM,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def load_sdk() -> Any:
+    """
+    Import and configure google.generativeai on first use.
+
+    The SDK takes about half a second to import, so it is loaded during
+    warmup rather than when the app is imported. Configuring it opens no
+    connections, so this is safe before forking workers.
+    """
+    from google import generativeai as genai
+
+    genai.configure(api_key=GEMINI_API_KEY)
+    return genai
+
+
+@functools.lru_cache(maxsize=None)
+def supports_system_instruction() -> bool:
+    # Older SDKs have no system_instruction; the instruction is then sent as a prompt prefix
+    return "system_instruction" in inspect.signature(load_sdk().GenerativeModel).parameters
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    from google.api_core.exceptions import ResourceExhausted
+
+    return isinstance(error, ResourceExhausted)
+
+
+def _chunk_text(chunk) -> str:
+    # .text raises when a chunk carries no text parts (e.g. a final safety/finish chunk)
+    try:
+        return chunk.text
+    except ValueError:
+        return ""
+
+
+class GeminiGateway:
+    """
+    Single way out to Gemini for every workflow.
+
+    Keeps one long-lived model handle per (model, system instruction), so
+    static preambles are attached once instead of rebuilt into every prompt.
+    Calls to each model share a concurrency limit and a token bucket matched
+    to the quota; excess calls queue for up to GEMINI_QUEUE_TIMEOUT_SECONDS
+    and then fail with RateLimitTimeout rather than collecting 429s. A 429
+    that slips through pauses the bucket for everyone.
+    """
+
+    def __init__(self, queue_timeout: float = GEMINI_QUEUE_TIMEOUT_SECONDS):
+        self.queue_timeout = queue_timeout
+        self.counters: Counter = Counter()
+        self._models: Dict[Tuple[str, str], Any] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def model(self, instruction: str = "", model_name: str = GEMINI_TEXT_MODEL) -> Any:
+        """The long-lived google.generativeai.GenerativeModel for `instruction`."""
+        key = (model_name, instruction)
+        model = self._models.get(key)
+        if model is None:
+            genai = load_sdk()
+            if instruction and supports_system_instruction():
+                model = genai.GenerativeModel(model_name, system_instruction=instruction)
+            else:
+                model = genai.GenerativeModel(model_name)
+            self._models[key] = model
+        return model
+
+    async def warmup(self, instructions: Iterable[str] = ("",)) -> None:
+        """Load the SDK off the event loop and build the model handles for `instructions`."""
+        await run_blocking(load_sdk)
+        for instruction in instructions:
+            self.model(instruction)
+
+    def _contents(self, instruction: str, prompt: str) -> str:
+        if instruction and not supports_system_instruction():
+            return f"{instruction}\n\n{prompt}"
+        return prompt
+
+    def _bucket(self, model_name: str) -> TokenBucket:
+        bucket = self._buckets.get(model_name)
+        if bucket is None:
+            rpm = MODEL_RPM.get(model_name, GEMINI_TEXT_RPM)
+            bucket = self._buckets[model_name] = TokenBucket(rpm / 60, GEMINI_BURST)
+        return bucket
+
+    def _semaphore(self, model_name: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(model_name)
+        if semaphore is None:
+            semaphore = self._semaphores[model_name] = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+        return semaphore
+
+    @asynccontextmanager
+    async def slot(self, model_name: str = GEMINI_TEXT_MODEL, timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """Hold quota for one call to `model_name`, queueing up to `timeout` seconds for it."""
+        timeout = self.queue_timeout if timeout is None else timeout
+        start = time.monotonic()
+        with span("gemini.queue", model=model_name) as s:
+            bucket = self._bucket(model_name)
+            semaphore = self._semaphore(model_name)
+            try:
+                await bucket.acquire(timeout)
+                try:
+                    await asyncio.wait_for(semaphore.acquire(), max(0.0, timeout - (time.monotonic() - start)))
+                except BaseException:
+                    # No call is made, so the token goes back to the next caller
+                    bucket.refund()
+                    raise
+            except (RateLimitTimeout, asyncio.TimeoutError):
+                self.counters["queue_timeouts"] += 1
+                s.set(result="timeout")
+                raise RateLimitTimeout(f"Gemini quota exhausted; no capacity within {timeout:.0f}s")
+            waited = time.monotonic() - start
+            if waited > 0.001:
+                self.counters["queued"] += 1
+                s.set(result="queued")
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+    def rate_limited(self, model_name: str, retry_after: Optional[float] = None) -> None:
+        """Record a 429 from the provider and stop handing out quota for a while."""
+        self.counters["rate_limited"] += 1
+        self._bucket(model_name).pause(retry_after or GEMINI_RATE_LIMIT_BACKOFF_SECONDS)
+
+    async def generate(self, instruction: str, prompt: str, model_name: str = GEMINI_TEXT_MODEL) -> str:
+        """Generate a complete text response; a 429 is retried once if the queue deadline allows."""
+        model = self.model(instruction, model_name)
+        contents = self._contents(instruction, prompt)
+        deadline = time.monotonic() + self.queue_timeout
+        for attempt in range(2):
+            async with self.slot(model_name, max(0.0, deadline - time.monotonic())):
+                try:
+                    response = await model.generate_content_async(contents)
+                except Exception as e:
+                    if not _is_rate_limited(e):
+                        raise
+                    self.rate_limited(model_name)
+                    if attempt or time.monotonic() >= deadline:
+                        raise
+                    continue
+            return response.text.strip()
+
+    async def stream(
+        self,
+        instruction: str,
+        prompt: str,
+        model_name: str = GEMINI_TEXT_MODEL,
+        name: str = "gemini.generate",
+    ) -> AsyncIterator[str]:
+        """Yield text chunks as they are generated; the slot is held until the stream ends."""
+        model = self.model(instruction, model_name)
+        async with self.slot(model_name):
+            # The span covers the call up to the first response, not the whole stream
+            with span(name, stream=True):
+                try:
+                    response = await model.generate_content_async(self._contents(instruction, prompt), stream=True)
+                except Exception as e:
+                    if _is_rate_limited(e):
+                        self.rate_limited(model_name)
+                    raise
+            async for chunk in response:
+                text = _chunk_text(chunk)
+                if text:
+                    yield text
+
+    def stats(self) -> Dict[str, Any]:
+        sdk_loaded = load_sdk.cache_info().currsize > 0
+        return {
+            **self.counters,
+            "models": len(self._models),
+            "sdk_loaded": sdk_loaded,
+            "system_instruction": supports_system_instruction() if sdk_loaded else None,
+        }
+
+
+gemini_gateway = GeminiGateway()
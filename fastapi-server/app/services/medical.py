@@ -1,15 +1,26 @@
-from datetime import datetime, timedelta
 import json
 
-import requests
-from app.utils.geo import haversine
+import httpx
 
+from app.services.facilities import facility_mirror
+from app.utils import http_client
+from app.utils.geo import geohash_cell_size, haversine, k_nearest
+from app.utils.response_cache import response_cache
+from app.utils.tracing import span
 
-def get_medical_care_locations(lat, lon, limit):
-    """
-    Get healthcare facilities near a given location.
-    """
-    print(f"Getting medical care locations for lat={lat}, lon={lon}, limit={limit}")
+# The ArcGIS fallback returns facilities within this distance of the user
+SEARCH_RADIUS_METERS = 5000
+METERS_PER_MILE = 1609.344
+
+
+def _cell_half_diagonal_meters(cell_lat, cell_lon):
+    """Farthest a user in the response-cache cell centred here can be from its centre."""
+    lat_span, lon_span = geohash_cell_size(response_cache.precision)
+    return haversine(cell_lon, cell_lat, cell_lon + lon_span / 2, cell_lat + lat_span / 2) * METERS_PER_MILE
+
+
+async def _query_facilities(lat, lon, radius_meters=SEARCH_RADIUS_METERS):
+    """Raw ArcGIS query; returns facility dicts with coordinates."""
     base_url = "https://services.arcgis.com/RmCCgQtiZLDCtblq/ArcGIS/rest/services/CDPH_Healthcare_Facilities/FeatureServer/0/query"
     
     # Create a point geometry with proper spatial reference
@@ -29,54 +40,73 @@ def get_medical_care_locations(lat, lon, limit):
         "inSR": 4326,
         "outSR": 4326,
         "spatialRel": "esriSpatialRelIntersects",
-        "distance": 5000,  # 5km buffer
+        "distance": radius_meters,
         "units": "esriSRUnit_Meter",
         "where": "1=1",
-        "outFields": "*",
+        "outFields": "FACNAME,FAC_FDR",
         "returnGeometry": True,
-        "resultRecordCount": limit,
         "returnDistinctValues": False,
         "returnIdsOnly": False,
         "returnCountOnly": False
     }
     
-    try:
-        print("Making request to ArcGIS...")
-        response = requests.get(base_url, params=params)
-        print(f"Response status: {response.status_code}")
-        data = response.json()
-        print(f"Got {len(data.get('features', []))} features")
-        
-        facilities = []
-        for feature in data.get("features", []):
-            attr = feature.get("attributes", {})
-            geom = feature.get("geometry")
-            if not geom:
-                continue
-            
-            facility_lat = geom.get("y")
-            facility_lon = geom.get("x")
-            
-            # Calculate distance in miles (haversine already returns miles)
-            dist = haversine(lon, lat, facility_lon, facility_lat)
-            
-            # Use the correct field names from the ArcGIS response
-            facility_name = attr.get("FACNAME", "Unknown Facility")
-            facility_type = attr.get("FAC_FDR", "Unknown Type")
-            
-            facilities.append({
-                "name": facility_name,
-                "type": facility_type,
-                "distance": dist
-            })
+    response = await http_client.get("arcgis", base_url, params=params)
+    response.raise_for_status()
+    data = response.json()
+    
+    facilities = []
+    for feature in data.get("features", []):
+        attr = feature.get("attributes", {})
+        geom = feature.get("geometry")
+        if not geom:
+            continue
         
-        # Sort by distance
-        facilities.sort(key=lambda x: x["distance"])
+        # Use the correct field names from the ArcGIS response
+        facilities.append({
+            "name": attr.get("FACNAME", "Unknown Facility"),
+            "type": attr.get("FAC_FDR", "Unknown Type"),
+            "latitude": geom.get("y"),
+            "longitude": geom.get("x"),
+        })
+    return facilities
+
+
+async def get_medical_care_locations(lat, lon, limit, facility_types=None):
+    """
+    Get healthcare facilities near a given location, optionally filtered by FAC_FDR type.
+    """
+    if facility_mirror.loaded:
+        with span("facilities.nearest", source="mirror"):
+            return facility_mirror.nearest(lat, lon, limit, facility_types)
+
+    # No local mirror yet: ask ArcGIS for everything around the cache cell.
+    # Facilities are shared by everyone in the cell, so the buffer is widened by
+    # the cell's half-diagonal to cover the search radius of any user in it;
+    # distances and the radius cut stay per user.
+    cell_lat, cell_lon = response_cache.snap(lat, lon)
+    key = response_cache.key("arcgis", lat, lon)
+    radius = SEARCH_RADIUS_METERS + _cell_half_diagonal_meters(cell_lat, cell_lon)
+    
+    try:
+        facilities = await response_cache.get_or_fetch(
+            "arcgis", key, lambda: _query_facilities(cell_lat, cell_lon, round(radius))
+        )
+        if facility_types:
+            facilities = [f for f in facilities if f["type"] in facility_types]
         
-        # Return only the nearest ones
-        result = facilities[:limit]
-        print(f"Returning {len(result)} facilities")
+        # Keep only the nearest ones (distances in miles)
+        idx, dist = k_nearest(
+            lat,
+            lon,
+            [f["latitude"] for f in facilities],
+            [f["longitude"] for f in facilities],
+            limit,
+        )
+        result = [
+            {"name": facilities[i]["name"], "type": facilities[i]["type"], "distance": d}
+            for i, d in zip(idx.tolist(), dist.tolist())
+            if d * METERS_PER_MILE <= SEARCH_RADIUS_METERS
+        ]
         return result
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching healthcare facilities: {str(e)}")
-        return {"error": f"Failed to fetch healthcare facilities: {str(e)}"}
\ No newline at end of file
+    except httpx.HTTPError as e:
+        return {"error": f"Failed to fetch healthcare facilities: {str(e)}"}
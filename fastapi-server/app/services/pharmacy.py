@@ -1,14 +1,37 @@
+import asyncio
+import hashlib
+import heapq
+import json
+import logging
+import time
+import uuid
+from collections import Counter
 from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
 
-import requests
+from app.config import (
+    EASYVAX_DEMAND_HALF_LIFE_SECONDS,
+    EASYVAX_SNAPSHOT_CONCURRENCY,
+    EASYVAX_SNAPSHOT_INTERVAL_SECONDS,
+    EASYVAX_SNAPSHOT_MAX_AGE_SECONDS,
+    EASYVAX_SNAPSHOT_ZIPS,
+)
+from app.utils import http_client
+from app.utils.cache import SingleFlight
+from app.utils.tracing import span
 
+logger = logging.getLogger(__name__)
 
-def get_easyvax_locations(zip_code: str, session_id: str):
-    """Query EasyVax API with a zip code and session ID, and return available locations."""
-    
-    # Set the start and end times (7:00 AM today to 6:59:59 AM tomorrow, UTC)
+
+def _query_window() -> Tuple[datetime, datetime]:
+    # 7:00 AM today to 6:59:59 AM tomorrow, UTC
     start_date = datetime.utcnow().replace(hour=7, minute=0, second=0, microsecond=0)
     end_date = (start_date + timedelta(days=1)).replace(hour=6, minute=59, second=59, microsecond=999999)
+    return start_date, end_date
+
+
+async def _query_easyvax(zip_code: str, session_id: str, start_date: datetime, end_date: datetime):
+    """Query EasyVax API with a zip code and session ID, and return available locations."""
 
     # Prepare request headers
     headers = {
@@ -41,31 +64,183 @@ def get_easyvax_locations(zip_code: str, session_id: str):
         f"&radius=20"
     )
 
-    # Make the GET request
-    response = requests.get(url, headers=headers)
-    print(response.json)
-    print(response.status_code)
-    try:
-        response.raise_for_status()
-        print(response.json)
-        print(response.status_code)
-    except requests.HTTPError as e:
-        print(response.json)
-        print(response.status_code)
-        print(f"[get_easyvax_locations] HTTP Error: {e}")
-        print(f"[get_easyvax_locations] Raw response: {response.text}")
-        raise
+    # Make the GET request; status and size are recorded on the upstream span
+    response = await http_client.get("easyvax", url, headers=headers)
+    response.raise_for_status()
 
     try:
-        data = response.json()
-        print(response.json)
-        print(response.status_code)
-        print(f"[get_easyvax_locations] JSON decoded successfully.")
-        return data
-    except Exception as e:
-        print(response.json)
-        print(response.status_code)
-        print(f"[get_easyvax_locations] Failed to decode JSON: {e}")
-        print(f"[get_easyvax_locations] Raw response text: {response.text}")
-        raise ValueError(f"Failed to decode JSON: {e}")
+        return response.json()
+    except ValueError as e:
+        raise ValueError(f"Failed to decode EasyVax JSON: {e}")
+
+
+
+def first_available_location(locations: Any, skip: int = 0) -> Optional[Dict[str, Any]]:
+    """The first location with any open appointment slot (after `skip` such locations), with its open days and times."""
+    if not isinstance(locations, list):
+        raise ValueError(f"Expected list, got {type(locations).__name__}: {locations}")
+
+    for loc in locations:
+        days = [day for day in loc.get('appointments') or [] if day.get('times')]
+        if days and skip:
+            skip -= 1
+        elif days:
+            return {
+                "locationName": loc.get('locationName', 'Unknown'),
+                "address": loc.get('address', 'Unknown'),
+                "city": loc.get('city', 'Unknown'),
+                "state": loc.get('state', 'Unknown'),
+                "zip": loc.get('zip', 'Unknown'),
+                "appointments": [
+                    {
+                        "date": day.get('date', 'Unknown'),
+                        "times": [slot.get('time', 'Unknown') for slot in day['times']],
+                    }
+                    for day in days
+                ],
+                "distance_miles": loc.get('distance', 0),
+            }
+    return None
+
+
+class AvailabilitySnapshots:
+    """
+    First available pharmacy per ZIP, kept current in the background for the
+    ZIPs people are asking about.
+
+    Every lookup counts towards its ZIP's demand, which decays with a
+    half-life so the hot set follows current traffic. The refresh loop
+    re-queries the top ZIPs on a short interval and only swaps a snapshot
+    when its contents changed. ZIPs without a usable snapshot are fetched
+    live once and kept from then on.
+    """
+
+    MAX_TRACKED_ZIPS = 1000
+
+    def __init__(self, hot_zips: int, max_age: float, half_life: float):
+        self.hot_zips = hot_zips
+        self.max_age = max_age
+        self.half_life = half_life
+        self.counters: Counter = Counter()
+        # zip -> (decayed request count, when it was last updated)
+        self._demand: Dict[str, Tuple[float, float]] = {}
+        # zip -> {"window", "fetched_at", "digest", "first_available"}
+        self._snapshots: Dict[str, Dict[str, Any]] = {}
+        # EasyVax wants a user id; background queries use one per process
+        self._session_id = str(uuid.uuid4())
+        self._flights = SingleFlight()
+
+    def _score(self, zip_code: str, now: float) -> float:
+        score, updated = self._demand.get(zip_code, (0.0, now))
+        return score * 0.5 ** ((now - updated) / self.half_life)
+
+    def _record_demand(self, zip_code: str) -> None:
+        now = time.time()
+        self._demand[zip_code] = (self._score(zip_code, now) + 1.0, now)
+        if len(self._demand) > self.MAX_TRACKED_ZIPS:
+            # Forget the coldest tenth at once so the scan is paid once per many new ZIPs,
+            # and never the ZIP that is being asked for right now
+            excess = len(self._demand) - self.MAX_TRACKED_ZIPS + self.MAX_TRACKED_ZIPS // 10
+            others = (z for z in self._demand if z != zip_code)
+            for coldest in heapq.nsmallest(excess, others, key=lambda z: self._score(z, now)):
+                del self._demand[coldest]
+                self._snapshots.pop(coldest, None)
+
+    def hot(self) -> List[str]:
+        """The most requested ZIPs right now, hottest first."""
+        now = time.time()
+        return sorted(self._demand, key=lambda z: self._score(z, now), reverse=True)[:self.hot_zips]
+
+    async def _fetch_live(self, zip_code: str, session_id: str) -> Optional[Dict[str, Any]]:
+        """Query EasyVax for one ZIP and keep the result; concurrent misses for a ZIP share the query."""
+        start_date, end_date = _query_window()
+        window = start_date.isoformat()
+
+        async def fetch() -> Optional[Dict[str, Any]]:
+            locations = await _query_easyvax(zip_code, session_id, start_date, end_date)
+            # Not read back from _snapshots: the ZIP may have been evicted while we awaited
+            _, first = self._store(zip_code, window, locations)
+            return first
+
+        return await self._flights.do((zip_code, window), fetch)
+
+    def _store(self, zip_code: str, window: str, locations: Any) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """Keep a fresh snapshot; returns whether its contents changed, and the first available location."""
+        first = first_available_location(locations)
+        digest = hashlib.sha1(json.dumps(first, sort_keys=True).encode()).hexdigest()
+        previous = self._snapshots.get(zip_code)
+        changed = previous is None or previous["digest"] != digest or previous["window"] != window
+        if changed:
+            self._snapshots[zip_code] = {
+                "window": window, "fetched_at": time.time(), "digest": digest, "first_available": first,
+            }
+        else:
+            previous["fetched_at"] = time.time()
+        return changed, first
+
+    async def first_available(self, zip_code: str, session_id: str) -> Optional[Dict[str, Any]]:
+        """First location with an open slot near `zip_code`, from the snapshot when there is a fresh one."""
+        self._record_demand(zip_code)
+        start_date, _ = _query_window()
+        window = start_date.isoformat()
+        with span("pharmacy.snapshot") as s:
+            snapshot = self._snapshots.get(zip_code)
+            if (
+                snapshot is not None
+                and snapshot["window"] == window
+                and time.time() - snapshot["fetched_at"] <= self.max_age
+            ):
+                self.counters["snapshot_hits"] += 1
+                s.set(result="hit")
+                return snapshot["first_available"]
+            self.counters["live_fetches"] += 1
+            s.set(result="miss")
+        # Straight to EasyVax: a cached response would be stamped as fresh here without being so
+        return await self._fetch_live(zip_code, session_id)
+
+    async def next_available(self, zip_code: str, session_id: str, skip: int) -> Optional[Dict[str, Any]]:
+        """The location with an open slot after the first `skip`; snapshots only hold the first, so this asks EasyVax."""
+        if not skip:
+            return await self.first_available(zip_code, session_id)
+        self._record_demand(zip_code)
+        self.counters["live_fetches"] += 1
+        start_date, end_date = _query_window()
+        locations = await _query_easyvax(zip_code, session_id, start_date, end_date)
+        return first_available_location(locations, skip)
+
+    async def refresh(self) -> None:
+        """Re-query every hot ZIP, a few at a time, bypassing the response cache."""
+        start_date, end_date = _query_window()
+        window = start_date.isoformat()
+        semaphore = asyncio.Semaphore(EASYVAX_SNAPSHOT_CONCURRENCY)
+
+        async def refresh_one(zip_code: str) -> None:
+            async with semaphore:
+                try:
+                    locations = await _query_easyvax(zip_code, self._session_id, start_date, end_date)
+                    changed, _ = self._store(zip_code, window, locations)
+                    self.counters["refresh_changed" if changed else "refresh_unchanged"] += 1
+                except Exception as e:
+                    self.counters["refresh_errors"] += 1
+                    logger.warning("Snapshot refresh for %s failed: %s", zip_code, e)
+
+        # Snapshots of ZIPs outside the hot set go stale and are fetched live on their next request
+        await asyncio.gather(*(refresh_one(zip_code) for zip_code in self.hot()))
+
+    async def run_refresh_loop(self, interval: float = EASYVAX_SNAPSHOT_INTERVAL_SECONDS) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning("Snapshot refresh failed: %s", e)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "snapshots": len(self._snapshots), "hot_zips": self.hot()}
+
 
+pharmacy_snapshots = AvailabilitySnapshots(
+    EASYVAX_SNAPSHOT_ZIPS,
+    EASYVAX_SNAPSHOT_MAX_AGE_SECONDS,
+    EASYVAX_DEMAND_HALF_LIFE_SECONDS,
+)
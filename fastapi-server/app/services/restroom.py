@@ -1,11 +1,108 @@
-import requests
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
 
+from app.config import RESTROOM_REFRESH_SECONDS, SPATIAL_CELL_DEGREES
+from app.utils import http_client
+from app.utils.spatial import GridIndex
 
-def get_restroom_data():
+logger = logging.getLogger(__name__)
+
+RESTROOM_DATA_URL = "https://data.lacity.org/resource/s5e6-2pbm.json"  # Public API endpoint
+
+
+async def get_restroom_data():
     """Fetch restroom data from LA Open Data."""
-    url = "https://data.lacity.org/resource/s5e6-2pbm.json"  # Public API endpoint
-    response = requests.get(url)
+    response = await http_client.get("la_open_data", RESTROOM_DATA_URL)
     if response.status_code == 200:
         return response.json()
     else:
-        raise Exception(f"LA Restroom API error: {response.status_code} - {response.text}")
\ No newline at end of file
+        raise Exception(f"LA Restroom API error: {response.status_code} - {response.text}")
+
+
+def _fixture_count(restroom: Dict[str, Any], field: str) -> int:
+    try:
+        return int(restroom.get(field, 0) or 0)
+    except (ValueError, TypeError):
+        return 0
+
+
+class RestroomStore:
+    """Resident copy of the LA restroom dataset with a nearest-restroom index."""
+
+    def __init__(self):
+        self.restrooms: List[Dict[str, Any]] = []
+        self.index: Optional[GridIndex] = None
+        self.loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.index is not None
+
+    def load(self, rows: List[Dict[str, Any]]) -> None:
+        """Replace the store contents with usable facilities from a raw dataset dump."""
+        restrooms, lats, lons = [], [], []
+        for restroom in rows:
+            geom = restroom.get('the_geom')
+            if not geom or 'coordinates' not in geom:
+                continue
+
+            toilets = _fixture_count(restroom, 'toilets')
+            urinals = _fixture_count(restroom, 'urinals')
+            faucets = _fixture_count(restroom, 'faucets')
+            if toilets == 0 and urinals == 0 and faucets == 0:
+                continue
+
+            lon, lat = geom['coordinates']
+            lats.append(float(lat))
+            lons.append(float(lon))
+            restrooms.append({
+                "facility": restroom.get('facility', 'Unknown'),
+                "gender": restroom.get('gender', 'Unknown'),
+                "toilets": toilets,
+                "urinals": urinals,
+                "faucets": faucets,
+                "location": geom,
+            })
+
+        # Swap both references together so readers never see a mismatched pair
+        self.restrooms, self.index = restrooms, GridIndex(lats, lons, SPATIAL_CELL_DEGREES)
+        self.loaded_at = time.time()
+
+    async def refresh(self, force: bool = True) -> None:
+        """Download the dataset and rebuild the index."""
+        async with self._lock:
+            if not force and self.loaded:
+                return
+            rows = await get_restroom_data()
+            self.load(rows)
+        logger.info("Loaded %d restrooms", len(self.restrooms))
+
+    async def ensure_loaded(self) -> None:
+        """Load the dataset on first use if startup could not."""
+        if not self.loaded:
+            await self.refresh(force=False)
+
+    async def run_refresh_loop(self, interval: float = RESTROOM_REFRESH_SECONDS) -> None:
+        """Periodically reload the dataset; keeps serving the old copy if a refresh fails."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning("Refresh failed: %s", e)
+
+    def nearest(self, latitude: float, longitude: float, k: int = 1) -> List[Dict[str, Any]]:
+        """Return up to k restrooms closest to the given point, nearest first."""
+        restrooms, index = self.restrooms, self.index
+        if index is None:
+            return []
+        return [
+            {**restrooms[i], "distance_miles": round(dist, 2)}
+            for i, dist in index.nearest(latitude, longitude, k)
+        ]
+
+
+restroom_store = RestroomStore()
@@ -0,0 +1,206 @@
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from app.config import (
+    ROUTER_CACHE_SIZE,
+    ROUTER_CACHE_TTL_SECONDS,
+    ROUTER_CONFIDENCE_THRESHOLD,
+)
+from app.services.gemini import WorkflowType, determine_workflow
+from app.utils.cache import TTLCache
+from app.utils.text import normalize_prompt
+from app.utils.tracing import span
+
+# (pattern, weight) per workflow letter; patterns match whole words in the normalized prompt
+WORKFLOW_KEYWORDS: Dict[str, List[Tuple[str, float]]] = {
+    "A": [
+        (r"cut|cuts|wound|wounds|bleeding|bleed|broken|fracture|fractured|sprain|sprained", 3.0),
+        (r"burn|burned|burnt|bruise|bruised|swollen|swelling|rash|blister|bite|bitten|scrape|scraped", 3.0),
+        (r"injury|injured|hurt my|twisted", 2.0),
+        (r"look at this|see this|this picture|photo", 1.0),
+    ],
+    "B": [
+        (r"fever|headache|migraine|cough|coughing|nausea|nauseous|vomit|vomiting|dizzy|diarrhea", 3.0),
+        (r"flu|cold|sick|ill|chills|sore throat|stomach ache|stomachache|cramps", 2.0),
+        (r"anxiety|anxious|depressed|depression|panic|mental health|stress|stressed|suicidal", 3.0),
+        (r"pain|ache|aches|tired|can't sleep|cant sleep|insomnia", 1.0),
+    ],
+    "C": [
+        (r"shelter|shelters|homeless shelter", 3.0),
+        (r"place to stay|place to sleep|somewhere to sleep|somewhere to stay|sleep tonight|bed for the night", 3.0),
+        (r"housing|bed|beds", 1.0),
+    ],
+    "D": [
+        (r"pharmacy|pharmacies|pharmacist|drugstore|drug store", 3.0),
+        (r"vaccine|vaccines|vaccination|vaccinated|booster|covid shot|flu shot", 3.0),
+        (r"prescription|prescriptions|refill|medication|medications|medicine|pills", 2.0),
+    ],
+    "E": [
+        (r"hospital|hospitals|clinic|clinics|urgent care|emergency room|medical center", 3.0),
+        (r"doctor|doctors|nurse|physician|health center|see someone", 2.0),
+    ],
+    "F": [
+        (r"bathroom|bathrooms|restroom|restrooms|toilet|toilets|washroom|washrooms|lavatory", 3.0),
+        (r"pee|poop|wash my hands|wash hands|porta potty|portapotty", 3.0),
+    ],
+    "G": [
+        (r"food|hungry|starving|meal|meals|eat|soup kitchen|food bank|groceries", 3.0),
+        (r"clothes|clothing|jacket|coat|shoes|socks|blanket|blankets|sleeping bag", 3.0),
+        (r"water|hygiene|toiletries|charger|tent", 2.0),
+    ],
+}
+
+_PATTERNS = {
+    workflow: [(re.compile(rf"\b(?:{pattern})\b"), weight) for pattern, weight in rules]
+    for workflow, rules in WORKFLOW_KEYWORDS.items()
+}
+
+# Pseudo-count for "none of the above": one weak keyword alone is never confident
+_PRIOR = 1.0
+
+# Prompts that only make sense as a continuation of the previous turn
+_FOLLOW_UP = re.compile(
+    r"\b(?:another one|a different one|any other|anything else|somewhere else|one closer|closer one"
+    r"|next one|what about|how about|same thing|again|instead|that one|more options?)\b"
+)
+
+# Follow-ups that want the next place rather than the same one again
+_ANOTHER = re.compile(
+    r"\b(?:another|a different one|different|any other|somewhere else|next one|more options?)\b"
+)
+
+# Possible emergencies; these are always classified afresh, never carried over from the session
+_URGENT = re.compile(
+    r"\b(?:heart attack|not breathing|can't breathe|cant breathe|stopped breathing|overdose|overdosed"
+    r"|seizure|seizures|chest pain|stroke|unconscious|passed out|choking)\b"
+)
+
+
+def is_urgent(prompt: str) -> bool:
+    """True for prompts that may describe a medical emergency."""
+    return bool(_URGENT.search(normalize_prompt(prompt)))
+
+
+def is_follow_up(prompt: str) -> bool:
+    """True for prompts that refer back to the previous turn ("what about another one?")."""
+    return bool(_FOLLOW_UP.search(normalize_prompt(prompt))) and not is_urgent(prompt)
+
+
+def asks_for_another(prompt: str) -> bool:
+    """True for follow-ups that want a different place than the last answer ("find me another one")."""
+    return bool(_ANOTHER.search(normalize_prompt(prompt)))
+
+
+def continues(prompt: str, previous: str) -> bool:
+    """
+    True for a follow-up that names no other workflow's keywords, so it can
+    only mean the previous workflow ("what about another one?", not "what
+    about a doctor?").
+    """
+    if not is_follow_up(prompt):
+        return False
+    return not any(score for workflow, score in score_locally(prompt).items() if workflow != previous)
+
+
+def score_locally(prompt: str) -> Dict[str, float]:
+    """Keyword score for every workflow letter."""
+    text = normalize_prompt(prompt)
+    return {
+        workflow: sum(weight for pattern, weight in patterns if pattern.search(text))
+        for workflow, patterns in _PATTERNS.items()
+    }
+
+
+def classify_locally(prompt: str) -> Tuple[Optional[str], float]:
+    """
+    Keyword classifier for common intents.
+
+    Returns the best workflow letter (or None when nothing matched) and a
+    confidence in [0, 1] based on how far it leads the runner-up.
+    """
+    ranked = sorted(score_locally(prompt).items(), key=lambda kv: kv[1], reverse=True)
+    (best, top), (_, second) = ranked[0], ranked[1]
+    if top == 0:
+        return None, 0.0
+    return best, top / (top + second + _PRIOR)
+
+
+class WorkflowRouter:
+    """
+    Tiered workflow classifier: prompt cache, then local keywords, then Gemini.
+    """
+
+    def __init__(self, cache_size: int, cache_ttl: float, confidence_threshold: float):
+        self.cache = TTLCache(cache_size, cache_ttl)
+        self.confidence_threshold = confidence_threshold
+        self.counters: Counter = Counter()
+        self._confidence_sum = 0.0
+
+    def classify_fast(self, user_prompt: str) -> Optional[WorkflowType]:
+        """Answer from the cache or a confident local match, or None if Gemini is needed."""
+        with span("classify") as s:
+            key = normalize_prompt(user_prompt)
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.counters["cache_hits"] += 1
+                s.set(source="cache", workflow=cached)
+                return cached
+            self.counters["cache_misses"] += 1
+
+            workflow, confidence = classify_locally(user_prompt)
+            self.counters["local_attempts"] += 1
+            self._confidence_sum += confidence
+            if workflow is None or confidence < self.confidence_threshold:
+                s.set(source="none", confidence=round(confidence, 2))
+                return None
+
+            self.counters["local_hits"] += 1
+            self._remember(key, workflow)
+            s.set(source="local", workflow=workflow, confidence=round(confidence, 2))
+            return workflow
+
+    async def classify_remote(self, user_prompt: str, previous: Optional[WorkflowType] = None) -> WorkflowType:
+        """
+        Ask Gemini, caching the answer for the normalized prompt.
+
+        `previous` is the session's last workflow, passed along as context.
+        Answers that depend on it, or on a turn the prompt refers back to,
+        are not cached.
+        """
+        self.counters["gemini_calls"] += 1
+        with span("classify.gemini") as s:
+            workflow = await determine_workflow(user_prompt, previous)
+            s.set(workflow=workflow)
+        if previous is None and not is_follow_up(user_prompt):
+            self._remember(normalize_prompt(user_prompt), workflow)
+        else:
+            self.counters[f"workflow_{workflow}"] += 1
+        return workflow
+
+    async def classify(self, user_prompt: str) -> WorkflowType:
+        workflow = self.classify_fast(user_prompt)
+        if workflow is None:
+            workflow = await self.classify_remote(user_prompt)
+        return workflow
+
+    def _remember(self, key: str, workflow: WorkflowType) -> None:
+        self.cache.set(key, workflow)
+        self.counters[f"workflow_{workflow}"] += 1
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss counters and the mean local-classifier confidence."""
+        attempts = self.counters["local_attempts"]
+        return {
+            **self.counters,
+            "cache_size": len(self.cache),
+            "confidence_threshold": self.confidence_threshold,
+            "mean_local_confidence": self._confidence_sum / attempts if attempts else 0.0,
+        }
+
+
+workflow_router = WorkflowRouter(
+    ROUTER_CACHE_SIZE,
+    ROUTER_CACHE_TTL_SECONDS,
+    ROUTER_CONFIDENCE_THRESHOLD,
+)
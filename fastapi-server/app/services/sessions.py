@@ -0,0 +1,98 @@
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from app.config import (
+    SESSION_MOVE_THRESHOLD_MILES,
+    SESSION_RESULT_MAX_AGE_SECONDS,
+    SESSION_STORE_BACKEND,
+    SESSION_STORE_PATH,
+    SESSION_STORE_SIZE,
+    SESSION_TTL_SECONDS,
+)
+from app.utils.geo import haversine
+from app.utils.response_cache import MemoryBackend, SharedMemoryBackend
+
+
+class Session:
+    """
+    What one conversation has already paid for: the last workflow, where the
+    user was, the ZIP resolved there, and location results by workflow letter.
+    """
+
+    def __init__(self, session_id: str, data: Optional[Dict[str, Any]] = None):
+        data = data or {}
+        self.session_id = session_id
+        self.workflow: Optional[str] = data.get("workflow")
+        self.latitude: Optional[float] = data.get("latitude")
+        self.longitude: Optional[float] = data.get("longitude")
+        self.zip_code: Optional[str] = data.get("zip")
+        self.results: Dict[str, Dict[str, Any]] = dict(data.get("results", {}))  # letter -> {"at", "result", "skip"}
+
+    def locate(self, latitude: float, longitude: float) -> None:
+        """Record this turn's position, dropping location data if the user moved since the last one."""
+        if self.latitude is not None and self.longitude is not None:
+            moved = haversine(self.longitude, self.latitude, longitude, latitude) > SESSION_MOVE_THRESHOLD_MILES
+        else:
+            moved = True
+        if moved:
+            self.latitude, self.longitude = latitude, longitude
+            self.zip_code = None
+            self.results = {}
+
+    def result(self, workflow: str, max_age: float = SESSION_RESULT_MAX_AGE_SECONDS) -> Optional[Dict[str, Any]]:
+        """The nearest-place result for `workflow` fetched here within `max_age` seconds."""
+        cached = self.results.get(workflow)
+        if cached is None or cached.get("skip") or time.time() - cached["at"] > max_age:
+            return None
+        return cached["result"]
+
+    def next_skip(self, workflow: str) -> int:
+        """How many places to pass over to show one this session has not seen here yet."""
+        cached = self.results.get(workflow)
+        return cached.get("skip", 0) + 1 if cached is not None else 0
+
+    def remember(self, workflow: str, result: Dict[str, Any], skip: int = 0) -> None:
+        self.results[workflow] = {"at": time.time(), "result": result, "skip": skip}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "workflow": self.workflow,
+            "latitude": self.latitude,
+            "longitude": self.longitude,
+            "zip": self.zip_code,
+            "results": self.results,
+        }
+
+
+class SessionStore:
+    """Sessions keyed by client-supplied id, with a sliding TTL and a size bound."""
+
+    def __init__(self, backend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.counters: Counter = Counter()
+
+    async def load(self, session_id: str) -> Session:
+        entry = await self.backend.get(f"session:{session_id}")
+        if entry is None:
+            self.counters["new"] += 1
+            return Session(session_id)
+        self.counters["resumed"] += 1
+        return Session(session_id, entry[0])
+
+    async def save(self, session: Session) -> None:
+        # Backends store (value, fresh_until) entries; sessions only use the TTL, so every save slides it
+        await self.backend.set(f"session:{session.session_id}", (session.to_dict(), 0.0), self.ttl)
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.counters)
+
+
+def _build_backend():
+    if SESSION_STORE_BACKEND == "shared":
+        return SharedMemoryBackend(SESSION_STORE_PATH, SESSION_STORE_SIZE)
+    return MemoryBackend(SESSION_STORE_SIZE)
+
+
+session_store = SessionStore(_build_backend(), SESSION_TTL_SECONDS)
@@ -1,16 +1,35 @@
-import requests
-from bs4 import BeautifulSoup
-from app.utils.geo import haversine  # assuming you already have this
-
-def get_shelter_data(user_lat, user_lon, zip_code):
-    """Fetch and return the closest homeless resource to the user location."""
-    
-    url = "https://www.lapl.org/homeless-resources"
-    
+import asyncio
+import logging
+import re
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.config import (
+    SHELTER_MAX_ZIPS,
+    SHELTER_REFRESH_SECONDS,
+    SHELTER_SEARCH_MILES,
+    SHELTER_SEED_ZIPS,
+    SPATIAL_CELL_DEGREES,
+)
+from app.utils import http_client
+from app.utils.cache import SingleFlight
+from app.utils.executors import run_blocking
+from app.utils.spatial import GridIndex
+from app.utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+LAPL_RESOURCES_URL = "https://www.lapl.org/homeless-resources"
+
+# The strainer sees the raw class attribute ("views-row views-row-1 ..."), so match a word in it
+_ENTRY_CLASS = re.compile(r'\bviews-row\b')
+
+
+async def fetch_shelter_page(zip_code: str) -> str:
+    """Fetch the LAPL homeless resources listing around a ZIP code."""
     headers = {
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
         'Accept-Language': 'en-US,en;q=0.9',
-        'Connection': 'keep-alive',
         'Referer': f'https://www.lapl.org/homeless-resources?distance%5Bpostal_code%5D={zip_code}&distance%5Bsearch_distance%5D=2&distance%5Bsearch_units%5D=mile',
         'Sec-Fetch-Dest': 'document',
         'Sec-Fetch-Mode': 'navigate',
@@ -25,25 +44,32 @@ def get_shelter_data(user_lat, user_lon, zip_code):
 
     params = {
         'distance[postal_code]': zip_code,
-        'distance[search_distance]': str(20),
+        'distance[search_distance]': str(SHELTER_SEARCH_MILES),
         'distance[search_units]': 'mile',
     }
 
-    response = requests.get(url, headers=headers, params=params)
+    response = await http_client.get("lapl", LAPL_RESOURCES_URL, headers=headers, params=params)
 
     if response.status_code != 200:
         raise Exception(f"LAPL Homeless Resources fetch error {response.status_code}: {response.text}")
 
-    soup = BeautifulSoup(response.text, 'html.parser')
-    
-    resources = []
-    all_entries = soup.find_all('li', class_='views-row')
+    return response.text
+
 
-    for entry in all_entries:
+def parse_shelters(html: str) -> List[Dict[str, Any]]:
+    """Extract normalized resource entries from the LAPL homeless resources page."""
+    # Imported here rather than at startup; parsing only happens on the blocking pool
+    from bs4 import BeautifulSoup, SoupStrainer
+
+    # Only materialise the result rows; the rest of the page is never built into a tree
+    soup = BeautifulSoup(html, 'lxml', parse_only=SoupStrainer('li', class_=_ENTRY_CLASS))
+
+    resources = []
+    for entry in soup.find_all('li', class_='views-row'):
         name_tag = entry.find('h3')
         address_phone_tag = entry.find('p', class_='hrc')
         map_link_tag = entry.find('a', class_='show-map-link')
-        
+
         if name_tag and address_phone_tag and map_link_tag:
             name = name_tag.get_text(strip=True)
             full_text = address_phone_tag.get_text(strip=True)
@@ -51,12 +77,12 @@ def get_shelter_data(user_lat, user_lon, zip_code):
                 address, phone = [part.strip() for part in full_text.split("|", 1)]
             else:
                 address, phone = full_text, "Unknown"
-            
-            latitude = map_link_tag['data-latitude']
-            longitude = map_link_tag['data-longitude']
 
-            # Calculate distance from user to shelter
-            dist = haversine(user_lon, user_lat, float(longitude), float(latitude))
+            try:
+                latitude = float(map_link_tag['data-latitude'])
+                longitude = float(map_link_tag['data-longitude'])
+            except (KeyError, TypeError, ValueError):
+                continue
 
             resources.append({
                 "name": name,
@@ -64,14 +90,143 @@ def get_shelter_data(user_lat, user_lon, zip_code):
                 "phone": phone,
                 "latitude": latitude,
                 "longitude": longitude,
-                "distance_miles": dist
             })
 
-    # Sort by distance
-    resources.sort(key=lambda x: x["distance_miles"])
+    return resources
+
+
+class ShelterDirectory:
+    """
+    Resident, spatially indexed copy of the LAPL homeless resource listings.
+
+    LAPL only returns resources within a radius of a ZIP code, so the directory
+    scrapes a set of ZIPs (the configured seeds plus ZIPs requests hint at) and
+    merges the results, de-duplicated by name and address.
+    """
+
+    def __init__(self, seed_zips: List[str]):
+        self.zip_codes: Set[str] = set(seed_zips)
+        self.resources: List[Dict[str, Any]] = []
+        self.index: Optional[GridIndex] = None
+        self.loaded_at: Optional[float] = None
+        self._entries: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._lock = asyncio.Lock()
+        self._pending: Dict[str, asyncio.Task] = {}
+        self._flights = SingleFlight()
+
+    @property
+    def loaded(self) -> bool:
+        return self.index is not None and len(self.index) > 0
+
+    def _rebuild(self, entries: Dict[Tuple[str, str], Dict[str, Any]]) -> None:
+        resources = list(entries.values())
+        index = GridIndex(
+            [r["latitude"] for r in resources],
+            [r["longitude"] for r in resources],
+            SPATIAL_CELL_DEGREES,
+        )
+        self._entries = entries
+        self.resources, self.index = resources, index
+        self.loaded_at = time.time()
+
+    async def _scrape(self, zip_code: str) -> List[Dict[str, Any]]:
+        with span("lapl.scrape", zip=zip_code) as s:
+            html = await fetch_shelter_page(zip_code)
+            # Parsing is CPU-bound, keep it off the event loop
+            resources = await run_blocking(parse_shelters, html)
+            s.set(bytes=len(html), entries=len(resources))
+        return resources
+
+    async def refresh(self) -> None:
+        """Re-scrape every tracked ZIP and swap in the merged directory; concurrent calls share one scrape."""
+        await self._flights.do("refresh", self._refresh)
+
+    async def _refresh(self) -> None:
+        async with self._lock:
+            entries: Dict[Tuple[str, str], Dict[str, Any]] = {}
+            failed = False
+            for zip_code in sorted(self.zip_codes):
+                try:
+                    for resource in await self._scrape(zip_code):
+                        entries[(resource["name"], resource["address"])] = resource
+                except Exception as e:
+                    failed = True
+                    logger.warning("Scrape for %s failed: %s", zip_code, e)
+            if failed:
+                # Keep what we had for ZIPs that could not be refreshed
+                entries = {**self._entries, **entries}
+            self._rebuild(entries)
+        logger.info("Loaded %d resources from %d ZIPs", len(self.resources), len(self.zip_codes))
+
+    async def add_zip(self, zip_code: str) -> None:
+        """Scrape one more ZIP and merge its resources into the directory; concurrent calls share one scrape."""
+        await self._flights.do(("zip", zip_code), lambda: self._add_zip(zip_code))
+
+    async def _add_zip(self, zip_code: str) -> None:
+        async with self._lock:
+            # A refresh or an earlier caller may have covered it while we waited
+            if zip_code in self.zip_codes:
+                return
+            resources = await self._scrape(zip_code)
+            entries = dict(self._entries)
+            for resource in resources:
+                entries[(resource["name"], resource["address"])] = resource
+            self.zip_codes.add(zip_code)
+            self._rebuild(entries)
+
+    def hint(self, zip_code: Optional[str]) -> None:
+        """Schedule a background scrape for a ZIP the directory has not covered yet."""
+        if (
+            not zip_code
+            or zip_code in self.zip_codes
+            or zip_code in self._pending
+            or len(self.zip_codes) >= SHELTER_MAX_ZIPS
+        ):
+            return
+        task = asyncio.create_task(self.add_zip(zip_code))
+        self._pending[zip_code] = task
+        task.add_done_callback(lambda t: self._hint_done(zip_code, t))
+
+    def _hint_done(self, zip_code: str, task: asyncio.Task) -> None:
+        self._pending.pop(zip_code, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Scrape for hinted ZIP %s failed: %s", zip_code, task.exception())
+
+    async def ensure_loaded(self, zip_code: Optional[str] = None) -> None:
+        """Make sure there is something to answer from, scraping inline only when empty."""
+        if self.loaded:
+            self.hint(zip_code)
+        elif zip_code and zip_code not in self.zip_codes:
+            await self.add_zip(zip_code)
+        else:
+            await self.refresh()
+
+    async def run_refresh_loop(self, interval: float = SHELTER_REFRESH_SECONDS) -> None:
+        """Periodically re-scrape; keeps serving the old copy if a refresh fails."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning("Refresh failed: %s", e)
+
+    def nearest(self, latitude: float, longitude: float, k: int = 1) -> List[Dict[str, Any]]:
+        """Return up to k resources closest to the given point, nearest first."""
+        resources, index = self.resources, self.index
+        if index is None:
+            return []
+        return [
+            {**resources[i], "distance_miles": dist}
+            for i, dist in index.nearest(latitude, longitude, k)
+        ]
+
+
+shelter_directory = ShelterDirectory(SHELTER_SEED_ZIPS)
+
+
+async def get_shelter_data(user_lat, user_lon, zip_code=None, skip=0):
+    """Return the closest homeless resource to the user location (after `skip` closer ones), or None if there is none."""
+    await shelter_directory.ensure_loaded(zip_code)
 
-    # Return the nearest shelter (first one)
-    if resources:
-        return resources[0]
-    else:
-        return {"error": "No homeless resources found."}
+    nearest = shelter_directory.nearest(user_lat, user_lon, skip + 1)
+    return nearest[skip] if len(nearest) > skip else None
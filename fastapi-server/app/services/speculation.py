@@ -0,0 +1,104 @@
+import asyncio
+import functools
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.config import SPECULATIVE_BUDGET, SPECULATIVE_MAX_INFLIGHT
+from app.utils.admission import admission
+
+# Relative upstream cost of running a location lookup we may throw away
+BRANCH_COSTS: Dict[str, float] = {
+    "C": 0.5,  # shelters: ZIP resolve (cached per cell) plus the resident directory
+    "D": 1.0,  # pharmacy: ZIP resolve plus the snapshot; a live EasyVax query only for cold ZIPs
+    "E": 0.2,  # medical center: k-nearest over the local facility mirror
+    "F": 0.1,  # restrooms: resident index
+}
+
+
+class Speculator:
+    """
+    Start cheap location lookups while the workflow is still being classified.
+
+    Branches are launched most-likely first until the per-request cost budget
+    is spent, and never beyond a process-wide cap on speculative tasks. Each
+    branch holds an admission slot for its workflow; a branch that cannot get
+    one without queueing is not launched.
+    """
+
+    def __init__(self, budget: float, max_inflight: int):
+        self.budget = budget
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        self.counters: Counter = Counter()
+
+    def _release(self, workflow: str, _task: asyncio.Task) -> None:
+        self.inflight -= 1
+        admission.release(workflow)
+
+    def _launch(
+        self,
+        branches: Dict[str, Callable[[], Awaitable[Any]]],
+        ranking: Dict[str, float],
+    ) -> Dict[str, asyncio.Task]:
+        tasks: Dict[str, asyncio.Task] = {}
+        spent = 0.0
+        order = sorted(branches, key=lambda w: (-ranking.get(w, 0.0), BRANCH_COSTS.get(w, 1.0)))
+        for workflow in order:
+            cost = BRANCH_COSTS.get(workflow, 1.0)
+            if spent + cost > self.budget:
+                self.counters["skipped_budget"] += 1
+                continue
+            if self.inflight >= self.max_inflight:
+                self.counters["skipped_concurrency"] += 1
+                break
+            if not admission.try_admit(workflow):
+                # Saturated: speculative work must not take slots from admitted requests
+                self.counters["skipped_admission"] += 1
+                continue
+            spent += cost
+            self.inflight += 1
+            task = asyncio.create_task(branches[workflow]())
+            task.add_done_callback(functools.partial(self._release, workflow))
+            tasks[workflow] = task
+        self.counters["launched"] += len(tasks)
+        return tasks
+
+    async def run(
+        self,
+        classify: Callable[[], Awaitable[str]],
+        branches: Dict[str, Callable[[], Awaitable[Any]]],
+        ranking: Dict[str, float],
+    ) -> Tuple[str, Optional[Any]]:
+        """
+        Classify and speculate concurrently.
+
+        Returns the workflow and, if its branch was speculated, that branch's
+        result; otherwise the result is None and the caller runs the handler.
+        """
+        classify_task = asyncio.create_task(classify())
+        tasks = self._launch(branches, ranking)
+
+        try:
+            workflow = await classify_task
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+
+        for name, task in tasks.items():
+            if name != workflow:
+                task.cancel()
+                self.counters["cancelled"] += 1
+
+        if workflow not in tasks:
+            self.counters["misses"] += 1
+            return workflow, None
+
+        self.counters["hits"] += 1
+        return workflow, await tasks[workflow]
+
+    def stats(self) -> Dict[str, float]:
+        return {**self.counters, "inflight": self.inflight}
+
+
+speculator = Speculator(SPECULATIVE_BUDGET, SPECULATIVE_MAX_INFLIGHT)
@@ -0,0 +1,273 @@
+import asyncio
+import itertools
+import math
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Tuple
+
+from fastapi.responses import ORJSONResponse
+
+from app.config import (
+    ADMISSION_ENABLED,
+    ADMISSION_MAX_CONCURRENCY,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_MAX_RETRY_AFTER_SECONDS,
+    ADMISSION_PRIORITIES,
+    ADMISSION_QUEUE_TIMEOUTS,
+    ADMISSION_RESERVED_SLOTS,
+    ADMISSION_WORKFLOW_LIMITS,
+)
+from app.utils.tracing import span
+
+# Priority of workflows missing from the priorities map: served last
+LOWEST_PRIORITY = max(ADMISSION_QUEUE_TIMEOUTS)
+
+
+class Overloaded(Exception):
+    """A request was shed because its workflow had no capacity before its queue deadline."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Bounded, priority-ordered admission of workflow requests.
+
+    At most `max_concurrency` requests run at once, and at most `limits[w]`
+    of workflow `w`; the last `reserved` slots are kept for priority-0
+    (injury) requests. Requests beyond that wait in per-workflow FIFO
+    queues, and a freed slot goes to the waiter with the best priority,
+    oldest first. A request waits at most its priority's queue timeout and
+    is then shed with Overloaded. With `max_queue` requests already
+    waiting, a newcomer displaces the newest waiter of a less urgent
+    workflow, or is shed at once when there is none.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_queue: int,
+        priorities: Dict[str, int],
+        limits: Dict[str, int],
+        queue_timeouts: Dict[int, float],
+        reserved: int = 0,
+        max_retry_after: float = 30,
+        enabled: bool = True,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.priorities = priorities
+        self.limits = limits
+        self.queue_timeouts = queue_timeouts
+        self.reserved = min(reserved, max_concurrency - 1)
+        self.max_retry_after = max_retry_after
+        self.enabled = enabled
+        self.running = 0
+        self.active: Counter = Counter()
+        self.events: Dict[str, Counter] = defaultdict(Counter)
+        self._queues: Dict[str, Deque[Tuple[int, asyncio.Future]]] = defaultdict(deque)
+        self._seq = itertools.count()
+        self._service_time = 0.0  # moving average of how long admitted requests hold a slot
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def priority(self, workflow: str) -> int:
+        return self.priorities.get(workflow, LOWEST_PRIORITY)
+
+    def record(self, workflow: str, event: str) -> None:
+        self.events[workflow][event] += 1
+
+    def _has_room(self, workflow: str) -> bool:
+        capacity = self.max_concurrency - (self.reserved if self.priority(workflow) > 0 else 0)
+        return self.running < capacity and self.active[workflow] < self.limits.get(workflow, self.max_concurrency)
+
+    def _take(self, workflow: str) -> None:
+        self.running += 1
+        self.active[workflow] += 1
+
+    def _retry_after(self) -> int:
+        # Roughly how long the current backlog takes to drain
+        backlog = self._service_time * (self.queued + 1) / self.max_concurrency
+        return int(min(self.max_retry_after, max(1, math.ceil(backlog))))
+
+    def _shed(self, workflow: str, event: str) -> Overloaded:
+        self.record(workflow, event)
+        return Overloaded(f"Server busy; workflow {workflow} was not admitted", self._retry_after())
+
+    def _displace(self, priority: int) -> bool:
+        """Shed the newest waiter of the least urgent workflow less urgent than `priority`."""
+        victim = max(
+            (w for w, queue in self._queues.items() if queue and self.priority(w) > priority),
+            key=self.priority,
+            default=None,
+        )
+        if victim is None:
+            return False
+        _, future = self._queues[victim].pop()
+        future.set_exception(self._shed(victim, "displaced"))
+        return True
+
+    def _dispatch(self) -> None:
+        """Hand free slots to waiters, most urgent first."""
+        while True:
+            best = None
+            for workflow, queue in self._queues.items():
+                while queue and queue[0][1].done():
+                    queue.popleft()
+                if queue and self._has_room(workflow):
+                    key = (self.priority(workflow), queue[0][0])
+                    if best is None or key < best[0]:
+                        best = (key, workflow)
+            if best is None:
+                return
+            workflow = best[1]
+            _, future = self._queues[workflow].popleft()
+            self._take(workflow)
+            future.set_result(None)
+
+    async def _wait(self, workflow: str) -> None:
+        priority = self.priority(workflow)
+        if self.queued >= self.max_queue and not self._displace(priority):
+            raise self._shed(workflow, "rejected")
+
+        entry = (next(self._seq), asyncio.get_running_loop().create_future())
+        queue = self._queues[workflow]
+        queue.append(entry)
+        try:
+            await asyncio.wait_for(entry[1], self.queue_timeouts.get(priority, self.queue_timeouts[LOWEST_PRIORITY]))
+        except asyncio.TimeoutError:
+            raise self._shed(workflow, "timed_out") from None
+        except asyncio.CancelledError:
+            future = entry[1]
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # Granted just as the caller went away: pass the slot on
+                self._release(workflow)
+            raise
+        finally:
+            if entry in queue:
+                queue.remove(entry)
+
+    def _release(self, workflow: str) -> None:
+        self.running -= 1
+        self.active[workflow] -= 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def admit(self, workflow: str) -> AsyncIterator[None]:
+        """Hold a slot for one `workflow` request, queueing for it or raising Overloaded."""
+        if not self.enabled:
+            yield
+            return
+        if self._has_room(workflow) and not self._queues[workflow]:
+            self._take(workflow)
+        else:
+            with span("admission", workflow=workflow) as s:
+                try:
+                    await self._wait(workflow)
+                except Overloaded:
+                    s.set(result="shed")
+                    raise
+                s.set(result="queued")
+            self.record(workflow, "waited")
+        self.record(workflow, "admitted")
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._service_time += 0.1 * (time.monotonic() - start - self._service_time)
+            self._release(workflow)
+
+    def try_admit(self, workflow: str) -> bool:
+        """
+        Take a slot for optional work only if one is free and nobody is waiting.
+
+        Never queues; a True return must be paired with release().
+        """
+        if not self.enabled:
+            return True
+        if self.queued or not self._has_room(workflow):
+            self.record(workflow, "skipped")
+            return False
+        self._take(workflow)
+        self.record(workflow, "admitted")
+        return True
+
+    def release(self, workflow: str) -> None:
+        """Give back a slot taken with try_admit()."""
+        if self.enabled:
+            self._release(workflow)
+
+    def stats(self) -> Dict[str, Any]:
+        workflows = sorted(set(self.priorities) | set(self.events))
+        return {
+            "enabled": self.enabled,
+            "running": self.running,
+            "queued": self.queued,
+            "max_concurrency": self.max_concurrency,
+            "service_time_ms": round(self._service_time * 1000, 2),
+            "workflows": {
+                w: {
+                    "priority": self.priority(w),
+                    "active": self.active[w],
+                    "queued": len(self._queues.get(w, ())),
+                    **self.events[w],
+                }
+                for w in workflows
+            },
+        }
+
+
+def overloaded_response(exc: Overloaded) -> ORJSONResponse:
+    return ORJSONResponse(
+        {"error": str(exc), "retryAfter": exc.retry_after},
+        status_code=503,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+class AdmissionMiddleware:
+    """
+    Admit single-workflow endpoints before their request is parsed.
+
+    `routes` maps a path to its workflow letter; other paths pass through
+    and are admitted by their handlers once the workflow is known. A shed
+    request gets a 503 with Retry-After.
+    """
+
+    def __init__(self, app, controller: AdmissionController, routes: Dict[str, str]):
+        self.app = app
+        self.controller = controller
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        workflow = self.routes.get(scope["path"]) if scope["type"] == "http" else None
+        if workflow is None:
+            await self.app(scope, receive, send)
+            return
+
+        admitted = False
+        try:
+            async with self.controller.admit(workflow):
+                admitted = True
+                await self.app(scope, receive, send)
+        except Overloaded as e:
+            if admitted:
+                raise
+            await overloaded_response(e)(scope, receive, send)
+
+
+admission = AdmissionController(
+    ADMISSION_MAX_CONCURRENCY,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_PRIORITIES,
+    ADMISSION_WORKFLOW_LIMITS,
+    ADMISSION_QUEUE_TIMEOUTS,
+    reserved=ADMISSION_RESERVED_SLOTS,
+    max_retry_after=ADMISSION_MAX_RETRY_AFTER_SECONDS,
+    enabled=ADMISSION_ENABLED,
+)
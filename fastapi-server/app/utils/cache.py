@@ -0,0 +1,79 @@
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries expire after a fixed time-to-live."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return default
+        value, expires_at = item
+        if expires_at <= time.time():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        self._data[key] = (value, time.time() + (self.ttl if ttl is None else ttl))
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def save(self, path: str) -> None:
+        """Write unexpired string-keyed entries to a JSON file."""
+        now = time.time()
+        entries = {k: [v, exp] for k, (v, exp) in self._data.items() if exp > now}
+        tmp_path = f"{path}.{os.getpid()}.tmp"  # workers may save concurrently
+        with open(tmp_path, "w") as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, path)
+
+    def load(self, path: str) -> int:
+        """Merge entries from a file written by save(); returns how many were kept."""
+        if not os.path.exists(path):
+            return 0
+        with open(path) as f:
+            entries = json.load(f)
+        now = time.time()
+        kept = 0
+        for key, (value, expires_at) in sorted(entries.items(), key=lambda kv: kv[1][1]):
+            if expires_at > now:
+                self._data[key] = (value, expires_at)
+                kept += 1
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+        return kept
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one in-flight awaitable."""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(fn())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield so one caller being cancelled doesn't cancel the shared call
+        return await asyncio.shield(future)
@@ -0,0 +1,42 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, TypeVar
+
+from app.config import BLOCKING_POOL_SIZE, IMAGE_WORKERS
+
+T = TypeVar("T")
+
+# Bounded pools for work that cannot be made async. "default" takes parsing and
+# file/SQLite I/O; "image" is kept separate so large frames cannot starve it.
+POOL_SIZES: Dict[str, int] = {
+    "default": BLOCKING_POOL_SIZE,
+    "image": IMAGE_WORKERS,
+}
+
+_pools: Dict[str, ThreadPoolExecutor] = {}
+
+
+def get_pool(name: str = "default") -> ThreadPoolExecutor:
+    pool = _pools.get(name)
+    if pool is None:
+        pool = _pools[name] = ThreadPoolExecutor(max_workers=POOL_SIZES[name], thread_name_prefix=f"blocking-{name}")
+    return pool
+
+
+async def run_blocking(fn: Callable[..., T], *args: Any, pool: str = "default", **kwargs: Any) -> T:
+    """Run a synchronous callable on a bounded thread pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_pool(pool), functools.partial(fn, *args, **kwargs))
+
+
+def install_default_executor() -> None:
+    """Make asyncio.to_thread and run_in_executor(None, ...) use the bounded default pool."""
+    asyncio.get_running_loop().set_default_executor(get_pool("default"))
+
+
+def shutdown_pools(wait: bool = False) -> None:
+    """Stop every pool; pass wait=True before forking so no worker threads are left behind."""
+    for pool in _pools.values():
+        pool.shutdown(wait=wait, cancel_futures=True)
+    _pools.clear()
@@ -1,6 +1,9 @@
 from math import asin, cos, radians, sin, sqrt
-from geopy.geocoders import Nominatim
-from geopy.exc import GeopyError
+from typing import Tuple
+
+import numpy as np
+
+EARTH_RADIUS_MILES = 3956
 
 def haversine(lon1: float, lat1: float, lon2: float, lat2: float) -> float:
     """Calculate the great-circle distance between two points on Earth (in miles)."""
@@ -12,16 +15,40 @@ def haversine(lon1: float, lat1: float, lon2: float, lat2: float) -> float:
     dlat = lat2 - lat1 
     a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
     c = 2 * asin(sqrt(a))
-    r = 3956  # Radius of Earth in miles
+    r = EARTH_RADIUS_MILES  # Radius of Earth in miles
     return c * r
-import time
-from geopy.geocoders import Nominatim
-from geopy.exc import GeopyError
-import requests
+
+def haversine_many(lat: float, lon: float, lats, lons) -> np.ndarray:
+    """Great-circle distances (in miles) from one point to arrays of points."""
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2 = np.radians(np.asarray(lats, dtype=np.float64))
+    lon2 = np.radians(np.asarray(lons, dtype=np.float64))
+
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def k_nearest(lat: float, lon: float, lats, lons, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Indices and distances (in miles) of the k points closest to (lat, lon), nearest first.
+
+    Uses argpartition so only the k winners are sorted, not the whole candidate set.
+    """
+    distances = haversine_many(lat, lon, lats, lons)
+    n = len(distances)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float64)
+    if k < n:
+        idx = np.argpartition(distances, k - 1)[:k]
+    else:
+        idx = np.arange(n)
+    idx = idx[np.argsort(distances[idx], kind="stable")]
+    return idx, distances[idx]
+
+from app.utils import http_client
 
 POSITIONSTACK_API_KEY = "YOUR_POSITIONSTACK_API_KEY"  # <<< Replace with your actual API key
 
-def get_zip_from_lat_long(lat: float, lon: float) -> str:
+async def get_zip_from_lat_long(lat: float, lon: float) -> str:
     """Get ZIP code from latitude and longitude using PositionStack API."""
     url = "http://api.positionstack.com/v1/reverse"
     params = {
@@ -30,7 +57,7 @@ def get_zip_from_lat_long(lat: float, lon: float) -> str:
         'limit': 1
     }
 
-    response = requests.get(url, params=params)
+    response = await http_client.get("positionstack", url, params=params)
 
     if response.status_code == 200:
         data = response.json()
@@ -44,3 +71,47 @@ def get_zip_from_lat_long(lat: float, lon: float) -> str:
             raise ValueError("No location data found for given coordinates.")
     else:
         raise ConnectionError(f"PositionStack API error {response.status_code}: {response.text}")
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+def geohash_encode(lat: float, lon: float, precision: int = 6) -> str:
+    """Encode a coordinate as a geohash string of the given length."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits, ch, even = 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            ch = (ch << 1) | 1
+            rng[0] = mid
+        else:
+            ch <<= 1
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_GEOHASH_ALPHABET[ch])
+            bits, ch = 0, 0
+    return "".join(chars)
+
+def geohash_decode(geohash: str) -> Tuple[float, float]:
+    """Return the (lat, lon) centre of a geohash cell."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for c in geohash:
+        value = _GEOHASH_ALPHABET.index(c)
+        for shift in range(4, -1, -1):
+            rng = lon_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (value >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lon_range[0] + lon_range[1]) / 2
+
+def geohash_cell_size(precision: int) -> Tuple[float, float]:
+    """Return the (lat, lon) height and width in degrees of a geohash cell of the given length."""
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** (bits - bits // 2)
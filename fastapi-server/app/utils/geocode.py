@@ -0,0 +1,72 @@
+import logging
+
+from app.config import (
+    GEOCODE_CACHE_PATH,
+    GEOCODE_CACHE_SIZE,
+    GEOCODE_CACHE_TTL_SECONDS,
+    GEOCODE_GEOHASH_PRECISION,
+)
+from app.utils.cache import SingleFlight, TTLCache
+from app.utils.executors import run_blocking
+from app.utils.geo import geohash_decode, geohash_encode, get_zip_from_lat_long
+from app.utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+class ReverseGeocoder:
+    """
+    Resolve coordinates to a ZIP code, one upstream lookup per geohash cell.
+
+    Coordinates are snapped to a geohash cell and the cell centre is what gets
+    reverse geocoded, so every user inside the cell shares one cached answer.
+    """
+
+    def __init__(self, precision: int, cache_size: int, ttl: float, cache_path: str = ""):
+        self.precision = precision
+        self.cache = TTLCache(cache_size, ttl)
+        self.cache_path = cache_path
+        self.loaded = False
+        self._flights = SingleFlight()
+
+    def cell(self, lat: float, lon: float) -> str:
+        return geohash_encode(lat, lon, self.precision)
+
+    async def resolve_zip(self, lat: float, lon: float) -> str:
+        with span("geocode") as s:
+            cell = self.cell(lat, lon)
+            zip_code = self.cache.get(cell)
+            if zip_code is not None:
+                s.set(source="cache")
+                return zip_code
+            s.set(source="remote")
+            return await self._flights.do(cell, lambda: self._lookup(cell))
+
+    async def _lookup(self, cell: str) -> str:
+        center_lat, center_lon = geohash_decode(cell)
+        zip_code = await get_zip_from_lat_long(center_lat, center_lon)
+        self.cache.set(cell, zip_code)
+        return zip_code
+
+    async def load(self) -> None:
+        if self.cache_path:
+            kept = await run_blocking(self.cache.load, self.cache_path)
+            logger.info("Loaded %d cached ZIP cells", kept)
+        self.loaded = True
+
+    async def save(self) -> None:
+        if self.cache_path:
+            await run_blocking(self.cache.save, self.cache_path)
+
+
+reverse_geocoder = ReverseGeocoder(
+    GEOCODE_GEOHASH_PRECISION,
+    GEOCODE_CACHE_SIZE,
+    GEOCODE_CACHE_TTL_SECONDS,
+    GEOCODE_CACHE_PATH,
+)
+
+
+async def resolve_zip(lat: float, lon: float) -> str:
+    """Cached, non-blocking ZIP lookup for a coordinate."""
+    return await reverse_geocoder.resolve_zip(lat, lon)
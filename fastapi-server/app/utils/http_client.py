@@ -0,0 +1,406 @@
+import asyncio
+import logging
+import random
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+
+import httpx
+
+from app.config import (
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_RESET_SECONDS,
+    HEDGE_PERCENTILE,
+    HEDGING_ENABLED,
+    LATENCY_MIN_SAMPLES,
+    LATENCY_WINDOW_SIZE,
+    RETRY_BASE_DELAY_SECONDS,
+    RETRY_MAX_DELAY_SECONDS,
+    TIMEOUT_MIN_SECONDS,
+    TIMEOUT_MULTIPLIER,
+    TIMEOUT_PERCENTILE,
+)
+from app.utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Upstream:
+    """Connection budget, timeout ceiling and retry policy for one outbound dependency."""
+    max_connections: int
+    connect_timeout: float
+    read_timeout: float  # ceiling; the effective timeout adapts below it
+    retries: int = 0  # extra attempts for idempotent requests
+    hedge: bool = False  # allow a hedged second request for idempotent requests
+
+
+UPSTREAMS: Dict[str, Upstream] = {
+    "positionstack": Upstream(max_connections=10, connect_timeout=3.0, read_timeout=5.0, retries=2, hedge=True),
+    "arcgis": Upstream(max_connections=10, connect_timeout=3.0, read_timeout=10.0, retries=2, hedge=True),
+    "easyvax": Upstream(max_connections=10, connect_timeout=3.0, read_timeout=10.0, retries=1, hedge=True),
+    # Scraped; no hedging so we never double the load on a struggling site
+    "lapl": Upstream(max_connections=4, connect_timeout=3.0, read_timeout=15.0, retries=1),
+    "la_open_data": Upstream(max_connections=2, connect_timeout=5.0, read_timeout=30.0, retries=2),
+    # Expensive and not idempotent from a billing point of view: never retried or hedged
+    "gemini": Upstream(max_connections=20, connect_timeout=5.0, read_timeout=30.0),
+}
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+# Statuses that mean "the upstream is struggling": retried, and counted by the breaker
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# Per-upstream counters reported by upstream_stats()
+UPSTREAM_EVENTS = (
+    "retries", "hedges", "hedge_wins", "transport_errors", "deadline_exceeded", "short_circuits", "circuit_opens",
+)
+
+
+class CircuitOpenError(httpx.TransportError):
+    """Raised without touching the network while an upstream's circuit breaker is open."""
+
+
+class LatencyWindow:
+    """The most recent successful response times of one upstream."""
+
+    def __init__(self, size: int, min_samples: int):
+        self.samples: Deque[float] = deque(maxlen=size)
+        self.min_samples = min_samples
+        self._sorted: Optional[List[float]] = None
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self._sorted = None
+
+    def percentile(self, q: float) -> Optional[float]:
+        """The q-th percentile in seconds, or None until there are enough samples to trust."""
+        if len(self.samples) < self.min_samples:
+            return None
+        if self._sorted is None:
+            self._sorted = sorted(self.samples)
+        rank = min(len(self._sorted) - 1, int(q / 100 * len(self._sorted)))
+        return self._sorted[rank]
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    Closed: calls flow. After `threshold` consecutive failures it opens and
+    calls fail fast. After `reset_seconds` one probe call is let through
+    (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, threshold: int, reset_seconds: float):
+        self.threshold = threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_seconds:
+                return False
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def release(self) -> None:
+        """A call finished without a verdict (e.g. it was cancelled); let another probe through."""
+        self._probing = False
+
+    def record_success(self) -> None:
+        self.state, self.failures, self._probing = "closed", 0, False
+
+    def record_failure(self) -> bool:
+        """Count a failure; returns True if this opened the circuit."""
+        self.failures += 1
+        self._probing = False
+        if self.state == "half_open" or (self.state == "closed" and self.failures >= self.threshold):
+            self.state, self.opened_at = "open", time.monotonic()
+            return True
+        return False
+
+
+class UpstreamState:
+    def __init__(self):
+        self.latency = LatencyWindow(LATENCY_WINDOW_SIZE, LATENCY_MIN_SAMPLES)
+        self.breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS)
+        self.counters: Counter = Counter()
+
+
+_client: Optional[httpx.AsyncClient] = None
+_semaphores: Dict[str, asyncio.Semaphore] = {}
+_states: Dict[str, UpstreamState] = {}
+
+
+def _build_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=sum(u.max_connections for u in UPSTREAMS.values()),
+            max_keepalive_connections=40,
+            keepalive_expiry=30.0,
+        ),
+        timeout=httpx.Timeout(10.0, connect=3.0),
+        follow_redirects=True,
+    )
+
+
+async def start_http_client() -> httpx.AsyncClient:
+    """Create the application-wide client; called from the FastAPI lifespan."""
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it on first use outside the lifespan."""
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+
+async def prime(urls: Dict[str, str]) -> None:
+    """
+    Open pooled connections to upstreams before the first requests need them.
+
+    Each URL gets one HEAD request whose response is ignored, leaving its
+    connection (TCP, TLS and HTTP/2 setup done) in the pool. Nothing is
+    recorded against the upstream's latency window or breaker.
+    """
+    client = get_http_client()
+
+    async def connect(upstream: str, url: str) -> None:
+        with span("http.prime", upstream=upstream):
+            try:
+                await client.head(url, timeout=httpx.Timeout(UPSTREAMS[upstream].connect_timeout * 2))
+            except Exception as e:
+                logger.warning("Could not prime %s: %s", upstream, e)
+
+    await asyncio.gather(*(connect(upstream, url) for upstream, url in urls.items()))
+
+
+def _semaphore(upstream: str) -> asyncio.Semaphore:
+    semaphore = _semaphores.get(upstream)
+    if semaphore is None:
+        semaphore = _semaphores[upstream] = asyncio.Semaphore(UPSTREAMS[upstream].max_connections)
+    return semaphore
+
+
+def _state(upstream: str) -> UpstreamState:
+    state = _states.get(upstream)
+    if state is None:
+        state = _states[upstream] = UpstreamState()
+    return state
+
+
+def _read_timeout(upstream: str) -> float:
+    """Read timeout from recent latency, clamped to [TIMEOUT_MIN_SECONDS, the upstream's ceiling]."""
+    ceiling = UPSTREAMS[upstream].read_timeout
+    observed = _state(upstream).latency.percentile(TIMEOUT_PERCENTILE)
+    if observed is None:
+        return ceiling
+    return min(ceiling, max(TIMEOUT_MIN_SECONDS, observed * TIMEOUT_MULTIPLIER))
+
+
+def _backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff before retry number `attempt` (1-based)."""
+    return random.uniform(0, min(RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * 2 ** (attempt - 1)))
+
+
+def _record(upstream: str, state: UpstreamState, failed: bool) -> None:
+    if not failed:
+        state.breaker.record_success()
+    elif state.breaker.record_failure():
+        state.counters["circuit_opens"] += 1
+        logger.warning("Circuit for %s opened after %d failures", upstream, state.breaker.failures)
+
+
+def _check_breaker(upstream: str, state: UpstreamState) -> None:
+    if not state.breaker.allow():
+        state.counters["short_circuits"] += 1
+        raise CircuitOpenError(f"{upstream} is unavailable (circuit open)")
+
+
+async def _send(upstream: str, method: str, url: str, kwargs: Dict[str, Any]) -> httpx.Response:
+    """One attempt: breaker check, pool slot, bounded total time, breaker and latency bookkeeping."""
+    state = _state(upstream)
+    _check_breaker(upstream, state)
+    config = UPSTREAMS[upstream]
+    timeout = kwargs.pop("timeout", None)
+    timeout = httpx.Timeout(timeout) if timeout else httpx.Timeout(_read_timeout(upstream), connect=config.connect_timeout)
+    # httpx's read timeout is per socket read; also cap the whole exchange so a
+    # server trickling bytes cannot hold the request open indefinitely
+    deadline = (timeout.connect or 0) + (timeout.read or config.read_timeout)
+
+    verdict = None
+    try:
+        async with _semaphore(upstream):
+            start = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(
+                    get_http_client().request(method, url, timeout=timeout, **kwargs), deadline
+                )
+            except asyncio.TimeoutError:
+                state.counters["deadline_exceeded"] += 1
+                raise httpx.ReadTimeout(f"{upstream} did not answer within {deadline:.1f}s")
+            elapsed = time.perf_counter() - start
+        verdict = response.status_code in RETRYABLE_STATUSES
+        if not verdict:
+            state.latency.add(elapsed)
+        return response
+    except httpx.TransportError:
+        verdict = True
+        state.counters["transport_errors"] += 1
+        raise
+    finally:
+        if verdict is None:
+            state.breaker.release()
+        else:
+            _record(upstream, state, verdict)
+
+
+async def _send_hedged(upstream: str, method: str, url: str, kwargs: Dict[str, Any]) -> httpx.Response:
+    """
+    Send once; if no answer arrives by the upstream's p95 latency, send a
+    second copy and take whichever succeeds first.
+    """
+    state = _state(upstream)
+    delay = state.latency.percentile(HEDGE_PERCENTILE)
+    primary = asyncio.ensure_future(_send(upstream, method, url, dict(kwargs)))
+    if delay is None:
+        return await primary
+
+    done, _ = await asyncio.wait({primary}, timeout=delay)
+    if done:
+        return primary.result()
+
+    state.counters["hedges"] += 1
+    hedge = asyncio.ensure_future(_send(upstream, method, url, dict(kwargs)))
+    pending = {primary, hedge}
+    outcome: Optional[asyncio.Future] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                outcome = task
+                if task.exception() is None and task.result().status_code not in RETRYABLE_STATUSES:
+                    if task is hedge:
+                        state.counters["hedge_wins"] += 1
+                    return task.result()
+        # Both failed: surface the last outcome as a plain single request would
+        return outcome.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def request(upstream: str, method: str, url: str, **kwargs) -> httpx.Response:
+    """
+    Send a request through the shared pool under the named upstream's limits.
+
+    Idempotent requests are retried with jittered backoff on transport
+    errors and retryable statuses, and may be hedged. While the upstream's
+    circuit is open this raises CircuitOpenError without a network call.
+    """
+    config = UPSTREAMS[upstream]
+    state = _state(upstream)
+    idempotent = method.upper() in IDEMPOTENT_METHODS
+    attempts = 1 + (config.retries if idempotent else 0)
+    hedged = HEDGING_ENABLED and config.hedge and idempotent
+
+    with span(f"upstream.{upstream}", method=method) as s:
+        for attempt in range(attempts):
+            if attempt:
+                state.counters["retries"] += 1
+                await asyncio.sleep(_backoff(attempt))
+            try:
+                send = _send_hedged if hedged else _send
+                response = await send(upstream, method, url, dict(kwargs))
+            except CircuitOpenError:
+                s.set(result="circuit_open", attempts=attempt + 1)
+                raise
+            except httpx.TransportError:
+                if attempt == attempts - 1:
+                    s.set(attempts=attempt + 1)
+                    raise
+                continue
+            if response.status_code in RETRYABLE_STATUSES and attempt < attempts - 1:
+                continue
+            s.set(status=response.status_code, bytes=len(response.content), attempts=attempt + 1)
+            return response
+
+
+@asynccontextmanager
+async def stream(upstream: str, method: str, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+    """
+    Streaming variant of request(); the connection slot is held until the block exits.
+
+    Streams are not retried or hedged, but respect the circuit breaker, and
+    the time to response headers feeds the upstream's latency window.
+    """
+    config = UPSTREAMS[upstream]
+    state = _state(upstream)
+    kwargs.setdefault("timeout", httpx.Timeout(_read_timeout(upstream), connect=config.connect_timeout))
+    with span(f"upstream.{upstream}", method=method, stream=True) as s:
+        _check_breaker(upstream, state)
+        verdict = None
+        try:
+            async with _semaphore(upstream):
+                start = time.perf_counter()
+                async with get_http_client().stream(method, url, **kwargs) as response:
+                    verdict = response.status_code in RETRYABLE_STATUSES
+                    if not verdict:
+                        state.latency.add(time.perf_counter() - start)
+                    _record(upstream, state, verdict)
+                    s.set(status=response.status_code)
+                    yield response
+        except httpx.TransportError:
+            if verdict is None:
+                verdict = True
+                state.counters["transport_errors"] += 1
+                _record(upstream, state, verdict)
+            raise
+        finally:
+            if verdict is None:
+                state.breaker.release()
+
+
+async def get(upstream: str, url: str, **kwargs) -> httpx.Response:
+    return await request(upstream, "GET", url, **kwargs)
+
+
+async def post(upstream: str, url: str, **kwargs) -> httpx.Response:
+    return await request(upstream, "POST", url, **kwargs)
+
+
+def upstream_stats() -> Dict[str, Dict[str, Any]]:
+    """Latency percentiles, effective timeout, breaker state and event counters per upstream."""
+    stats = {}
+    for upstream in UPSTREAMS:
+        state = _state(upstream)
+        percentiles = {f"p{q}_ms": state.latency.percentile(q) for q in (50, 95, 99)}
+        stats[upstream] = {
+            **{k: round(v * 1000, 1) if v is not None else None for k, v in percentiles.items()},
+            "samples": len(state.latency.samples),
+            "read_timeout_s": round(_read_timeout(upstream), 2),
+            "circuit": state.breaker.state,
+            **{event: state.counters[event] for event in UPSTREAM_EVENTS},
+        }
+    return stats
@@ -0,0 +1,108 @@
+import base64
+import binascii
+import io
+from dataclasses import dataclass
+from typing import Optional, Union
+
+from PIL import Image, ImageOps
+
+from app.config import (
+    IMAGE_FORMAT,
+    IMAGE_MAX_DIMENSION,
+    IMAGE_PASSTHROUGH_BYTES,
+    IMAGE_QUALITY,
+)
+from app.utils.executors import run_blocking
+from app.utils.tracing import span
+
+# MIME types Gemini accepts inline without conversion
+GEMINI_IMAGE_TYPES = {"image/jpeg", "image/png", "image/webp", "image/heic", "image/heif"}
+
+
+@dataclass(frozen=True)
+class PreparedImage:
+    """Image ready to embed in a Gemini request."""
+    data_b64: str
+    mime_type: str
+    size: int  # decoded size in bytes
+
+
+def sniff_mime(header: bytes) -> Optional[str]:
+    """Identify an image format from its leading magic bytes."""
+    if header.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    if header[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if header[4:8] == b"ftyp":
+        brand = header[8:12]
+        if brand in (b"heic", b"heix", b"heim", b"heis"):
+            return "image/heic"
+        if brand in (b"mif1", b"msf1"):
+            return "image/heif"
+    return None
+
+
+def _recompress(data: bytes) -> bytes:
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((IMAGE_MAX_DIMENSION, IMAGE_MAX_DIMENSION))
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        out = io.BytesIO()
+        image.save(out, format=IMAGE_FORMAT, quality=IMAGE_QUALITY)
+        return out.getvalue()
+
+
+async def prepare_image_bytes(data: bytes) -> PreparedImage:
+    """Downscale and recompress raw image bytes unless they are already small enough."""
+    if not data:
+        raise ValueError("Image is empty")
+    mime_type = sniff_mime(data[:16])
+    if mime_type in GEMINI_IMAGE_TYPES and len(data) <= IMAGE_PASSTHROUGH_BYTES:
+        return PreparedImage(base64.b64encode(data).decode("ascii"), mime_type, len(data))
+
+    with span("image.recompress", bytes=len(data)) as s:
+        data = await run_blocking(_recompress, data, pool="image")
+        s.set(output_bytes=len(data))
+    return PreparedImage(
+        base64.b64encode(data).decode("ascii"),
+        f"image/{IMAGE_FORMAT.lower()}",
+        len(data),
+    )
+
+
+async def prepare_image_b64(data_b64: str) -> PreparedImage:
+    """
+    Prepare a base64 image from a JSON request.
+
+    Small images in a supported format are passed through as the original
+    string; only the header is decoded to sniff the format.
+    """
+    if not data_b64:
+        raise ValueError("image_surroundings is required for this workflow")
+    if data_b64.startswith("data:"):
+        # Tolerate data URLs ("data:image/jpeg;base64,...")
+        data_b64 = data_b64.split(",", 1)[-1]
+    try:
+        header = base64.b64decode(data_b64[:24])
+    except binascii.Error as e:
+        raise ValueError(f"image_surroundings is not valid base64: {e}")
+
+    size = len(data_b64) * 3 // 4 - data_b64[-2:].count("=")
+    mime_type = sniff_mime(header)
+    if mime_type in GEMINI_IMAGE_TYPES and size <= IMAGE_PASSTHROUGH_BYTES:
+        return PreparedImage(data_b64, mime_type, size)
+
+    data = await run_blocking(base64.b64decode, data_b64, pool="image")
+    return await prepare_image_bytes(data)
+
+
+async def prepare_image(image: Union[str, bytes]) -> PreparedImage:
+    """Prepare either a base64 string (JSON clients) or raw bytes (multipart uploads)."""
+    if isinstance(image, bytes):
+        return await prepare_image_bytes(image)
+    return await prepare_image_b64(image)
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+from app.config import LOOP_BLOCK_THRESHOLD_MS
+
+logger = logging.getLogger(__name__)
+
+
+class LoopBlockedError(AssertionError):
+    """Raised by assert_no_blocking when the event loop stalled past the threshold."""
+
+
+class LoopMonitor:
+    """
+    Detect event-loop blocking.
+
+    A coroutine on the loop stamps a heartbeat every `interval` seconds. A
+    watchdog thread checks the heartbeat and, when it is older than
+    `threshold`, captures the loop thread's stack so the blocking call can be
+    identified. Lag observed by the heartbeat itself is recorded as well.
+    """
+
+    def __init__(self, threshold: float, interval: float = 0.01, max_reports: int = 20):
+        self.threshold = threshold
+        self.interval = interval
+        self.max_reports = max_reports
+        self.max_lag = 0.0
+        self.blocked_count = 0
+        self.reports: List[Dict[str, object]] = []
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._reported_beat: Optional[float] = None
+
+    async def _beat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = now - expected
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.threshold:
+                self.blocked_count += 1
+            self._heartbeat = now
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.threshold / 2):
+            beat = self._heartbeat
+            stalled = time.monotonic() - beat
+            if stalled <= self.threshold or beat == self._reported_beat:
+                continue
+            # Report each stall once, with the stack the loop thread is stuck in
+            self._reported_beat = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else ""
+            if len(self.reports) < self.max_reports:
+                self.reports.append({"stalled_ms": round(stalled * 1000, 1), "stack": stack})
+            logger.warning("Event loop blocked for %.0f ms:\n%s", stalled * 1000, stack)
+
+    def start(self) -> None:
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._beat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+            "blocked_count": self.blocked_count,
+            "reports": self.reports,
+        }
+
+
+@asynccontextmanager
+async def assert_no_blocking(threshold: float = 0.05) -> AsyncIterator[LoopMonitor]:
+    """
+    Fail if the event loop blocks for longer than `threshold` seconds inside the block.
+
+        async with assert_no_blocking(0.05):
+            await handle_shelter_request(34.05, -118.24)
+    """
+    monitor = LoopMonitor(threshold)
+    monitor.start()
+    try:
+        yield monitor
+        # Let the heartbeat observe a stall that ended on the final await
+        await asyncio.sleep(monitor.interval * 2)
+    finally:
+        monitor.stop()
+    if monitor.blocked_count or monitor.reports:
+        details = monitor.reports[0] if monitor.reports else {"stalled_ms": 0, "stack": ""}
+        max_ms = max(monitor.max_lag * 1000, details["stalled_ms"])
+        raise LoopBlockedError(
+            f"Event loop blocked {max(monitor.blocked_count, len(monitor.reports))} time(s), max stall "
+            f"{max_ms:.0f} ms (threshold {threshold * 1000:.0f} ms)\n{details['stack']}"
+        )
+
+
+# App-wide monitor, started by the lifespan when LOOP_BLOCK_THRESHOLD_MS is set
+loop_monitor = LoopMonitor(LOOP_BLOCK_THRESHOLD_MS / 1000) if LOOP_BLOCK_THRESHOLD_MS > 0 else None
@@ -0,0 +1,57 @@
+import asyncio
+import time
+from typing import Optional
+
+
+class RateLimitTimeout(Exception):
+    """A caller could not get capacity before its deadline."""
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at `rate` tokens per second up to `burst`.
+
+    Each acquire() reserves a token immediately (the balance may go negative)
+    and sleeps until its reservation matures, so waiters are served in
+    arrival order without a lock. A caller whose wait would run past its
+    deadline is refused up front instead of waiting and then failing.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()  # in the future while paused
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    async def acquire(self, timeout: Optional[float] = None) -> float:
+        """Take one token, waiting at most `timeout` seconds; returns the time waited."""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= 1
+        wait = max(self.updated - now, 0.0) + max(-self.tokens / self.rate, 0.0)
+        if timeout is not None and wait > timeout:
+            self.refund()
+            raise RateLimitTimeout(f"rate limited for another {wait:.1f}s")
+        if wait:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self.refund()
+                raise
+        return wait
+
+    def refund(self) -> None:
+        """Return a token whose call never went ahead."""
+        self.tokens = min(self.burst, self.tokens + 1)
+
+    def pause(self, seconds: float) -> None:
+        """Hand out no tokens for `seconds`, e.g. after the provider answered 429."""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0)
+        self.updated = max(self.updated, now + seconds)
@@ -0,0 +1,216 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from app.config import (
+    REDIS_URL,
+    RESPONSE_CACHE_BACKEND,
+    RESPONSE_CACHE_GEOHASH_PRECISION,
+    RESPONSE_CACHE_SIZE,
+    RESPONSE_CACHE_STALE_IF_ERROR_SECONDS,
+    RESPONSE_CACHE_TTLS,
+    SHARED_CACHE_PATH,
+)
+from app.utils.cache import SingleFlight, TTLCache
+from app.utils.executors import run_blocking
+from app.utils.geo import geohash_decode, geohash_encode
+from app.utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# (value, fresh_until); entries live on past fresh_until for the stale window
+Entry = Tuple[Any, float]
+
+
+class MemoryBackend:
+    """In-process LRU backend."""
+
+    def __init__(self, maxsize: int):
+        self._cache = TTLCache(maxsize, ttl=0)
+
+    async def get(self, key: str) -> Optional[Entry]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, entry: Entry, ttl: float) -> None:
+        self._cache.set(key, entry, ttl=ttl)
+
+
+class RedisBackend:
+    """Redis-compatible backend (Redis, Valkey, KeyDB, ...) for sharing entries across processes."""
+
+    def __init__(self, url: str, prefix: str = "snapaid:"):
+        # Optional dependency, only needed when this backend is selected
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self._prefix = prefix
+
+    async def get(self, key: str) -> Optional[Entry]:
+        raw = await self._redis.get(self._prefix + key)
+        if raw is None:
+            return None
+        value, fresh_until = json.loads(raw)
+        return value, fresh_until
+
+    async def set(self, key: str, entry: Entry, ttl: float) -> None:
+        await self._redis.set(self._prefix + key, json.dumps(entry), ex=max(1, int(ttl)))
+
+
+class SharedMemoryBackend:
+    """
+    SQLite file on tmpfs (/dev/shm) shared by every worker process on the host.
+
+    Reads go through SQLite's memory map, so a response cached by one worker
+    is served by all of them without each warming its own copy. Expired
+    entries and the oldest entries past `maxsize` are pruned periodically.
+    """
+
+    PRUNE_EVERY = 256  # sets between prunes, per process
+
+    def __init__(self, path: str, maxsize: int, mmap_bytes: int = 64 * 1024 * 1024):
+        self.path = path
+        self.maxsize = maxsize
+        self.mmap_bytes = mmap_bytes
+        self._local = threading.local()
+        self._sets = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread and process; a forked worker must not reuse its parent's
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(f"PRAGMA mmap_size={self.mmap_bytes}")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, fresh_until REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at)")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _get(self, key: str) -> Optional[Entry]:
+        row = self._conn().execute(
+            "SELECT value, fresh_until FROM entries WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def _set(self, key: str, entry: Entry, ttl: float, prune: bool) -> None:
+        value, fresh_until = entry
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), fresh_until, time.time() + ttl),
+        )
+        if prune:
+            conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+            conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY expires_at "
+                "LIMIT max(0, (SELECT count(*) FROM entries) - ?))",
+                (self.maxsize,),
+            )
+
+    async def get(self, key: str) -> Optional[Entry]:
+        return await run_blocking(self._get, key)
+
+    async def set(self, key: str, entry: Entry, ttl: float) -> None:
+        self._sets += 1
+        await run_blocking(self._set, key, entry, ttl, self._sets % self.PRUNE_EVERY == 0)
+
+
+class ResponseCache:
+    """
+    Upstream response cache with per-service TTLs and stale-while-revalidate.
+
+    Fresh entries are served directly. Stale entries are served immediately
+    while a single background fetch refreshes them; if that fetch fails the
+    entry is kept for up to stale_if_error seconds past its stale window, so
+    an upstream outage serves old data rather than errors. Misses wait on one
+    coalesced fetch, however many requests arrive for the same key.
+    """
+
+    def __init__(
+        self,
+        backend,
+        ttls: Dict[str, Tuple[float, float]],
+        precision: int,
+        stale_if_error: float = RESPONSE_CACHE_STALE_IF_ERROR_SECONDS,
+    ):
+        self.backend = backend
+        self.ttls = ttls
+        self.precision = precision
+        self.stale_if_error = stale_if_error
+        self.counters: Counter = Counter()
+        self._flights = SingleFlight()
+        self._revalidating: Set[asyncio.Task] = set()
+
+    def key(self, service: str, lat: Optional[float] = None, lon: Optional[float] = None, **params: Any) -> str:
+        """Cache key from the service, the geohash cell of (lat, lon) and request params."""
+        cell = geohash_encode(lat, lon, self.precision) if lat is not None and lon is not None else "-"
+        return f"{service}:{cell}:{json.dumps(params, sort_keys=True, default=str)}"
+
+    def snap(self, lat: float, lon: float) -> Tuple[float, float]:
+        """Centre of the cache cell containing (lat, lon), for cell-wide upstream queries."""
+        return geohash_decode(geohash_encode(lat, lon, self.precision))
+
+    async def _fetch_and_store(self, service: str, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        fresh_ttl, stale_ttl = self.ttls[service]
+        value = await fetch()
+        await self.backend.set(key, (value, time.time() + fresh_ttl), fresh_ttl + stale_ttl)
+        return value
+
+    def _revalidate(self, service: str, key: str, entry: Entry, fetch: Callable[[], Awaitable[Any]]) -> None:
+        async def run():
+            try:
+                await self._flights.do(key, lambda: self._fetch_and_store(service, key, fetch))
+            except Exception as e:
+                self.counters[f"{service}_revalidate_errors"] += 1
+                logger.warning("Revalidating %s failed: %s", key, e)
+                # Keep serving the stale copy (still marked stale, so the next
+                # request retries) until the stale-if-error window runs out
+                keep = entry[1] + self.ttls[service][1] + self.stale_if_error - time.time()
+                if keep > 0:
+                    await self.backend.set(key, entry, keep)
+
+        task = asyncio.create_task(run())
+        self._revalidating.add(task)
+        task.add_done_callback(self._revalidating.discard)
+
+    async def get_or_fetch(self, service: str, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        with span(f"cache.{service}") as s:
+            entry = await self.backend.get(key)
+            if entry is not None:
+                value, fresh_until = entry
+                if fresh_until > time.time():
+                    result = "hit"
+                else:
+                    result = "stale"
+                    self._revalidate(service, key, entry, fetch)
+                self.counters[f"{service}_{'hits' if result == 'hit' else result}"] += 1
+                s.set(result=result)
+                return value
+
+            self.counters[f"{service}_misses"] += 1
+            s.set(result="miss")
+            return await self._flights.do(key, lambda: self._fetch_and_store(service, key, fetch))
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.counters)
+
+
+def _build_backend():
+    if RESPONSE_CACHE_BACKEND == "redis":
+        return RedisBackend(REDIS_URL)
+    if RESPONSE_CACHE_BACKEND == "shared":
+        return SharedMemoryBackend(SHARED_CACHE_PATH, RESPONSE_CACHE_SIZE)
+    return MemoryBackend(RESPONSE_CACHE_SIZE)
+
+
+response_cache = ResponseCache(_build_backend(), RESPONSE_CACHE_TTLS, RESPONSE_CACHE_GEOHASH_PRECISION)
@@ -0,0 +1,190 @@
+import time
+from collections import Counter, OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import (
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_GEOHASH_PRECISION,
+    SEMANTIC_CACHE_MAX_NAMESPACES,
+    SEMANTIC_CACHE_SIZE,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_TTLS,
+)
+from app.utils.cache import SingleFlight
+from app.utils.geo import geohash_encode
+from app.utils.text import EMBEDDING_DIM, embed_prompt, normalize_prompt
+from app.utils.tracing import span
+
+
+class _Namespace:
+    """Answers for one workflow (and location cell): a ring of prompt vectors with expiry times."""
+
+    INITIAL_CAPACITY = 16
+
+    def __init__(self, maxsize: int, dim: int):
+        self.maxsize = maxsize
+        self.vectors = np.zeros((self.INITIAL_CAPACITY, dim), dtype=np.float32)
+        self.expires = np.zeros(self.INITIAL_CAPACITY)
+        self.values: List[Any] = [None] * self.INITIAL_CAPACITY
+        self.size = 0
+        self._next = 0  # slot overwritten once the ring is full
+
+    def nearest(self, vector: np.ndarray, now: float) -> Tuple[int, float]:
+        """Slot and cosine similarity of the closest unexpired entry, or (-1, 0.0)."""
+        if not self.size:
+            return -1, 0.0
+        scores = self.vectors[:self.size] @ vector
+        scores[self.expires[:self.size] <= now] = -1.0
+        slot = int(np.argmax(scores))
+        return (slot, float(scores[slot])) if scores[slot] > 0 else (-1, 0.0)
+
+    def put(self, slot: int, vector: np.ndarray, value: Any, expires_at: float) -> None:
+        if slot < 0:
+            slot = self._free_slot()
+        self.vectors[slot] = vector
+        self.expires[slot] = expires_at
+        self.values[slot] = value
+
+    def _free_slot(self) -> int:
+        if self.size < self.maxsize:
+            if self.size == len(self.values):
+                # Grow geometrically so quiet namespaces stay small
+                capacity = min(self.maxsize, 2 * len(self.values))
+                self.vectors = np.resize(self.vectors, (capacity, self.vectors.shape[1]))
+                self.expires = np.resize(self.expires, capacity)
+                self.values.extend([None] * (capacity - len(self.values)))
+            self.size += 1
+            return self.size - 1
+        slot = self._next
+        self._next = (self._next + 1) % self.maxsize
+        return slot
+
+
+class SemanticCache:
+    """
+    Reuse Gemini answers for prompts that mean the same thing.
+
+    Prompts are embedded with embed_prompt() and compared by cosine
+    similarity against earlier prompts in the same namespace: one per
+    workflow letter, plus a geohash cell for location-specific workflows.
+    A match at or above `threshold` serves the stored answer until its
+    workflow's TTL runs out.
+    """
+
+    def __init__(
+        self,
+        ttls: Dict[str, float],
+        threshold: float,
+        maxsize: int,
+        max_namespaces: int,
+        precision: int,
+        enabled: bool = True,
+        dim: int = EMBEDDING_DIM,
+    ):
+        self.ttls = ttls
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.max_namespaces = max_namespaces
+        self.precision = precision
+        self.enabled = enabled
+        self.dim = dim
+        self.counters: Counter = Counter()
+        self._namespaces: "OrderedDict[str, _Namespace]" = OrderedDict()
+        self._flights = SingleFlight()
+
+    def namespace(self, workflow: str, lat: Optional[float] = None, lon: Optional[float] = None) -> str:
+        if lat is None or lon is None:
+            return workflow
+        return f"{workflow}:{geohash_encode(lat, lon, self.precision)}"
+
+    def lookup(self, namespace: str, prompt: str) -> Tuple[Optional[Any], np.ndarray]:
+        """The cached answer for a similar prompt (or None), and the prompt's vector for store()."""
+        vector = embed_prompt(prompt, self.dim)
+        entries = self._namespaces.get(namespace)
+        if entries is None:
+            return None, vector
+        self._namespaces.move_to_end(namespace)
+        slot, similarity = entries.nearest(vector, time.time())
+        if similarity < self.threshold:
+            return None, vector
+        return entries.values[slot], vector
+
+    def store(self, namespace: str, vector: np.ndarray, value: Any) -> None:
+        entries = self._namespaces.get(namespace)
+        if entries is None:
+            entries = self._namespaces[namespace] = _Namespace(self.maxsize, self.dim)
+            while len(self._namespaces) > self.max_namespaces:
+                self._namespaces.popitem(last=False)
+        self._namespaces.move_to_end(namespace)
+        now = time.time()
+        # Refresh a near-duplicate in place rather than storing the same question twice
+        slot, similarity = entries.nearest(vector, now)
+        if similarity < self.threshold:
+            slot = -1
+        entries.put(slot, vector, value, now + self.ttls[namespace.split(":", 1)[0]])
+        self.counters["stores"] += 1
+
+    async def get_or_generate(self, namespace: str, prompt: str, generate: Callable[[], Awaitable[Any]]) -> Any:
+        """Serve a cached answer for a similar prompt, or generate one and keep it if it is not empty."""
+        if not self.enabled:
+            return await generate()
+        with span("semantic_cache", namespace=namespace.split(":", 1)[0]) as s:
+            value, vector = self.lookup(namespace, prompt)
+            s.set(result="hit" if value is not None else "miss")
+        if value is not None:
+            self.counters["hits"] += 1
+            return value
+        self.counters["misses"] += 1
+
+        async def generate_and_store():
+            value = await generate()
+            if value:
+                self.store(namespace, vector, value)
+            return value
+
+        # The same question asked concurrently is generated once
+        return await self._flights.do((namespace, normalize_prompt(prompt)), generate_and_store)
+
+    async def stream_or_generate(
+        self, namespace: str, prompt: str, generate: Callable[[], AsyncIterator[str]]
+    ) -> AsyncIterator[str]:
+        """Streaming get_or_generate(): a hit is one chunk; a miss is stored once the stream completes."""
+        if not self.enabled:
+            async for text in generate():
+                yield text
+            return
+        with span("semantic_cache", namespace=namespace.split(":", 1)[0]) as s:
+            value, vector = self.lookup(namespace, prompt)
+            s.set(result="hit" if value is not None else "miss")
+        if value is not None:
+            self.counters["hits"] += 1
+            yield value
+            return
+        self.counters["misses"] += 1
+        chunks = []
+        async for text in generate():
+            chunks.append(text)
+            yield text
+        answer = "".join(chunks).strip()
+        if answer:
+            self.store(namespace, vector, answer)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            **self.counters,
+            "namespaces": len(self._namespaces),
+            "entries": sum(entries.size for entries in self._namespaces.values()),
+            "threshold": self.threshold,
+        }
+
+
+semantic_cache = SemanticCache(
+    SEMANTIC_CACHE_TTLS,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_SIZE,
+    SEMANTIC_CACHE_MAX_NAMESPACES,
+    SEMANTIC_CACHE_GEOHASH_PRECISION,
+    enabled=SEMANTIC_CACHE_ENABLED,
+)
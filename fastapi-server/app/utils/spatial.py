@@ -0,0 +1,87 @@
+from math import cos, floor, radians
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from app.utils.geo import k_nearest
+
+MILES_PER_DEGREE = 69.0
+
+
+class GridIndex:
+    """Nearest-neighbour index that buckets points into fixed-size lat/lon cells."""
+
+    def __init__(self, lats: Iterable[float], lons: Iterable[float], cell_degrees: float = 0.02):
+        self.cell_degrees = cell_degrees
+        self.lats = np.asarray(list(lats), dtype=np.float64)
+        self.lons = np.asarray(list(lons), dtype=np.float64)
+        if self.lats.shape != self.lons.shape:
+            raise ValueError("lats and lons must be the same length")
+
+        self.cells: Dict[Tuple[int, int], np.ndarray] = {}
+        if len(self.lats):
+            rows = np.floor(self.lats / cell_degrees).astype(np.int64)
+            cols = np.floor(self.lons / cell_degrees).astype(np.int64)
+            # Group point indices by cell with one sort instead of per-point appends
+            order = np.lexsort((cols, rows))
+            keys = np.stack((rows[order], cols[order]), axis=1)
+            starts = np.flatnonzero(np.any(np.diff(keys, axis=0) != 0, axis=1)) + 1
+            for group in np.split(order, starts):
+                self.cells[(int(rows[group[0]]), int(cols[group[0]]))] = group
+            self._bounds = (int(rows.min()), int(rows.max()), int(cols.min()), int(cols.max()))
+
+    def __len__(self) -> int:
+        return len(self.lats)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return floor(lat / self.cell_degrees), floor(lon / self.cell_degrees)
+
+    def _max_ring(self, row: int, col: int) -> int:
+        """Ring radius after which every occupied cell has been visited."""
+        min_row, max_row, min_col, max_col = self._bounds
+        return max(abs(row - min_row), abs(row - max_row), abs(col - min_col), abs(col - max_col))
+
+    def _ring(self, row: int, col: int, r: int) -> Iterable[Tuple[int, int]]:
+        if r == 0:
+            yield row, col
+            return
+        for dc in range(-r, r + 1):
+            yield row - r, col + dc
+            yield row + r, col + dc
+        for dr in range(-r + 1, r):
+            yield row + dr, col - r
+            yield row + dr, col + r
+
+    def nearest(self, lat: float, lon: float, k: int = 1) -> List[Tuple[int, float]]:
+        """Return up to k (point index, distance in miles) pairs, closest first."""
+        if not self.cells or k <= 0:
+            return []
+
+        row, col = self._cell(lat, lon)
+        groups: List[np.ndarray] = []
+        count = 0
+
+        for r in range(self._max_ring(row, col) + 1):
+            if (2 * r + 1) ** 2 > len(self.lats):
+                # Sparse around this point: a full scan is cheaper than more rings
+                return self._scan(lat, lon, k)
+            for cell in self._ring(row, col, r):
+                group = self.cells.get(cell)
+                if group is not None:
+                    groups.append(group)
+                    count += len(group)
+
+            if count >= k:
+                candidates = np.concatenate(groups)
+                idx, dist = k_nearest(lat, lon, self.lats[candidates], self.lons[candidates], k)
+                # Anything beyond ring r is at least r cells away along one axis
+                edge_lat = min(abs(lat) + (r + 1) * self.cell_degrees, 89.0)
+                bound = r * self.cell_degrees * MILES_PER_DEGREE * cos(radians(edge_lat))
+                if dist[-1] <= bound:
+                    return list(zip(candidates[idx].tolist(), dist.tolist()))
+
+        return self._scan(lat, lon, k)
+
+    def _scan(self, lat: float, lon: float, k: int) -> List[Tuple[int, float]]:
+        idx, dist = k_nearest(lat, lon, self.lats, self.lons, k)
+        return list(zip(idx.tolist(), dist.tolist()))
@@ -0,0 +1,55 @@
+import re
+import zlib
+
+import numpy as np
+
+_NON_WORD = re.compile(r"[^a-z0-9' ]+")
+_SPACES = re.compile(r"\s+")
+
+# Words that carry no meaning for matching a request ("where can I get food")
+_STOPWORDS = frozenset("""
+a an the i im ive me my is am are was be been to of and or in on at for with it its this that
+do does did can could would should will please some any just have has had got get getting
+need needs want where find near nearby around here there know feel feeling really very so
+""".split())
+# Negation flips the meaning of a prompt, so it is one strong feature of its own
+_NEGATIONS = frozenset("not no never dont cant cannot doesnt didnt isnt wont without".split())
+
+EMBEDDING_DIM = 1024
+
+
+def normalize_prompt(text: str) -> str:
+    """Lower-case a prompt and strip punctuation and extra whitespace."""
+    text = _NON_WORD.sub(" ", (text or "").lower())
+    return _SPACES.sub(" ", text).strip()
+
+
+def _feature(vector: np.ndarray, name: str, weight: float) -> None:
+    # crc32 rather than hash(): stable across processes and restarts
+    h = zlib.crc32(name.encode())
+    vector[h % len(vector)] += weight if h & 0x80000000 else -weight
+
+
+def embed_prompt(text: str, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """
+    Unit-length hashed bag-of-features vector for a prompt.
+
+    Content words, word bigrams and character trigrams are hashed into `dim`
+    signed buckets, so paraphrases that share their key words ("I've got a
+    headache", "I have a headache") land close together under cosine
+    similarity. Cheap enough to run inline on the event loop.
+    """
+    words = normalize_prompt(text).replace("'", "").split()
+    vector = np.zeros(dim, dtype=np.float32)
+    if any(word in _NEGATIONS for word in words):
+        _feature(vector, "neg", 2.0)
+    content = [word for word in words if word not in _STOPWORDS and word not in _NEGATIONS]
+    for word in content:
+        _feature(vector, f"w:{word}", 1.0)
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            _feature(vector, f"c:{padded[i:i + 3]}", 0.3)
+    for first, second in zip(content, content[1:]):
+        _feature(vector, f"b:{first} {second}", 0.7)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
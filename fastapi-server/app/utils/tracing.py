@@ -0,0 +1,282 @@
+import json
+import logging
+import os
+import random
+import re
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.config import TRACE_DEBUG_HEADER, TRACE_SAMPLE_RATE
+
+# Sampled traces go to their own logger so they can be shipped as bare JSON lines
+trace_logger = logging.getLogger("app.traces")
+
+DEBUG_HEADER = b"x-debug-trace"
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Characters not allowed in a Server-Timing metric name
+_TOKEN_UNSAFE = re.compile(r"[^A-Za-z0-9!#$%&'*+\-.^_`|~]")
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Bucketed histogram; counts are per bucket and made cumulative when rendered."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        self.counts[bisect_left(self.buckets, value)] += 1
+
+    def cumulative(self) -> List[int]:
+        totals, running = [], 0
+        for count in self.counts[:-1]:
+            running += count
+            totals.append(running)
+        return totals
+
+
+class MetricsRegistry:
+    """Process-local counters and histograms, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.counters: Dict[str, Dict[LabelKey, float]] = defaultdict(lambda: defaultdict(float))
+        self.histograms: Dict[str, Dict[LabelKey, Histogram]] = defaultdict(dict)
+        self.help: Dict[str, str] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]] = []
+
+    def describe(self, name: str, help_text: str) -> None:
+        self.help[name] = help_text
+
+    def inc(self, name: str, value: float = 1.0, **labels: str) -> None:
+        self.counters[name][tuple(sorted(labels.items()))] += value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        series = self.histograms[name]
+        key = tuple(sorted(labels.items()))
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram()
+        histogram.observe(value)
+
+    def register_collector(self, collect: Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]) -> None:
+        """Add a callable yielding (counter name, labels, value) samples read at scrape time."""
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        lines: List[str] = []
+
+        counters: Dict[str, Dict[LabelKey, float]] = {name: dict(series) for name, series in self.counters.items()}
+        for collect in self._collectors:
+            for name, labels, value in collect():
+                counters.setdefault(name, {})[tuple(sorted(labels.items()))] = value
+
+        for name, series in sorted(counters.items()):
+            self._header(lines, name, "counter")
+            for labels, value in series.items():
+                lines.append(f"{name}{_labels(labels)} {value:g}")
+
+        for name, series in sorted(self.histograms.items()):
+            self._header(lines, name, "histogram")
+            for labels, histogram in series.items():
+                for bound, count in zip(histogram.buckets, histogram.cumulative()):
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', f'{bound:g}'),))} {count}")
+                lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{name}_sum{_labels(labels)} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def _header(self, lines: List[str], name: str, kind: str) -> None:
+        if name in self.help:
+            lines.append(f"# HELP {name} {self.help[name]}")
+        lines.append(f"# TYPE {name} {kind}")
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: LabelKey) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+metrics = MetricsRegistry()
+metrics.describe("snapaid_http_requests_total", "HTTP requests by route and status.")
+metrics.describe("snapaid_http_request_duration_seconds", "HTTP request latency by route.")
+metrics.describe("snapaid_span_duration_seconds", "Duration of traced operations (upstream calls, cache lookups, parsing).")
+metrics.describe("snapaid_span_errors_total", "Traced operations that raised.")
+metrics.describe("snapaid_span_bytes_total", "Payload bytes seen by traced operations.")
+metrics.describe("snapaid_span_results_total", "Outcomes (cache hit/miss, resolver source) of traced operations.")
+
+
+class Span:
+    """
+    A timed block, used as `with span("name", **attrs) as s:`.
+
+    Durations, errors, `bytes` and `result`/`source` attributes always feed the
+    metrics; the span itself is kept only when the current request is sampled
+    or asked for the debug header.
+    """
+
+    __slots__ = ("name", "attrs", "start", "duration", "error")
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.name = name
+        self.attrs = attrs
+        self.start = 0.0
+        self.duration = 0.0
+        self.error: Optional[str] = None
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> "Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.duration = time.perf_counter() - self.start
+        name, attrs = self.name, self.attrs
+        metrics.observe("snapaid_span_duration_seconds", self.duration, span=name)
+        if exc_type is not None:
+            self.error = exc_type.__name__
+            metrics.inc("snapaid_span_errors_total", span=name, error=self.error)
+        if attrs:
+            if "bytes" in attrs:
+                metrics.inc("snapaid_span_bytes_total", attrs["bytes"], span=name)
+            outcome = attrs.get("result") or attrs.get("source")
+            if outcome:
+                metrics.inc("snapaid_span_results_total", span=name, result=str(outcome))
+        trace = _current.get()
+        if trace is not None and trace.recording:
+            trace.spans.append(self)
+
+
+def span(name: str, **attrs: Any) -> Span:
+    return Span(name, attrs)
+
+
+class Trace:
+    """Spans recorded while serving one request."""
+
+    def __init__(self, sampled: bool, debug: bool):
+        self.trace_id = os.urandom(8).hex() if sampled or debug else ""
+        self.sampled = sampled
+        self.debug = debug
+        self.start = time.perf_counter()
+        self.spans: List[Span] = []
+        self.finished = False
+
+    @property
+    def recording(self) -> bool:
+        # Background work spawned by the request may outlive it; stop collecting then
+        return (self.sampled or self.debug) and not self.finished
+
+    def ordered_spans(self) -> List[Span]:
+        # Spans are appended as they finish; report them in the order they started
+        return sorted(self.spans, key=lambda s: s.start)
+
+    def server_timing(self) -> str:
+        """Span breakdown as a Server-Timing header value."""
+        entries = []
+        for s in self.ordered_spans():
+            entry = f"{_TOKEN_UNSAFE.sub('_', s.name)};dur={s.duration * 1000:.1f}"
+            desc = s.error or s.attrs.get("result") or s.attrs.get("source")
+            if desc:
+                entry += f';desc="{desc}"'
+            entries.append(entry)
+        return ", ".join(entries)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "spans": [
+                {
+                    "name": s.name,
+                    "start_ms": round((s.start - self.start) * 1000, 2),
+                    "duration_ms": round(s.duration * 1000, 2),
+                    **({"error": s.error} if s.error else {}),
+                    **s.attrs,
+                }
+                for s in self.ordered_spans()
+            ],
+        }
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("snapaid_trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+class TracingMiddleware:
+    """
+    Start a trace per HTTP request and record request metrics.
+
+    A request sends "X-Debug-Trace: 1" to get X-Trace-Id and a Server-Timing
+    header listing its spans. Headers go out with the first response
+    message, so streamed responses only list the spans finished by then.
+    Sampled requests are logged as one JSON line when they complete.
+    """
+
+    def __init__(self, app, sample_rate: float = TRACE_SAMPLE_RATE, debug_header: bool = TRACE_DEBUG_HEADER):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.debug_header = debug_header
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        debug = self.debug_header and dict(scope["headers"]).get(DEBUG_HEADER) in (b"1", b"true")
+        trace = Trace(sampled=random.random() < self.sample_rate, debug=debug)
+        token = _current.set(trace)
+        status = 500
+
+        async def send_with_trace(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if trace.debug:
+                    message = {
+                        **message,
+                        "headers": [
+                            *message.get("headers", []),
+                            (b"x-trace-id", trace.trace_id.encode()),
+                            (b"server-timing", trace.server_timing().encode()),
+                        ],
+                    }
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_trace)
+        finally:
+            duration = time.perf_counter() - trace.start
+            trace.finished = True
+            _current.reset(token)
+            # Label by route template, never the raw path, to keep series bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            metrics.inc("snapaid_http_requests_total", route=route, method=scope["method"], status=str(status))
+            metrics.observe("snapaid_http_request_duration_seconds", duration, route=route)
+            if trace.sampled:
+                trace_logger.info(json.dumps({
+                    "event": "trace",
+                    "route": route,
+                    "method": scope["method"],
+                    "status": status,
+                    "duration_ms": round(duration * 1000, 2),
+                    **trace.to_dict(),
+                }, default=str))
@@ -0,0 +1,60 @@
+"""Micro-benchmarks for the helpers in app/utils/geo.py and the grid index built on them."""
+import random
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from app.utils.geo import geohash_decode, geohash_encode, haversine, haversine_many, k_nearest
+from app.utils.spatial import GridIndex
+
+from benchmarks.metrics import summarize
+
+POINTS = 10_000  # roughly the size of the facility mirror
+
+
+def _time_calls(fn: Callable[[int], object], duration: float, batch: int) -> Dict[str, float]:
+    """
+    Call fn(i) repeatedly for about `duration` seconds.
+
+    Calls are timed in batches so timer overhead does not swamp sub-microsecond
+    helpers; each batch contributes its mean to the latency distribution.
+    """
+    latencies: List[float] = []
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        t0 = time.perf_counter()
+        for i in range(calls, calls + batch):
+            fn(i)
+        latencies.append((time.perf_counter() - t0) / batch)
+        calls += batch
+    wall = time.perf_counter() - start
+    stats = summarize(latencies, wall)
+    stats["count"] = calls
+    stats["ops_per_sec"] = round(calls / wall, 1)
+    del stats["rps"], stats["error_rate"]
+    return stats
+
+
+def run_geo_benchmarks(duration: float = 0.5, seed: int = 0) -> Dict[str, Dict[str, float]]:
+    rng = random.Random(seed)
+    lats = [rng.uniform(33.7, 34.4) for _ in range(POINTS)]
+    lons = [rng.uniform(-118.7, -118.0) for _ in range(POINTS)]
+    queries = [(rng.uniform(33.9, 34.2), rng.uniform(-118.5, -118.15)) for _ in range(1024)]
+    hashes = [geohash_encode(lat, lon, 6) for lat, lon in queries]
+    index = GridIndex(lats, lons)
+    lat_array, lon_array = np.asarray(lats), np.asarray(lons)
+
+    def q(i):
+        return queries[i & 1023]
+
+    cases = {
+        "geo.haversine": (lambda i: haversine(q(i)[1], q(i)[0], lons[i % POINTS], lats[i % POINTS]), 1000),
+        "geo.haversine_many_10k": (lambda i: haversine_many(*q(i), lat_array, lon_array), 10),
+        "geo.k_nearest_10k_k5": (lambda i: k_nearest(*q(i), lat_array, lon_array, 5), 10),
+        "geo.grid_nearest_10k_k5": (lambda i: index.nearest(*q(i), 5), 100),
+        "geo.geohash_encode_p6": (lambda i: geohash_encode(*q(i), 6), 1000),
+        "geo.geohash_decode_p6": (lambda i: geohash_decode(hashes[i & 1023]), 1000),
+    }
+    return {name: _time_calls(fn, duration, batch) for name, (fn, batch) in cases.items()}
@@ -0,0 +1,153 @@
+"""
+Endpoint load tests against the in-process app.
+
+Requests are driven through httpx.ASGITransport with the real lifespan, so
+routing, validation, caches, background refreshes and the shared upstream
+client are all exercised; only the upstreams themselves are stand-ins.
+"""
+import asyncio
+import base64
+import io
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Tuple
+
+import httpx
+
+from benchmarks.metrics import summarize
+from benchmarks.standins import StandinUpstreams
+
+# Places people actually ask from; requests jitter around them so caches see a realistic mix
+HOTSPOTS: List[Tuple[float, float]] = [
+    (34.0446, -118.2435),  # Skid Row
+    (34.0522, -118.2437),  # Civic Center
+    (34.0983, -118.3267),  # Hollywood
+    (34.0577, -118.2776),  # Westlake / MacArthur Park
+    (34.0259, -118.2856),  # Exposition Park
+    (33.9850, -118.4695),  # Venice
+    (34.0736, -118.2400),  # Chinatown / Elysian Park
+    (34.0470, -118.2130),  # Boyle Heights
+]
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    path: str
+    body: Callable[[random.Random], Dict[str, Any]]
+
+
+def _location(rng: random.Random) -> Dict[str, float]:
+    lat, lon = rng.choice(HOTSPOTS)
+    return {"latitude": lat + rng.gauss(0, 0.01), "longitude": lon + rng.gauss(0, 0.01)}
+
+
+def _sample_image_b64() -> str:
+    """A camera-sized JPEG, so the vision path pays for preprocessing like a real frame."""
+    from PIL import Image
+
+    rng = random.Random(1)
+    image = Image.frombytes("RGB", (1600, 1200), bytes(rng.getrandbits(8) for _ in range(1600 * 1200 * 3)))
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=90)
+    return base64.b64encode(out.getvalue()).decode("ascii")
+
+
+def build_scenarios() -> List[Scenario]:
+    image_b64 = _sample_image_b64()
+    return [
+        Scenario("find_restroom", "/api/find_restroom", _location),
+        Scenario("find_shelter", "/api/find_shelter", _location),
+        Scenario("find_pharmacy", "/api/find_pharmacy", _location),
+        Scenario("find_healthcare_facilities", "/api/find_healthcare_facilities",
+                 lambda rng: {**_location(rng), "limit": 5}),
+        # Everything the Lens client asks for at once, in one round-trip
+        Scenario("batch.location", "/api/batch",
+                 lambda rng: {**_location(rng), "intents": ["restroom", "shelter", "pharmacy", "healthcare_facilities"]}),
+        # Answered by the local classifier
+        Scenario("orchestrate.restroom", "/api/orchestrate",
+                 lambda rng: {**_location(rng), "user_prompt": "where is the nearest restroom"}),
+        # Needs Gemini to classify, then a Gemini text answer
+        Scenario("orchestrate.internal", "/api/orchestrate",
+                 lambda rng: {**_location(rng), "user_prompt": "I don't feel right and I need some help"}),
+        # Vision workflow with a full-size camera frame
+        Scenario("orchestrate.injury", "/api/orchestrate",
+                 lambda rng: {**_location(rng), "user_prompt": "I cut my arm and it is bleeding",
+                              "image_surroundings": image_b64}),
+    ]
+
+
+def _is_error(response: httpx.Response) -> bool:
+    if response.status_code >= 400:
+        return True
+    body = response.json()
+    return isinstance(body, dict) and "error" in body
+
+
+async def _run_scenario(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    requests: int,
+    concurrency: int,
+    rng: random.Random,
+) -> Dict[str, float]:
+    bodies = [scenario.body(rng) for _ in range(requests)]
+    latencies: List[float] = []
+    errors = 0
+    next_request = 0
+
+    async def worker():
+        nonlocal errors, next_request
+        while next_request < len(bodies):
+            body = bodies[next_request]
+            next_request += 1
+            start = time.perf_counter()
+            response = await client.post(scenario.path, json=body)
+            latencies.append(time.perf_counter() - start)
+            errors += _is_error(response)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - start, errors)
+
+
+async def run_http_benchmarks(
+    standins: StandinUpstreams,
+    requests: int,
+    concurrency: int,
+    warmup: int,
+    seed: int = 0,
+    only: List[str] = (),
+) -> Dict[str, Dict[str, float]]:
+    from app.main import app
+    from app.services.facilities import facility_mirror
+    from app.utils import http_client
+
+    # The app's shared client talks to the stand-ins; start_http_client() keeps it
+    http_client._client = httpx.AsyncClient(transport=standins.transport())
+    restore_sdk = standins.install_gemini_sdk()
+    rng = random.Random(seed)
+    results = {}
+    try:
+        async with app.router.lifespan_context(app):
+            # Steady state: warmup has finished and the facility mirror is synced before traffic arrives
+            await app.state.warmup
+            if not facility_mirror.loaded:
+                await facility_mirror.sync(full=True)
+
+            async with httpx.AsyncClient(
+                transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None
+            ) as client:
+                for scenario in build_scenarios():
+                    if only and scenario.name not in only:
+                        continue
+                    if warmup:
+                        await _run_scenario(client, scenario, warmup, concurrency, rng)
+                    results[f"http.{scenario.name}"] = await _run_scenario(
+                        client, scenario, requests, concurrency, rng
+                    )
+                    print(f"[bench] {scenario.name}: {results[f'http.{scenario.name}']}")
+    finally:
+        restore_sdk()
+    return results
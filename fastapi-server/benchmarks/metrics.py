@@ -0,0 +1,50 @@
+import os
+import resource
+import sys
+from typing import Dict, List, Sequence
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted values."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies: List[float], wall_seconds: float, errors: int = 0) -> Dict[str, float]:
+    """p50/p95/p99 (ms), throughput and error rate for one run; latencies are in seconds."""
+    values = sorted(latencies)
+    count = len(values)
+    return {
+        "count": count,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "rps": round(count / wall_seconds, 1) if wall_seconds > 0 else 0.0,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+    }
+
+
+def memory_usage() -> Dict[str, float]:
+    """
+    Memory of this process in MB. The benchmark process is one worker, so these are per-worker figures.
+
+    PSS (Linux only) splits shared pages between the processes mapping them,
+    so it shows what a preloaded, forked worker really adds.
+    """
+    usage = {}
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    usage["peak_rss_mb"] = round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    for path, field, key in (
+        ("/proc/self/status", "VmRSS:", "rss_mb"),
+        ("/proc/self/smaps_rollup", "Pss:", "pss_mb"),
+    ):
+        if not os.path.exists(path):
+            continue
+        with open(path) as f:
+            for line in f:
+                if line.startswith(field):
+                    usage[key] = round(int(line.split()[1]) / 1024, 1)
+                    break
+    return usage
@@ -0,0 +1,164 @@
+"""
+Run the benchmark suite and compare it against a stored baseline.
+
+    python -m benchmarks.run                      # run and compare to benchmarks/baseline.json
+    python -m benchmarks.run --save-baseline      # record a new baseline
+    python -m benchmarks.run --only find_shelter --requests 1000 --concurrency 64
+
+Exits with status 1 when any metric regresses past --tolerance, and with
+status 2 without comparing when the baseline was recorded with different
+settings (requests, concurrency, warmup, stand-in scales, seed).
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from typing import Dict, List, Tuple
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Metrics compared against the baseline, and whether bigger numbers are better
+COMPARED_METRICS = {
+    "p50_ms": False,
+    "p95_ms": False,
+    "rps": True,
+    "ops_per_sec": True,
+    "rss_mb": False,
+}
+
+
+def _configure_environment() -> None:
+    """Point the app at throwaway state and the stand-ins; must run before app is imported."""
+    state_dir = tempfile.mkdtemp(prefix="snapaid-bench-")
+    os.environ.setdefault("FACILITY_DB_PATH", os.path.join(state_dir, "facilities.sqlite3"))
+    os.environ.setdefault("SHARED_CACHE_PATH", os.path.join(state_dir, "cache.sqlite3"))
+    os.environ.setdefault("GEOCODE_CACHE_PATH", "")
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+    # The stand-ins have no quota; the gateway's rate limits would cap throughput instead
+    os.environ.setdefault("GEMINI_TEXT_RPM", "1000000")
+    os.environ.setdefault("GEMINI_VISION_RPM", "1000000")
+    os.environ.setdefault("GEMINI_BURST", "1000")
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    tolerance: float,
+    min_delta_ms: float = 1.0,
+) -> List[str]:
+    """
+    Describe every compared metric that is worse than the baseline by more than `tolerance`.
+
+    Latency changes smaller than `min_delta_ms` are ignored; sub-millisecond
+    timings move by more than any sensible tolerance between runs.
+    """
+    regressions = []
+    for name, base in baseline.items():
+        current = results.get(name)
+        if current is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            if metric not in base or metric not in current or not base[metric]:
+                continue
+            change = (current[metric] - base[metric]) / base[metric]
+            if metric.endswith("_ms") and current[metric] - base[metric] < min_delta_ms:
+                continue
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(
+                    f"{name} {metric}: {base[metric]} -> {current[metric]} ({change:+.0%})"
+                )
+    return regressions
+
+
+def _print_table(results: Dict[str, Dict[str, float]]) -> None:
+    columns: List[Tuple[str, str]] = [
+        ("p50_ms", "p50 ms"), ("p95_ms", "p95 ms"), ("p99_ms", "p99 ms"),
+        ("rps", "req/s"), ("ops_per_sec", "ops/s"), ("error_rate", "errors"),
+    ]
+    print(f"{'benchmark':<36}" + "".join(f"{title:>12}" for _, title in columns))
+    for name, stats in results.items():
+        if name in ("memory", "settings"):
+            continue
+        print(f"{name:<36}" + "".join(f"{stats.get(key, ''):>12}" for key, _ in columns))
+    if "memory" in results:
+        print("memory per worker: " + ", ".join(f"{k}={v}" for k, v in results["memory"].items()))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per endpoint scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight at once")
+    parser.add_argument("--warmup", type=int, default=20, help="unmeasured requests before each scenario")
+    parser.add_argument("--latency-scale", type=float, default=0.1, help="multiplier on stand-in latencies")
+    parser.add_argument("--error-scale", type=float, default=1.0, help="multiplier on stand-in error rates")
+    parser.add_argument("--geo-duration", type=float, default=0.5, help="seconds per geo micro-benchmark")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", action="append", default=[], help="run only these scenarios (repeatable)")
+    parser.add_argument("--skip-http", action="store_true")
+    parser.add_argument("--skip-geo", action="store_true")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="write results to --baseline instead of comparing")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression per metric")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore latency changes smaller than this")
+    parser.add_argument("--output", help="also write the results as JSON here")
+    args = parser.parse_args(argv)
+
+    _configure_environment()
+    from benchmarks.geo_bench import run_geo_benchmarks
+    from benchmarks.http_bench import run_http_benchmarks
+    from benchmarks.metrics import memory_usage
+    from benchmarks.standins import StandinUpstreams
+
+    results: Dict[str, Dict[str, float]] = {}
+    if not args.skip_geo:
+        results.update(run_geo_benchmarks(args.geo_duration, args.seed))
+    if not args.skip_http:
+        standins = StandinUpstreams.create(args.latency_scale, args.error_scale, args.seed)
+        results.update(asyncio.run(run_http_benchmarks(
+            standins, args.requests, args.concurrency, args.warmup, args.seed, args.only
+        )))
+        print(f"[bench] upstream calls: {standins.calls}")
+    results["memory"] = memory_usage()
+    # Recorded with the baseline; comparisons across different settings are refused
+    results["settings"] = {
+        key: getattr(args, key)
+        for key in ("requests", "concurrency", "warmup", "latency_scale", "error_scale", "seed")
+    }
+
+    _print_table(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"[bench] Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"[bench] No baseline at {args.baseline}; run with --save-baseline to record one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("settings") != results["settings"]:
+        # Numbers taken under different load or stand-in latencies are not comparable
+        print(f"[bench] Baseline was recorded with {baseline.get('settings')}, this run used {results['settings']}")
+        print("[bench] Not comparing; rerun with the baseline's settings or record a new baseline")
+        return 2
+    missing = sorted(name for name in results if name not in baseline)
+    if missing:
+        print(f"[bench] Not in the baseline, re-record to track them: {', '.join(missing)}")
+    regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+    for line in regressions:
+        print(f"[bench] REGRESSION {line}")
+    if regressions:
+        return 1
+    print(f"[bench] No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
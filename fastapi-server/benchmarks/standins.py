@@ -0,0 +1,240 @@
+"""
+Local stand-ins for every upstream the service calls.
+
+HTTP upstreams are answered by an httpx.MockTransport installed as the app's
+shared client, so requests still go through app.utils.http_client (limits,
+timeouts, semaphores). Gemini text calls go through the google-generativeai
+SDK, which cannot be pointed at a transport, so GenerativeModel's async
+generate method is replaced for the duration of the run.
+
+Each upstream gets a latency distribution (log-normal, from a median and
+p99) and error/timeout rates; all draws come from one seeded RNG.
+"""
+import asyncio
+import json
+import math
+import os
+import random
+import re
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, Optional
+
+import httpx
+
+from app.utils.geo import haversine_many
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+@dataclass(frozen=True)
+class UpstreamProfile:
+    """Latency and failure distribution of one stand-in upstream."""
+    median_ms: float
+    p99_ms: float
+    error_rate: float = 0.0  # answered with a 503
+    timeout_rate: float = 0.0  # raises httpx.ReadTimeout after the sampled latency
+
+    def sample_ms(self, rng: random.Random) -> float:
+        # Log-normal: p99 sits 2.326 standard deviations above the median
+        sigma = math.log(self.p99_ms / self.median_ms) / 2.326 if self.p99_ms > self.median_ms else 0.0
+        return rng.lognormvariate(math.log(self.median_ms), sigma)
+
+
+# Rough shapes of the real services as seen from LA; scale with --latency-scale
+PROFILES: Dict[str, UpstreamProfile] = {
+    "positionstack": UpstreamProfile(median_ms=120, p99_ms=600, error_rate=0.01),
+    "arcgis": UpstreamProfile(median_ms=250, p99_ms=1500, error_rate=0.005),
+    "easyvax": UpstreamProfile(median_ms=300, p99_ms=2000, error_rate=0.02, timeout_rate=0.005),
+    "la_open_data": UpstreamProfile(median_ms=800, p99_ms=4000, error_rate=0.01),
+    "lapl": UpstreamProfile(median_ms=600, p99_ms=3000, error_rate=0.02),
+    "gemini": UpstreamProfile(median_ms=2500, p99_ms=8000, error_rate=0.01),
+    "gemini_text": UpstreamProfile(median_ms=600, p99_ms=2500, error_rate=0.01),
+}
+
+HOSTS = {
+    "api.positionstack.com": "positionstack",
+    "services.arcgis.com": "arcgis",
+    "api.easyvax.com": "easyvax",
+    "data.lacity.org": "la_open_data",
+    "www.lapl.org": "lapl",
+    "generativelanguage.googleapis.com": "gemini",
+}
+
+
+def _load_json(name: str) -> Any:
+    with open(os.path.join(FIXTURES_DIR, name)) as f:
+        return json.load(f)
+
+
+def _load_text(name: str) -> str:
+    with open(os.path.join(FIXTURES_DIR, name)) as f:
+        return f.read()
+
+
+class Fixtures:
+    """Recorded upstream responses, loaded once."""
+
+    def __init__(self):
+        self.restrooms = _load_json("la_open_data_restrooms.json")
+        self.lapl_html = _load_text("lapl_homeless_resources.html")
+        cdph = _load_json("arcgis_cdph_facilities.json")
+        self.arcgis_layer = cdph["layer"]
+        self.arcgis_features = cdph["features"]
+        self.easyvax = _load_json("easyvax_locations.json")
+        positionstack = _load_json("positionstack_reverse.json")
+        self.zip_centroids = positionstack["zip_centroids"]
+        self.positionstack = positionstack["response"]
+        gemini = _load_json("gemini.json")
+        self.gemini_vision = gemini["generate_content"]
+        self.gemini_text = gemini["text"]
+
+
+class StandinUpstreams:
+    """Answers every upstream request from fixtures with injected latency and errors."""
+
+    def __init__(self, fixtures: Fixtures, profiles: Dict[str, UpstreamProfile], seed: int = 0):
+        self.fixtures = fixtures
+        self.profiles = profiles
+        self.rng = random.Random(seed)
+        self.calls: Dict[str, int] = {}
+        self._feature_lats = [f["geometry"]["y"] for f in fixtures.arcgis_features]
+        self._feature_lons = [f["geometry"]["x"] for f in fixtures.arcgis_features]
+
+    @classmethod
+    def create(cls, latency_scale: float = 1.0, error_scale: float = 1.0, seed: int = 0) -> "StandinUpstreams":
+        profiles = {
+            name: replace(
+                p,
+                median_ms=p.median_ms * latency_scale,
+                p99_ms=p.p99_ms * latency_scale,
+                error_rate=p.error_rate * error_scale,
+                timeout_rate=p.timeout_rate * error_scale,
+            )
+            for name, p in PROFILES.items()
+        }
+        return cls(Fixtures(), profiles, seed)
+
+    async def _delay(self, upstream: str) -> Optional[str]:
+        """Sleep for a sampled latency; return "error"/"timeout" when a failure is injected."""
+        profile = self.profiles[upstream]
+        self.calls[upstream] = self.calls.get(upstream, 0) + 1
+        await asyncio.sleep(profile.sample_ms(self.rng) / 1000)
+        roll = self.rng.random()
+        if roll < profile.timeout_rate:
+            return "timeout"
+        if roll < profile.timeout_rate + profile.error_rate:
+            return "error"
+        return None
+
+    # -- HTTP ---------------------------------------------------------------
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        upstream = HOSTS.get(request.url.host)
+        if upstream is None:
+            return httpx.Response(404, text=f"No stand-in for {request.url.host}")
+
+        failure = await self._delay(upstream)
+        if failure == "timeout":
+            raise httpx.ReadTimeout("Injected timeout", request=request)
+        if failure == "error":
+            return httpx.Response(503, text="Injected upstream error")
+
+        handler: Callable[[httpx.Request], httpx.Response] = getattr(self, f"_{upstream}")
+        return handler(request)
+
+    def _positionstack(self, request: httpx.Request) -> httpx.Response:
+        lat, lon = (float(v) for v in request.url.params["query"].split(","))
+        centroids = self.fixtures.zip_centroids
+        distances = haversine_many(lat, lon, [c[1] for c in centroids], [c[2] for c in centroids])
+        body = json.loads(json.dumps(self.fixtures.positionstack))
+        body["data"][0].update(latitude=lat, longitude=lon, postal_code=centroids[int(distances.argmin())][0])
+        return httpx.Response(200, json=body)
+
+    def _arcgis(self, request: httpx.Request) -> httpx.Response:
+        params = request.url.params
+        if not request.url.path.endswith("/query"):
+            return httpx.Response(200, json=self.fixtures.arcgis_layer)
+
+        features = self.fixtures.arcgis_features
+        if "geometry" in params:
+            # Spatial query: everything within the buffer around the point
+            point = json.loads(params["geometry"])
+            miles = float(params.get("distance", 5000)) / 1609.344
+            distances = haversine_many(point["y"], point["x"], self._feature_lats, self._feature_lons)
+            features = [f for f, d in zip(features, distances) if d <= miles]
+        else:
+            offset = int(params.get("resultOffset", 0))
+            count = int(params.get("resultRecordCount", len(features)))
+            page = features[offset:offset + count]
+            return httpx.Response(200, json={
+                "features": page,
+                "exceededTransferLimit": offset + count < len(features),
+            })
+        return httpx.Response(200, json={"features": features})
+
+    def _easyvax(self, request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=self.fixtures.easyvax)
+
+    def _la_open_data(self, request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json=self.fixtures.restrooms)
+
+    def _lapl(self, request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, text=self.fixtures.lapl_html, headers={"content-type": "text/html; charset=utf-8"})
+
+    def _gemini(self, request: httpx.Request) -> httpx.Response:
+        if "streamGenerateContent" in request.url.path:
+            text = self.fixtures.gemini_vision["candidates"][0]["content"]["parts"][0]["text"]
+            events = "".join(
+                f"data: {json.dumps({'candidates': [{'content': {'parts': [{'text': word + ' '}]}}]})}\r\n\r\n"
+                for word in text.split()
+            )
+            return httpx.Response(200, text=events, headers={"content-type": "text/event-stream"})
+        return httpx.Response(200, json=self.fixtures.gemini_vision)
+
+    # -- Gemini SDK ---------------------------------------------------------
+
+    def gemini_text(self, prompt: str) -> str:
+        text = self.fixtures.gemini_text
+        if "Return ONLY the single letter" in prompt:
+            match = re.search(r"User prompt: (.*)", prompt)
+            user_prompt = match.group(1).strip() if match else ""
+            return text["classifications"].get(user_prompt, text["default_letter"])
+        return text["response"]
+
+    def install_gemini_sdk(self):
+        """Replace GenerativeModel.generate_content_async; returns a callable that restores it."""
+        from google import generativeai as genai
+
+        standins = self
+        original = genai.GenerativeModel.generate_content_async
+
+        async def generate_content_async(model, contents, *args, stream: bool = False, **kwargs):
+            failure = await standins._delay("gemini_text")
+            if failure is not None:
+                raise RuntimeError(f"Injected Gemini {failure}")
+            instruction = getattr(model, "_system_instruction", None)
+            prompt = f"{instruction}\n\n{contents}" if instruction else str(contents)
+            return _SdkResponse(standins.gemini_text(prompt))
+
+        genai.GenerativeModel.generate_content_async = generate_content_async
+        return lambda: setattr(genai.GenerativeModel, "generate_content_async", original)
+
+
+class _SdkChunk:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _SdkResponse:
+    """Enough of the SDK's response object for .text and async chunk iteration."""
+
+    def __init__(self, text: str):
+        self.text = text
+
+    async def __aiter__(self):
+        for word in self.text.split():
+            await asyncio.sleep(0)
+            yield _SdkChunk(word + " ")
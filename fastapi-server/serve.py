@@ -0,0 +1,69 @@
+"""
+Production entry point: gunicorn master with uvicorn workers on uvloop + httptools.
+
+The app and its static datasets are loaded once in the master before forking,
+so workers share those pages copy-on-write instead of each downloading and
+holding their own copy. Use run.py for local development.
+
+    WEB_CONCURRENCY=4 RESPONSE_CACHE_BACKEND=shared python serve.py
+"""
+import asyncio
+import gc
+
+from gunicorn.app.base import BaseApplication
+from uvicorn.workers import UvicornWorker
+
+from app.config import SERVER_HOST, SERVER_PORT, WEB_CONCURRENCY
+
+
+class UvloopWorker(UvicornWorker):
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools", "lifespan": "on"}
+
+
+async def _preload() -> None:
+    from app.main import preload_datasets
+    from app.services.gemini_gateway import load_sdk
+    from app.utils.http_client import close_http_client, start_http_client
+
+    # Imported once here so workers share it; configuring opens no connections
+    load_sdk()
+
+    # The client is bound to this loop, so it is closed again before forking
+    await start_http_client()
+    try:
+        await preload_datasets()
+    finally:
+        await close_http_client()
+
+
+class SnapAidServer(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from app.main import app
+        from app.utils.executors import shutdown_pools
+
+        asyncio.run(_preload())
+        # Threads do not survive a fork; workers start their own pools
+        shutdown_pools(wait=True)
+        # Move everything loaded so far out of the collector's reach, so GC
+        # passes in the workers don't write to (and un-share) those pages
+        gc.freeze()
+        return app
+
+
+if __name__ == "__main__":
+    SnapAidServer({
+        "bind": f"{SERVER_HOST}:{SERVER_PORT}",
+        "workers": WEB_CONCURRENCY,
+        "worker_class": UvloopWorker,
+        "preload_app": True,
+        "keepalive": 5,
+        "graceful_timeout": 30,
+    }).run()
@@ -0,0 +1,66 @@
+"""
+Follow-up turns on /api/orchestrate: a follow-up that names another service is
+classified afresh, and "another one" moves past the place already shown.
+
+Runs in-process against the benchmark stand-ins, like test_loop_blocking.py.
+"""
+import asyncio
+
+import httpx
+
+from benchmarks.run import _configure_environment
+
+_configure_environment()
+
+from app.api import routes  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.schemas import OrchestrationRequest  # noqa: E402
+from app.utils import http_client  # noqa: E402
+from benchmarks.http_bench import HOTSPOTS  # noqa: E402
+from benchmarks.standins import StandinUpstreams  # noqa: E402
+
+LATITUDE, LONGITUDE = HOTSPOTS[0]
+
+
+async def _conversation(*prompts):
+    """Send `prompts` as consecutive turns of one session and return the responses."""
+    standins = StandinUpstreams.create(latency_scale=0.01, error_scale=0.0)
+    http_client._client = httpx.AsyncClient(transport=standins.transport())
+    restore_sdk = standins.install_gemini_sdk()
+    try:
+        async with app.router.lifespan_context(app):
+            await app.state.warmup
+            responses, session_id = [], None
+            for prompt in prompts:
+                req = OrchestrationRequest(
+                    user_prompt=prompt,
+                    latitude=LATITUDE,
+                    longitude=LONGITUDE,
+                    speculative=False,
+                    session_id=session_id,
+                )
+                response = await routes._orchestrate(req)
+                assert "error" not in response, response
+                session_id = response["sessionId"]
+                responses.append(response)
+            return responses
+    finally:
+        restore_sdk()
+
+
+def test_follow_up_naming_another_service_is_reclassified():
+    restroom, doctor = asyncio.run(_conversation("where is a restroom", "what about a doctor?"))
+
+    assert "nearestRestroom" in restroom
+    assert "nearestRestroom" not in doctor
+    assert doctor["facilities"]
+
+
+def test_another_one_moves_past_the_place_already_shown():
+    first, second, third = asyncio.run(
+        _conversation("where is a restroom", "can you find me another one?", "can you find me another one?")
+    )
+
+    shown = [r["nearestRestroom"] for r in (first, second, third)]
+    assert shown[0] != shown[1] != shown[2] != shown[0]
+    assert shown[0]["distance_miles"] <= shown[1]["distance_miles"] <= shown[2]["distance_miles"]